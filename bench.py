@@ -0,0 +1,316 @@
+# pad2osc benchmark
+#   python bench.py                 全部
+#   python bench.py --only micro,e2e --seconds 3 --out bench_output.txt
+#   python bench.py --only replay --replay recordings/xxx.p2orec   記録した実入力で計測
+# 結果は JSON（1回の実行 = 1オブジェクト）。回帰の比較用に --out で保存できる
+import argparse
+import json
+import platform
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import main
+
+SUITES = ("micro", "tick", "loop", "e2e", "replay")
+LOOP_RATES = (60, 120, 240)
+
+# =====================
+# helpers
+# =====================
+
+def per_call_ns(fn, n: int) -> float:
+    # fn() を n 回呼んだ平均 ns（ループ自体のコストも含む）
+    t0 = time.perf_counter_ns()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter_ns() - t0) / n
+
+def summarize_ns(samples) -> dict:
+    vals = sorted(samples)
+    if not vals:
+        return {"count": 0}
+    return {
+        "count": len(vals),
+        "p50_us": main.percentile(vals, 0.50) / 1000,
+        "p90_us": main.percentile(vals, 0.90) / 1000,
+        "p99_us": main.percentile(vals, 0.99) / 1000,
+        "max_us": vals[-1] / 1000,
+    }
+
+class Receiver(threading.Thread):
+    # 127.0.0.1 の UDP OSC 受信側。on_packet(data, recv_ns) を受信ごとに呼ぶ
+    def __init__(self, on_packet=None, drain: bool = True):
+        super().__init__(daemon=True)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.1)
+        self.port = self.sock.getsockname()[1]
+        self.on_packet = on_packet
+        self.drain = drain
+        self.packets = 0
+        self.stop = threading.Event()
+
+    def run(self):
+        if not self.drain:
+            # 読まない受信側（loop 計測用）: 受信コストを CPU 計測に混ぜない
+            self.stop.wait()
+            return
+        buf = bytearray(2048)
+        view = memoryview(buf)
+        while not self.stop.is_set():
+            try:
+                n = self.sock.recv_into(buf)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            now = time.perf_counter_ns()
+            self.packets += 1
+            if self.on_packet is not None:
+                self.on_packet(view[:n], now)
+
+    def close(self):
+        self.stop.set()
+        self.join(1.0)
+        self.sock.close()
+
+def run_engine(cfg: dict, seconds: float, backend=None) -> dict:
+    # 一時 config で engine_loop を seconds 秒回す。戻り値: scheduler/output の統計と CPU 時間
+    saved_path = main.CONFIG_PATH
+    saved = main.INPUT_BACKENDS["synthetic"]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = threading.Thread(target=main.engine_loop, args=(main.FakeForegroundProvider(""),), daemon=True)
+        try:
+            # main.CONFIG_PATH は終わったら戻す（一時ディレクトリは消える）
+            main.CONFIG_PATH = Path(tmp) / "config.json"
+            main.CONFIG_PATH.write_text(json.dumps(cfg), encoding="utf-8")
+            if backend is not None:
+                main.INPUT_BACKENDS["synthetic"] = backend
+            main.stop_event.clear()
+            engine.start()
+            time.sleep(0.5)  # LUT 構築と入力スレッド起動を計測から外す
+            wall0, cpu0 = time.perf_counter(), time.process_time()
+            sched = main.scheduler
+            ticks0 = sched.ticks if sched is not None else 0
+            time.sleep(seconds)
+            wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+            sched = main.scheduler
+            rate = sched.stats() if sched is not None else {}
+            ticks = (sched.ticks if sched is not None else 0) - ticks0
+            dests = main.output.stats() if main.output is not None else []
+        finally:
+            main.stop_event.set()
+            if engine.is_alive():
+                engine.join(2.0)
+            main.stop_event.clear()
+            main.INPUT_BACKENDS["synthetic"] = saved
+            main.CONFIG_PATH = saved_path
+    return {
+        "wall_sec": wall,
+        "cpu_sec": cpu,
+        "cpu_percent": 100.0 * cpu / wall,
+        "achieved_hz": ticks / wall,
+        "rate": rate,
+        "destinations": dests,
+    }
+
+def base_config(hz: int, port: int, **extra) -> dict:
+    cfg = {
+        "vrc_ip": "127.0.0.1",
+        "vrc_port": port,
+        "hz": hz,
+        "input_backend": "synthetic",
+        "suppress_when_vrchat_foreground": False,
+    }
+    cfg.update(extra)
+    return cfg
+
+# =====================
+# suites
+# =====================
+
+def bench_micro(n: int) -> dict:
+    rc = main.compile_config(main.validate_config({}))
+    st = main.XINPUT_STATE()
+    main.synthetic_pattern(0.3, 0, st.Gamepad)
+    out = main.Mapped()
+    dz = rc.deadzone_left
+    gamma = rc.curve_gamma
+    return {
+        "norm_thumb_ns": per_call_ns(lambda: main.norm_thumb(20000, dz), n),
+        "apply_curve_ns": per_call_ns(lambda: main.apply_curve(0.6, gamma), n),
+        "map_state_ns": per_call_ns(lambda: main.map_state(st, rc.pads[0], out), n),
+        "calls": n,
+    }
+
+def bench_tick(n: int) -> dict:
+    # Pad.tick（map + encode + send）の1tickあたりのコスト。入力は毎回変化させる
+    recv = Receiver(drain=False)
+    recv.start()
+    result = {}
+    try:
+        for transport in ("message", "bundle"):
+            cfg = main.validate_config(base_config(120, recv.port, osc_transport=transport))
+            rc = main.compile_config(cfg)
+            output = main.OscOutput()
+            slot = main.LatestSlot(threading.Event())
+            pad = main.Pad(rc.pads[0], slot, output)
+            st = main.XINPUT_STATE()
+            samples = []
+            for i in range(n):
+                main.synthetic_pattern(i / 250.0, 0, st.Gamepad)
+                st.dwPacketNumber = i + 1
+                slot.publish(st, True)
+                t0 = time.perf_counter_ns()
+                pad.tick(time.perf_counter(), False)
+                samples.append(time.perf_counter_ns() - t0)
+            result[transport] = summarize_ns(samples)
+            output.close()
+    finally:
+        recv.close()
+    return result
+
+def bench_loop(seconds: float) -> dict:
+    # 60/120/240 Hz で engine_loop を回したときのプロセス CPU 使用率
+    recv = Receiver(drain=False)
+    recv.start()
+    result = {}
+    try:
+        for hz in LOOP_RATES:
+            r = run_engine(base_config(hz, recv.port), seconds)
+            result[str(hz)] = {
+                "cpu_percent": r["cpu_percent"],
+                "achieved_hz": r["achieved_hz"],
+                "jitter_p99_us": r["rate"].get("jitter_p99_us"),
+            }
+    finally:
+        recv.close()
+    return result
+
+E2E_LEVELS = 64
+E2E_STEP = 400  # sThumbLX = (level + 1) * E2E_STEP
+E2E_INPUT_HZ = 50
+
+def bench_e2e(seconds: float, hz: int = 120) -> dict:
+    # 合成入力 → engine → UDP 受信 の遅延。
+    # 入力は E2E_INPUT_HZ ごとに sThumbLX を段階的に変え、その変化時刻から
+    # 同じ値の move_x が最初に届くまでを測る（サンプリング待ちも含む実際の入力遅延）
+    changed_ns = [0] * E2E_LEVELS
+    seen = [True] * E2E_LEVELS
+    latencies = []
+    last_level = [-1]
+    backend_ref = []
+
+    def script(t: float, slot: int, gp):
+        level = int(round(t * E2E_INPUT_HZ)) % E2E_LEVELS
+        gp.sThumbLX = (level + 1) * E2E_STEP
+        if slot == 0 and level != last_level[0]:
+            last_level[0] = level
+            changed_ns[level] = int((backend_ref[0].t0 + t) * 1e9)
+            seen[level] = False
+
+    def make_backend():
+        backend = main.SyntheticBackend(update_hz=E2E_INPUT_HZ, script=script)
+        backend_ref[:] = [backend]
+        return backend
+
+    header = main.osc_header(main.DEFAULT_CONFIG["addr_move_x"], "f")
+
+    def on_packet(data, recv_ns):
+        i = bytes(data).find(header)
+        if i < 0:
+            return
+        x = struct.unpack_from(">f", data, i + len(header))[0]
+        level = round(x * 32767 / E2E_STEP) - 1
+        if 0 <= level < E2E_LEVELS and not seen[level]:
+            seen[level] = True
+            latencies.append(recv_ns - changed_ns[level])
+
+    recv = Receiver(on_packet)
+    recv.start()
+    try:
+        cfg = base_config(hz, recv.port, deadzone_left=0, curve_gamma=1.0)
+        r = run_engine(cfg, seconds, backend=make_backend)
+        time.sleep(0.1)
+    finally:
+        recv.close()
+    sent = sum(d["sent"] for d in r["destinations"])
+    return {
+        "hz": hz,
+        "latency": summarize_ns(latencies[1:]),  # 最初の1件は起動待ちを含むので捨てる
+        "achieved_hz": r["achieved_hz"],
+        "sent": sent,
+        "received": recv.packets,
+        "loss_percent": 100.0 * (sent - recv.packets) / sent if sent else 0.0,
+        "send_errors": sum(d["errors"] for d in r["destinations"]),
+    }
+
+def bench_replay(path: str, seconds: float) -> dict:
+    # 記録ファイル: 待たずに全件 map + encode したときの処理速度と、
+    # input_backend="replay" で engine を回したときの CPU・送信数
+    batch = main.replay_session(path, {}, realtime=False, send=False)
+    batch["per_record_us"] = 1e6 * batch["elapsed_sec"] / batch["replayed"] if batch["replayed"] else 0.0
+    recv = Receiver()
+    recv.start()
+    try:
+        r = run_engine(base_config(120, recv.port, input_backend="replay", replay_file=str(path), send_on_change=True), seconds)
+    finally:
+        recv.close()
+    return {
+        "batch": batch,
+        "engine": {
+            "cpu_percent": r["cpu_percent"],
+            "achieved_hz": r["achieved_hz"],
+            "sent": sum(d["sent"] for d in r["destinations"]),
+            "received": recv.packets,
+        },
+    }
+
+def main_cli(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="pad2osc benchmarks (JSON output)")
+    ap.add_argument("--only", default=",".join(SUITES), help="comma separated: " + ",".join(SUITES))
+    ap.add_argument("--calls", type=int, default=200000, help="micro: calls per function")
+    ap.add_argument("--ticks", type=int, default=20000, help="tick: ticks per transport")
+    ap.add_argument("--seconds", type=float, default=3.0, help="loop/e2e: seconds per run")
+    ap.add_argument("--e2e-hz", type=int, default=120)
+    ap.add_argument("--replay", help="replay: recording file (.p2orec)")
+    ap.add_argument("--out", help="write JSON to this file as well")
+    args = ap.parse_args(argv)
+
+    only = [s for s in args.only.split(",") if s]
+    if not args.replay and "replay" in only:
+        only.remove("replay")
+    for s in only:
+        if s not in SUITES:
+            ap.error(f"unknown suite: {s}")
+
+    result = {
+        "version": main.VERSION,
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    if "micro" in only:
+        result["micro"] = bench_micro(args.calls)
+    if "tick" in only:
+        result["tick"] = bench_tick(args.ticks)
+    if "loop" in only:
+        result["loop"] = bench_loop(args.seconds)
+    if "e2e" in only:
+        result["e2e"] = bench_e2e(args.seconds, args.e2e_hz)
+    if "replay" in only:
+        result["replay"] = bench_replay(args.replay, args.seconds)
+
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,661 @@
+# トレイアイコンと設定画面。main.py から必要になったときだけ import される（--headless では読み込まない）
+import json
+import threading
+
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+from pystray import Icon, MenuItem, Menu
+from PIL import Image, ImageDraw
+
+import main as core
+from main import (
+    APP_TITLE, VERSION, BUTTON_MASKS, DEFAULT_CONFIG, PROFILE_DEFAULTS, ConfigError,
+    load_config, save_config, validate_config,
+    controller_listeners, engine_loop, stop_event, EngineProcess,
+    start_recording, stop_recording, stats_snapshot,
+    clamp, norm_thumb, apply_curve,
+)
+
+# =====================
+# Settings window
+# =====================
+
+class App(tk.Toplevel):
+    # ★exe統合のため Tk() ではなく Toplevel で開く（UI仕様は同じ）
+    def __init__(self, master: tk.Tk, on_saved=None, preview_source=None):
+        super().__init__(master)
+        self.on_saved = on_saved  # 保存後に on_saved(cfg) を呼ぶ（engine に次の tick で反映させる）
+        self.preview_source = preview_source  # open_preview() / close_preview() を持つもの（main か EngineProcess）
+        self.preview_win = None
+        self.profile_win = None
+        self.title("pad2osc - 設定")
+        self.geometry("900x660")
+        self.minsize(860, 620)
+
+        try:
+            self.cfg = load_config()
+        except ConfigError as e:
+            messagebox.showerror("設定エラー", f"config.json を読み込めませんでした。\n{e}", parent=self)
+            self.cfg = validate_config({})
+        self.vars = {}
+        self._build()
+
+        # 二重起動防止（同一プロセス内で複数開いてもOKだが、見た目が嫌ならここで制御可能）
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
+
+    def _combo_button(self, parent, var):
+        values = list(BUTTON_MASKS)
+        return ttk.Combobox(parent, textvariable=var, values=values, width=10, state="readonly")
+
+    def _row(self, parent, r, label, widget):
+        ttk.Label(parent, text=label).grid(row=r, column=0, sticky="w", padx=(0,10), pady=4)
+        widget.grid(row=r, column=1, sticky="we", pady=4)
+        parent.grid_columnconfigure(1, weight=1)
+
+    def _build(self):
+        pad = 12
+        root = ttk.Frame(self, padding=pad)
+        root.pack(fill="both", expand=True)
+
+        left = ttk.Frame(root)
+        right = ttk.Frame(root)
+        left.grid(row=0, column=0, sticky="nsew", padx=(0, pad))
+        right.grid(row=0, column=1, sticky="nsew")
+        root.grid_columnconfigure(0, weight=1)
+        root.grid_columnconfigure(1, weight=1)
+
+        # ---- Left: Connection + Tuning ----
+        lf_conn = ttk.Labelframe(left, text="接続", padding=pad)
+        lf_conn.pack(fill="x", pady=(0, pad))
+
+        self.vars["vrc_ip"] = tk.StringVar(value=self.cfg.get("vrc_ip", DEFAULT_CONFIG["vrc_ip"]))
+        self.vars["vrc_port"] = tk.IntVar(value=int(self.cfg.get("vrc_port", DEFAULT_CONFIG["vrc_port"])))
+        self.vars["hz"] = tk.IntVar(value=int(self.cfg.get("hz", DEFAULT_CONFIG["hz"])))
+
+        self._row(lf_conn, 0, "VRChat IP", ttk.Entry(lf_conn, textvariable=self.vars["vrc_ip"], width=18))
+        self._row(lf_conn, 1, "VRChat Port", ttk.Spinbox(lf_conn, from_=1, to=65535, textvariable=self.vars["vrc_port"], width=10))
+        self._row(lf_conn, 2, "送信Hz", ttk.Spinbox(lf_conn, from_=10, to=240, textvariable=self.vars["hz"], width=10))
+
+        # ★追加：前面抑制
+        self.vars["suppress_when_vrchat_foreground"] = tk.BooleanVar(
+            value=bool(self.cfg.get("suppress_when_vrchat_foreground", True))
+        )
+        ttk.Checkbutton(
+            lf_conn,
+            text="VRChatがアクティブならOSC送信しない",
+            variable=self.vars["suppress_when_vrchat_foreground"],
+        ).grid(row=3, column=0, columnspan=2, sticky="w", pady=(6,0))
+
+        self.vars["vrchat_process_name"] = tk.StringVar(value=str(self.cfg.get("vrchat_process_name", "VRChat.exe")))
+        self._row(lf_conn, 4, "VRChatプロセス名", ttk.Entry(lf_conn, textvariable=self.vars["vrchat_process_name"], width=18))
+
+        # ★追加：1tick分を1つのOSC bundleにまとめて送る（bundle非対応の受信側は message のまま）
+        self.vars["osc_transport"] = tk.StringVar(value=str(self.cfg.get("osc_transport", DEFAULT_CONFIG["osc_transport"])))
+        osc_transport = ttk.Combobox(lf_conn, textvariable=self.vars["osc_transport"], values=["message", "bundle"], width=10, state="readonly")
+        self._row(lf_conn, 5, "OSC送信方式", osc_transport)
+
+        self.vars["sched_policy"] = tk.StringVar(value=str(self.cfg.get("sched_policy", DEFAULT_CONFIG["sched_policy"])))
+        sched_policy = ttk.Combobox(lf_conn, textvariable=self.vars["sched_policy"], values=["skip", "catchup"], width=10, state="readonly")
+        self._row(lf_conn, 6, "遅延tickの扱い", sched_policy)
+
+        self.vars["poll_hz"] = tk.IntVar(value=int(self.cfg.get("poll_hz", DEFAULT_CONFIG["poll_hz"])))
+        self._row(lf_conn, 7, "入力ポーリングHz", ttk.Spinbox(lf_conn, from_=60, to=2000, textvariable=self.vars["poll_hz"], width=10))
+
+        # ★追加：1kHz で入力を拾って送信フレームにまとめる（短いタップを取りこぼさない）
+        self.vars["oversample"] = tk.BooleanVar(value=bool(self.cfg.get("oversample", DEFAULT_CONFIG["oversample"])))
+        ttk.Checkbutton(lf_conn, text="オーバーサンプリング（1kHz・短い押下も送る）", variable=self.vars["oversample"]).grid(
+            row=8, column=0, columnspan=2, sticky="w", pady=(6,0)
+        )
+        self.vars["axis_fold"] = tk.StringVar(value=str(self.cfg.get("axis_fold", DEFAULT_CONFIG["axis_fold"])))
+        axis_fold = ttk.Combobox(lf_conn, textvariable=self.vars["axis_fold"], values=["latest", "peak"], width=10, state="readonly")
+        self._row(lf_conn, 9, "軸のまとめ方", axis_fold)
+
+        lf_tune = ttk.Labelframe(left, text="チューニング", padding=pad)
+        lf_tune.pack(fill="both", expand=True)
+
+        self.vars["deadzone_left"] = tk.IntVar(value=int(self.cfg.get("deadzone_left", DEFAULT_CONFIG["deadzone_left"])))
+        self.vars["deadzone_right"] = tk.IntVar(value=int(self.cfg.get("deadzone_right", DEFAULT_CONFIG["deadzone_right"])))
+        self.vars["trigger_threshold"] = tk.IntVar(value=int(self.cfg.get("trigger_threshold", DEFAULT_CONFIG["trigger_threshold"])))
+
+        self.vars["move_invert_y"] = tk.BooleanVar(value=bool(self.cfg.get("move_invert_y", DEFAULT_CONFIG["move_invert_y"])))
+        self.vars["look_gain"] = tk.DoubleVar(value=float(self.cfg.get("look_gain", DEFAULT_CONFIG["look_gain"])))
+        self.vars["look_invert_y"] = tk.BooleanVar(value=bool(self.cfg.get("look_invert_y", DEFAULT_CONFIG["look_invert_y"])))
+        self.vars["curve_gamma"] = tk.DoubleVar(value=float(self.cfg.get("curve_gamma", DEFAULT_CONFIG["curve_gamma"])))
+        self.vars["failsafe_timeout_sec"] = tk.DoubleVar(value=float(self.cfg.get("failsafe_timeout_sec", DEFAULT_CONFIG["failsafe_timeout_sec"])))
+        self.vars["send_on_change"] = tk.BooleanVar(value=bool(self.cfg.get("send_on_change", DEFAULT_CONFIG["send_on_change"])))
+        self.vars["keepalive_sec"] = tk.DoubleVar(value=float(self.cfg.get("keepalive_sec", DEFAULT_CONFIG["keepalive_sec"])))
+
+        self._row(lf_tune, 0, "左デッドゾーン", ttk.Spinbox(lf_tune, from_=0, to=20000, textvariable=self.vars["deadzone_left"], width=10))
+        self._row(lf_tune, 1, "右デッドゾーン", ttk.Spinbox(lf_tune, from_=0, to=20000, textvariable=self.vars["deadzone_right"], width=10))
+        self._row(lf_tune, 2, "トリガ閾値", ttk.Spinbox(lf_tune, from_=0, to=255, textvariable=self.vars["trigger_threshold"], width=10))
+
+        ttk.Checkbutton(lf_tune, text="移動Y反転", variable=self.vars["move_invert_y"]).grid(row=3, column=0, columnspan=2, sticky="w", pady=(6,0))
+        ttk.Checkbutton(lf_tune, text="視点Y反転", variable=self.vars["look_invert_y"]).grid(row=4, column=0, columnspan=2, sticky="w")
+
+        self._row(lf_tune, 5, "視点感度", ttk.Scale(lf_tune, from_=0.1, to=3.0, variable=self.vars["look_gain"], orient="horizontal"))
+        self._row(lf_tune, 6, "カーブ γ（1.0=線形）", ttk.Scale(lf_tune, from_=1.0, to=2.4, variable=self.vars["curve_gamma"], orient="horizontal"))
+        self._row(lf_tune, 7, "フェイルセーフ秒", ttk.Scale(lf_tune, from_=0.05, to=1.0, variable=self.vars["failsafe_timeout_sec"], orient="horizontal"))
+
+        ttk.Checkbutton(lf_tune, text="変化時のみ送信", variable=self.vars["send_on_change"]).grid(row=8, column=0, columnspan=2, sticky="w", pady=(6,0))
+        self._row(lf_tune, 9, "キープアライブ秒", ttk.Scale(lf_tune, from_=0.1, to=5.0, variable=self.vars["keepalive_sec"], orient="horizontal"))
+
+        # ★追加：スティックのスムージング（One Euro）＋予測
+        self.vars["filter_enabled"] = tk.BooleanVar(value=bool(self.cfg.get("filter_enabled", DEFAULT_CONFIG["filter_enabled"])))
+        self.vars["filter_min_cutoff"] = tk.DoubleVar(value=float(self.cfg.get("filter_min_cutoff", DEFAULT_CONFIG["filter_min_cutoff"])))
+        self.vars["filter_beta"] = tk.DoubleVar(value=float(self.cfg.get("filter_beta", DEFAULT_CONFIG["filter_beta"])))
+        self.vars["filter_predict_ms"] = tk.DoubleVar(value=float(self.cfg.get("filter_predict_ms", DEFAULT_CONFIG["filter_predict_ms"])))
+
+        ttk.Checkbutton(lf_tune, text="スティックのスムージング", variable=self.vars["filter_enabled"]).grid(row=10, column=0, columnspan=2, sticky="w", pady=(6,0))
+        self._row(lf_tune, 11, "最小カットオフHz", ttk.Scale(lf_tune, from_=0.1, to=10.0, variable=self.vars["filter_min_cutoff"], orient="horizontal"))
+        self._row(lf_tune, 12, "速度追従 β", ttk.Scale(lf_tune, from_=0.0, to=5.0, variable=self.vars["filter_beta"], orient="horizontal"))
+        self._row(lf_tune, 13, "予測ms", ttk.Scale(lf_tune, from_=0.0, to=50.0, variable=self.vars["filter_predict_ms"], orient="horizontal"))
+
+        # ---- Right: Buttons + Addresses ----
+        lf_btn = ttk.Labelframe(right, text="ボタン割り当て", padding=pad)
+        lf_btn.pack(fill="x", pady=(0, pad))
+
+        self.vars["jump_button"] = tk.StringVar(value=str(self.cfg.get("jump_button", DEFAULT_CONFIG["jump_button"])))
+        self.vars["voice_button"] = tk.StringVar(value=str(self.cfg.get("voice_button", DEFAULT_CONFIG["voice_button"])))
+        self.vars["voice_mode"] = tk.StringVar(value=str(self.cfg.get("voice_mode", DEFAULT_CONFIG["voice_mode"])))
+
+        self._row(lf_btn, 0, "Jump", self._combo_button(lf_btn, self.vars["jump_button"]))
+        self._row(lf_btn, 1, "Voice (Mic)", self._combo_button(lf_btn, self.vars["voice_button"]))
+
+        voice_mode = ttk.Combobox(lf_btn, textvariable=self.vars["voice_mode"], values=["pulse", "hold"], width=10, state="readonly")
+        self._row(lf_btn, 2, "Voice mode", voice_mode)
+        ttk.Label(lf_btn, text='pulse=0→1→0（Toggle Voice向け） / hold=押してる間1（PTT向け）').grid(
+            row=3, column=0, columnspan=2, sticky="w", pady=(0,6)
+        )
+
+        self.vars["enable_grab_triggers"] = tk.BooleanVar(value=bool(self.cfg.get("enable_grab_triggers", True)))
+        ttk.Checkbutton(lf_btn, text="トリガーでGrab（LT=Left / RT=Right）", variable=self.vars["enable_grab_triggers"]).grid(
+            row=4, column=0, columnspan=2, sticky="w", pady=(6,0)
+        )
+
+        lf_addr = ttk.Labelframe(right, text="OSCアドレス", padding=pad)
+        lf_addr.pack(fill="both", expand=True)
+
+        for k, label, r in [
+            ("addr_move_x", "Horizontal", 0),
+            ("addr_move_y", "Vertical", 1),
+            ("addr_look_x", "LookHorizontal", 2),
+            ("addr_look_y", "LookVertical", 3),
+            ("addr_jump", "Jump", 4),
+            ("addr_voice", "Voice", 5),
+            ("grab_left_addr", "GrabLeft", 6),
+            ("grab_right_addr", "GrabRight", 7),
+        ]:
+            self.vars[k] = tk.StringVar(value=str(self.cfg.get(k, DEFAULT_CONFIG[k])))
+            self._row(lf_addr, r, label, ttk.Entry(lf_addr, textvariable=self.vars[k], width=36))
+
+        bottom = ttk.Frame(root)
+        bottom.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(pad,0))
+
+        ttk.Button(bottom, text="読み込み", command=self.on_load).pack(side="left")
+        ttk.Button(bottom, text="保存", command=self.on_save).pack(side="left", padx=(8,0))
+        ttk.Button(bottom, text="デフォルト", command=self.on_default).pack(side="left", padx=(8,0))
+        ttk.Button(bottom, text="プロファイル", command=self.on_profiles).pack(side="left", padx=(8,0))
+        if self.preview_source is not None:
+            ttk.Button(bottom, text="ライブプレビュー", command=self.on_preview).pack(side="left", padx=(8,0))
+        ttk.Label(bottom, text=f"保存先: {core.CONFIG_PATH.name}").pack(side="right")
+
+    def gather(self) -> dict:
+        # GUI に無い項目（pads / destinations など）は読み込んだ値をそのまま残す
+        cfg = {**self.cfg, **{k: v.get() for k, v in self.vars.items()}}
+
+        for k in ["vrc_port", "hz", "poll_hz", "deadzone_left", "deadzone_right", "trigger_threshold"]:
+            cfg[k] = int(float(cfg[k]))
+        for k in ["look_gain", "curve_gamma", "failsafe_timeout_sec", "keepalive_sec", "filter_min_cutoff", "filter_beta", "filter_predict_ms"]:
+            cfg[k] = float(cfg[k])
+        for k in ["move_invert_y", "look_invert_y", "enable_grab_triggers", "suppress_when_vrchat_foreground", "send_on_change", "oversample", "filter_enabled"]:
+            cfg[k] = bool(cfg[k])
+
+        cfg["voice_mode"] = str(cfg.get("voice_mode", "pulse")).lower()
+        if cfg["voice_mode"] not in ("pulse", "hold"):
+            cfg["voice_mode"] = "pulse"
+
+        cfg["sched_policy"] = str(cfg.get("sched_policy", "skip")).lower()
+        if cfg["sched_policy"] not in ("skip", "catchup"):
+            cfg["sched_policy"] = "skip"
+
+        cfg["osc_transport"] = str(cfg.get("osc_transport", "message")).lower()
+        if cfg["osc_transport"] not in ("message", "bundle"):
+            cfg["osc_transport"] = "message"
+
+        cfg["axis_fold"] = str(cfg.get("axis_fold", "latest")).lower()
+        if cfg["axis_fold"] not in ("latest", "peak"):
+            cfg["axis_fold"] = "latest"
+
+        return cfg
+
+    def apply_cfg(self, cfg: dict):
+        self.cfg = cfg
+        for k, var in self.vars.items():
+            if k in cfg:
+                var.set(cfg[k])
+
+    def on_load(self):
+        try:
+            self.apply_cfg(load_config())
+        except ConfigError as e:
+            messagebox.showerror("設定エラー", f"config.json を読み込めませんでした。\n{e}", parent=self)
+            return
+        messagebox.showinfo("読み込み", "config.json を読み込みました。")
+
+    def on_save(self):
+        try:
+            cfg = validate_config(self.gather())
+        except ConfigError as e:
+            messagebox.showerror("設定エラー", str(e), parent=self)
+            return
+        save_config(cfg)
+        if self.on_saved is not None:
+            self.on_saved(cfg)
+        messagebox.showinfo("保存", "config.json に保存しました。\n実行中なら自動で反映されます。")
+
+    def on_preview(self):
+        win = self.preview_win
+        if win is not None and win.winfo_exists():
+            win.lift()
+            return
+        self.preview_win = PreviewWindow(self, self.preview_source)
+
+    def on_profiles(self):
+        win = self.profile_win
+        if win is not None and win.winfo_exists():
+            win.lift()
+            return
+        self.profile_win = ProfileWindow(self)
+
+    def on_default(self):
+        self.apply_cfg(validate_config({}))
+        messagebox.showinfo("デフォルト", "デフォルト設定を読み込みました（未保存）。")
+
+class ProfileWindow(tk.Toplevel):
+    # config の profiles を編集する。OK で設定画面の編集中の値に戻し、保存は設定画面の「保存」で行う
+    # 上書きする設定はトップレベルと同じキーを JSON で書く（例: {"look_gain": 0.5, "vrc_port": 9100}）
+    def __init__(self, app: App):
+        super().__init__(app)
+        self.title("pad2osc - プロファイル")
+        self.geometry("640x400")
+        self.app = app
+        self.profiles = [dict(p) for p in app.cfg.get("profiles", [])]
+        self.current = None
+
+        frame = ttk.Frame(self, padding=10)
+        frame.pack(fill="both", expand=True)
+        frame.grid_columnconfigure(1, weight=1)
+        frame.grid_rowconfigure(0, weight=1)
+
+        left = ttk.Frame(frame)
+        left.grid(row=0, column=0, sticky="ns", padx=(0, 10))
+        self.listbox = tk.Listbox(left, width=20, exportselection=False)
+        self.listbox.pack(fill="y", expand=True)
+        self.listbox.bind("<<ListboxSelect>>", self._on_select)
+        buttons = ttk.Frame(left)
+        buttons.pack(fill="x", pady=(6, 0))
+        ttk.Button(buttons, text="追加", command=self.on_add).pack(side="left")
+        ttk.Button(buttons, text="削除", command=self.on_remove).pack(side="left", padx=(6, 0))
+
+        edit = ttk.Frame(frame)
+        edit.grid(row=0, column=1, sticky="nsew")
+        self.name = tk.StringVar()
+        self.processes = tk.StringVar()
+        self.suppress = tk.BooleanVar()
+        app._row(edit, 0, "名前", ttk.Entry(edit, textvariable=self.name))
+        app._row(edit, 1, "プロセス名（カンマ区切り）", ttk.Entry(edit, textvariable=self.processes))
+        ttk.Checkbutton(edit, text="このアプリが前面のときは送信しない", variable=self.suppress).grid(
+            row=2, column=0, columnspan=2, sticky="w", pady=(6,0)
+        )
+        ttk.Label(edit, text="上書きする設定（JSON）").grid(row=3, column=0, columnspan=2, sticky="w", pady=(6,0))
+        self.overrides = tk.Text(edit, height=10, width=40, font=("Consolas", 10))
+        self.overrides.grid(row=4, column=0, columnspan=2, sticky="nsew")
+        edit.grid_rowconfigure(4, weight=1)
+
+        bottom = ttk.Frame(frame)
+        bottom.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(10, 0))
+        ttk.Button(bottom, text="OK", command=self.on_ok).pack(side="right")
+        ttk.Button(bottom, text="キャンセル", command=self.destroy).pack(side="right", padx=(0, 8))
+
+        self._refresh()
+        if self.profiles:
+            self._select(0)
+
+    def _refresh(self):
+        self.listbox.delete(0, "end")
+        for i, prof in enumerate(self.profiles):
+            self.listbox.insert("end", prof["name"] or f"(プロファイル {i + 1})")
+
+    def _select(self, i: int):
+        self.current = i
+        self.listbox.selection_clear(0, "end")
+        self.listbox.selection_set(i)
+        prof = self.profiles[i]
+        self.name.set(prof["name"])
+        self.processes.set(", ".join(prof["processes"]))
+        self.suppress.set(prof["suppress"])
+        overrides = {k: v for k, v in prof.items() if k not in PROFILE_DEFAULTS}
+        self.overrides.delete("1.0", "end")
+        self.overrides.insert("1.0", json.dumps(overrides, ensure_ascii=False, indent=2))
+
+    def _store(self) -> bool:
+        # 編集欄 → self.profiles[current]。JSON が壊れていれば False（選択を移さない）
+        if self.current is None:
+            return True
+        text = self.overrides.get("1.0", "end").strip()
+        try:
+            overrides = json.loads(text) if text else {}
+        except ValueError as e:
+            messagebox.showerror("設定エラー", f"上書きする設定の JSON が不正です。\n{e}", parent=self)
+            return False
+        if not isinstance(overrides, dict):
+            messagebox.showerror("設定エラー", "上書きする設定は JSON オブジェクト（{...}）で書いてください。", parent=self)
+            return False
+        self.profiles[self.current] = {
+            **overrides,
+            "name": self.name.get().strip(),
+            "processes": [p.strip() for p in self.processes.get().split(",") if p.strip()],
+            "suppress": bool(self.suppress.get()),
+        }
+        return True
+
+    def _on_select(self, _event):
+        sel = self.listbox.curselection()
+        if not sel or sel[0] == self.current:
+            return
+        if not self._store():
+            self.listbox.selection_clear(0, "end")
+            self.listbox.selection_set(self.current)
+            return
+        self._refresh()
+        self._select(sel[0])
+
+    def on_add(self):
+        if not self._store():
+            return
+        self.profiles.append({**PROFILE_DEFAULTS, "name": f"プロファイル {len(self.profiles) + 1}", "processes": []})
+        self._refresh()
+        self._select(len(self.profiles) - 1)
+
+    def on_remove(self):
+        if self.current is None:
+            return
+        del self.profiles[self.current]
+        self.current = None
+        self._refresh()
+        if self.profiles:
+            self._select(0)
+        else:
+            self.name.set("")
+            self.processes.set("")
+            self.suppress.set(False)
+            self.overrides.delete("1.0", "end")
+
+    def on_ok(self):
+        if not self._store():
+            return
+        try:
+            cfg = validate_config({**self.app.gather(), "profiles": self.profiles})
+        except ConfigError as e:
+            messagebox.showerror("設定エラー", str(e), parent=self)
+            return
+        self.app.cfg = {**self.app.cfg, "profiles": cfg["profiles"]}
+        self.destroy()
+
+class PreviewWindow(tk.Toplevel):
+    # 生の入力・送信値・カーブを ~30fps で表示する。カーブは設定画面の編集中の値で描く（未保存でも見える）
+    # engine 側はプレビューを開いている間だけ PreviewRing に書く
+    INTERVAL_MS = 33
+    TRAIL = 24
+    BOX = 160
+    PLOT_W, PLOT_H = 240, 160
+
+    def __init__(self, app: App, source):
+        super().__init__(app)
+        self.title("pad2osc - ライブプレビュー")
+        self.resizable(False, False)
+        self.app = app
+        self.source = source
+        self.ring = source.open_preview()
+
+        frame = ttk.Frame(self, padding=10)
+        frame.pack(fill="both", expand=True)
+        self.left = self._canvas(frame, "左スティック（移動）", 0, self.BOX, self.BOX)
+        self.right = self._canvas(frame, "右スティック（視点）", 1, self.BOX, self.BOX)
+        self.plot = self._canvas(frame, "カーブ（横: 入力 / 縦: 出力）", 2, self.PLOT_W, self.PLOT_H)
+        self.text = tk.StringVar(value="入力待ち…")
+        ttk.Label(frame, textvariable=self.text, font=("Consolas", 10), justify="left").grid(
+            row=2, column=0, columnspan=3, sticky="w", pady=(8, 0)
+        )
+
+        self.after_id = self.after(self.INTERVAL_MS, self._update)
+        # 設定画面ごと閉じられた場合も <Destroy> で止める
+        self.bind("<Destroy>", self._on_destroy)
+
+    def _canvas(self, parent, label, col, w, h):
+        ttk.Label(parent, text=label).grid(row=0, column=col, sticky="w", padx=(0, 10))
+        c = tk.Canvas(parent, width=w, height=h, background="#1e1e1e", highlightthickness=0)
+        c.grid(row=1, column=col, padx=(0, 10))
+        return c
+
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self.after_cancel(self.after_id)
+            self.source.close_preview()
+
+    def _params(self):
+        # 編集中の値（Spinbox が空などで読めなければ None）
+        try:
+            v = self.app.vars
+            return (
+                int(float(v["deadzone_left"].get())), int(float(v["deadzone_right"].get())),
+                float(v["curve_gamma"].get()), float(v["look_gain"].get()),
+            )
+        except (tk.TclError, ValueError):
+            return None
+
+    def _update(self):
+        self.after_id = self.after(self.INTERVAL_MS, self._update)
+        recs = self.ring.latest(self.TRAIL)
+        params = self._params()
+        if not recs or params is None:
+            return
+        dz_l, dz_r, gamma, gain = params
+        lx, ly, rx, ry, lt, rt, buttons, mx, my, kx, ky, jump, voice, gl, gr, _seq = recs[0]
+
+        self._draw_stick(self.left, recs, 0, dz_l, (mx, my))
+        self._draw_stick(self.right, recs, 2, dz_r, (kx, ky))
+        self._draw_plot(dz_l, dz_r, gamma, gain, abs(lx) / 32767, abs(mx), abs(rx) / 32767, abs(kx))
+        self.text.set(
+            f"raw   LX {lx:6d}  LY {ly:6d}  RX {rx:6d}  RY {ry:6d}  LT {lt:3d}  RT {rt:3d}  buttons 0x{buttons:04X}\n"
+            f"send  move {mx:+.3f} {my:+.3f}  look {kx:+.3f} {ky:+.3f}  jump {int(jump)}  voice {int(voice)}  grab {gl:.2f} {gr:.2f}"
+        )
+
+    def _draw_stick(self, c: tk.Canvas, recs, i: int, deadzone: int, sent):
+        # 灰: 生の入力の軌跡 / 青: 今の生の入力 / 橙: 送信値
+        size = self.BOX
+        half = size / 2
+        c.delete("all")
+        c.create_line(half, 0, half, size, fill="#333")
+        c.create_line(0, half, size, half, fill="#333")
+        r = deadzone / 32767 * half
+        c.create_oval(half - r, half - r, half + r, half + r, outline="#555")
+        pts = [(half + rec[i] / 32767 * half, half - rec[i + 1] / 32767 * half) for rec in reversed(recs)]
+        if len(pts) > 1:
+            c.create_line(*[v for p in pts for v in p], fill="#666")
+        x, y = pts[-1]
+        c.create_oval(x - 4, y - 4, x + 4, y + 4, fill="#00c8ff", outline="")
+        x, y = half + clamp(sent[0]) * half, half - clamp(sent[1]) * half
+        c.create_oval(x - 3, y - 3, x + 3, y + 3, fill="#ff9900", outline="")
+
+    def _draw_plot(self, dz_l, dz_r, gamma, gain, in_l, out_l, in_r, out_r):
+        w, h = self.PLOT_W, self.PLOT_H
+        c = self.plot
+        c.delete("all")
+        c.create_line(0, h - 1, w, h - 1, fill="#333")
+        c.create_line(0, 0, w, h, fill="#333", dash=(2, 4))
+        for dz, g, color in ((dz_l, 1.0, "#00c8ff"), (dz_r, gain, "#ff9900")):
+            pts = []
+            for k in range(51):
+                x = k / 50
+                y = clamp(apply_curve(norm_thumb(int(x * 32767), dz), gamma) * g, 0.0, 1.0)
+                pts += (x * w, h - y * h)
+            c.create_line(*pts, fill=color)
+        for x, y, color in ((in_l, out_l, "#00c8ff"), (in_r, out_r, "#ff9900")):
+            c.create_oval(x * w - 3, h - y * h - 3, x * w + 3, h - y * h + 3, fill=color, outline="")
+
+# =====================
+# Tray
+# =====================
+
+def create_tray_image():
+    img = Image.new("RGBA", (64, 64), (0, 0, 0, 0))
+    d = ImageDraw.Draw(img)
+    d.rounded_rectangle((6, 6, 58, 58), radius=14, fill=(30, 30, 30, 255))
+    d.ellipse((18, 18, 46, 46), fill=(0, 200, 255, 255))
+    return img
+
+def run_tray():
+    # Tk はメインスレッドに置く（Aboutが押せない問題の根治）
+    root = tk.Tk()
+    root.withdraw()
+
+    # 壊れた config.json はここで止める（黙ってデフォルトで動かさない）
+    try:
+        cfg = load_config()
+    except ConfigError as e:
+        messagebox.showerror(APP_TITLE, f"config.json が不正です。\n{e}", parent=root)
+        root.destroy()
+        return
+
+    # パッドの接続台数をトレイのツールチップに出す
+    connected_slots = set()
+    tray_ref = {"icon": None}
+
+    def update_title():
+        tray = tray_ref["icon"]
+        if tray is not None:
+            tray.title = f"{APP_TITLE} (パッド {len(connected_slots)}台)"
+
+    def on_controller(slot, connected):
+        if connected:
+            connected_slots.add(slot)
+        else:
+            connected_slots.discard(slot)
+        update_title()
+
+    controller_listeners.append(on_controller)
+
+    # engine start（engine_process なら別プロセス。GUI とは共有メモリだけでやりとり）
+    engine = None
+    if cfg["engine_process"]:
+        engine = EngineProcess()
+        engine.start()
+    else:
+        th = threading.Thread(target=engine_loop, daemon=True)
+        th.start()
+
+    settings_window_ref = {"win": None}
+
+    def open_settings(_icon, _item):
+        def _():
+            # 既に開いてるなら前面へ
+            win = settings_window_ref["win"]
+            if win is not None and win.winfo_exists():
+                win.deiconify()
+                win.lift()
+                win.focus_force()
+                return
+            if engine is not None:
+                settings_window_ref["win"] = App(root, on_saved=engine.reload, preview_source=engine)
+            else:
+                settings_window_ref["win"] = App(root, on_saved=core.push_config, preview_source=core)
+        root.after(0, _)
+
+    def show_about(_icon, _item):
+        def _():
+            root.attributes("-topmost", True)
+            messagebox.showinfo(APP_TITLE, f"{APP_TITLE} Version {VERSION}\nby kaguyachan\nhttps://kaguyachan.net/", parent=root)
+            root.attributes("-topmost", False)
+        root.after(0, _)
+
+    def show_stats(_icon, _item):
+        def _():
+            snap = engine.snapshot() if engine is not None else stats_snapshot()
+            lines = []
+            rate = snap.get("rate")
+            if rate is not None:
+                lines.append(f"送信レート: {rate['achieved_hz']:.1f} / {rate['target_hz']:.0f} Hz")
+                lines.append(
+                    f"ジッタ p50 {rate['jitter_p50_us']:.0f} µs / p99 {rate['jitter_p99_us']:.0f} µs / max {rate['jitter_max_us']:.0f} µs"
+                )
+                lines.append(f"tick: {snap['ticks']} / スキップ: {snap['skipped_ticks']}")
+            for d in snap.get("destinations", []):
+                lines.append(f"{d['dest']}: 送信 {d['sent']} / ドロップ {d['dropped']} / エラー {d['errors']}")
+            if snap.get("engine_restarts"):
+                lines.append(f"エンジン再起動: {snap['engine_restarts']} 回")
+            if snap["stages"]:
+                lines.append("")
+                for name, h in snap["stages"].items():
+                    lines.append(f"{name}: p50 {h['p50_us']:.1f} / p99 {h['p99_us']:.1f} / max {h['max_us']:.1f} µs")
+            elif engine is not None:
+                lines.append("\nステージ計測は別プロセスで動作中です（stats_port の JSON で確認）")
+            else:
+                lines.append("\nステージ計測は無効です（config.json の stats_enabled）")
+            root.attributes("-topmost", True)
+            messagebox.showinfo(APP_TITLE, "\n".join(lines), parent=root)
+            root.attributes("-topmost", False)
+        root.after(0, _)
+
+    def is_recording(_item=None) -> bool:
+        return engine.recording if engine is not None else core.recorder is not None
+
+    def toggle_recording(_icon, _item):
+        if not is_recording():
+            if engine is not None:
+                engine.start_recording()
+            else:
+                start_recording()
+            return
+        if engine is not None:
+            path, count = engine.stop_recording()
+        else:
+            rec = stop_recording()
+            path, count = rec.path, rec.count
+        def _():
+            root.attributes("-topmost", True)
+            messagebox.showinfo(APP_TITLE, f"記録を保存しました（{count} 件）\n{path}", parent=root)
+            root.attributes("-topmost", False)
+        root.after(0, _)
+
+    def do_exit(_icon, _item):
+        def _():
+            stop_event.set()
+            if engine is not None:
+                engine.stop()
+            try:
+                icon.stop()
+            except Exception:
+                pass
+            root.quit()
+        root.after(0, _)
+
+    icon = Icon(
+        APP_TITLE,
+        create_tray_image(),
+        APP_TITLE,
+        Menu(
+            MenuItem("設定", open_settings),
+            MenuItem("統計", show_stats),
+            MenuItem("入力を記録", toggle_recording, checked=is_recording),
+            MenuItem("バージョン情報", show_about),
+            MenuItem("終了", do_exit),
+        ),
+    )
+
+    tray_ref["icon"] = icon
+    update_title()
+
+    icon.run_detached()
+    root.mainloop()
@@ -1,19 +1,18 @@
 import ctypes
 import json
+import math
+import mmap
+import operator
 import os
+import socket
+import struct
 import sys
 import time
 import threading
+from array import array
 from dataclasses import dataclass
 from pathlib import Path
 
-import tkinter as tk
-from tkinter import ttk, messagebox
-
-from pythonosc.udp_client import SimpleUDPClient
-from pystray import Icon, MenuItem, Menu
-from PIL import Image, ImageDraw
-
 # =====================
 # App meta
 # =====================
@@ -28,31 +27,20 @@ BASE_DIR = Path(sys.executable).parent if getattr(sys, "frozen", False) else Pat
 CONFIG_PATH = BASE_DIR / "config.json"
 
 # =====================
-# GUI
+# Config
 # =====================
 
-BUTTON_CHOICES = [
-    ("None", 0),
-    ("A", 0x1000),
-    ("B", 0x2000),
-    ("X", 0x4000),
-    ("Y", 0x8000),
-    ("LB", 0x0100),
-    ("RB", 0x0200),
-    ("Back", 0x0020),
-    ("Start", 0x0010),
-    ("LS (L3)", 0x0040),
-    ("RS (R3)", 0x0080),
-    ("DPad Up", 0x0001),
-    ("DPad Down", 0x0002),
-    ("DPad Left", 0x0004),
-    ("DPad Right", 0x0008),
-]
-
 DEFAULT_CONFIG = {
     "vrc_ip": "127.0.0.1",
     "vrc_port": 9000,
     "hz": 60,
+    "poll_hz": 500,  # 入力スレッドのポーリング周期
+    # 送信周期より細かく入力を拾う（poll_hz を 1000 以上に上げ、tick間のサンプルを1フレームにまとめる）
+    # ボタンは押下/解放を取りこぼさない
+    "oversample": False,
+    "axis_fold": "latest",  # oversample 時の軸: "latest"（最新値） / "peak"（前回送信からの絶対値最大）
+    "sched_policy": "skip",  # 遅れたtick: "skip" or "catchup"
+    "osc_transport": "message",  # "message" or "bundle"
 
     "deadzone_left": 7849,
     "deadzone_right": 8689,
@@ -63,7 +51,20 @@ DEFAULT_CONFIG = {
     "look_invert_y": False,
     "curve_gamma": 1.0,
 
+    # スティックのスムージング（One Euro filter）。遅い動きほど強く、速い動きほど弱くかかる
+    # filter_predict_ms > 0 なら速度から少し先を予測してフィルタの遅れを打ち消す
+    "filter_enabled": False,
+    "filter_min_cutoff": 1.0,  # Hz（小さいほど静止時のブレを強く抑える）
+    "filter_beta": 0.5,  # 速度に応じてカットオフを上げる量（大きいほど速い動きの遅れが減る）
+    "filter_predict_ms": 0.0,
+
     "failsafe_timeout_sec": 0.25,
+    "input_backend": "auto",  # "auto" / "xinput" / "evdev" / "synthetic" / "replay"
+    "replay_file": "",  # input_backend="replay" で再生する記録ファイル（トレイの「入力を記録」で作る）
+    "replay_speed": 1.0,
+
+    "send_on_change": False,  # True: 変化した値だけ送る（keepalive_sec ごとに全値を再送）
+    "keepalive_sec": 0.5,
 
     "jump_button": "A",
     "voice_button": "Y",
@@ -82,183 +83,306 @@ DEFAULT_CONFIG = {
 
     "suppress_when_vrchat_foreground": True,
     "vrchat_process_name": "VRChat.exe",
+    "foreground_watch": "hook",  # "hook": 前面切り替えイベントで更新 / "poll": 毎tick確認（hwnd キャッシュ付き）
+
+    # True: 送信エンジンを別プロセスで動かす（GUI 操作で tick が揺れない）。変更は再起動後に反映
+    "engine_process": False,
+
+    # 計測（各ステージの処理時間ヒストグラム）。stats_port > 0 なら http://127.0.0.1:<port>/stats で JSON を返す
+    "stats_enabled": False,
+    "stats_port": 0,
+
+    # 複数パッド: [{"slot": 0, "vrc_port": 9000, ...}, {"slot": 1, "vrc_port": 9002, ...}]
+    # 各要素は上の設定を上書きする。空なら最初に見つかったパッド1台（slot "auto"）
+    "pads": [],
+
+    # 追加の送信先（同じストリームをミラーする）: ["127.0.0.1:9001", {"ip": "192.168.0.10", "port": 9000}]
+    "destinations": [],
+
+    # 追加の割り当て（アバターパラメータなど）: [{"input": "B", "address": "/avatar/parameters/Wave", "mode": "toggle"}, ...]
+    # input: ボタン名（BUTTON_MASKS）か軸 LX / LY / RX / RY / LT / RT
+    # type: "f" / "i"  mode: "hold"（入力のまま） / "toggle"（押すたびに切替） / "pulse"（押した瞬間だけ pulse_sec 秒）
+    # 軸は deadzone（0〜1）→ curve（γ）→ scale（invert で符号反転）。軸の toggle / pulse はデッドゾーンを超えたら押下扱い
+    "rules": [],
+
+    # 前面アプリごとのプロファイル: [{"name": "配信", "processes": ["obs64.exe"], "look_gain": 0.5, "vrc_port": 9100}, ...]
+    # processes のどれかが前面のとき、そのプロファイルの値で上の設定と pads の各要素を上書きする（どれにも当たらなければ上の設定のまま）
+    # suppress: true なら送信しない。入力まわりなど PROFILE_GLOBAL_KEYS はプロファイルごとには変えられない
+    "profiles": [],
 }
 
-def load_config() -> dict:
-    if CONFIG_PATH.exists():
-        try:
-            return json.loads(CONFIG_PATH.read_text(encoding="utf-8"))
-        except Exception:
-            pass
-    return DEFAULT_CONFIG.copy()
+PROFILE_DEFAULTS = {"name": "", "processes": [], "suppress": False}
+PROFILE_GLOBAL_KEYS = (
+    "pads", "profiles", "input_backend", "replay_file", "replay_speed", "poll_hz", "oversample", "axis_fold",
+    "foreground_watch", "engine_process", "stats_enabled", "stats_port",
+    "suppress_when_vrchat_foreground", "vrchat_process_name",
+)
+
+RULE_AXES = {"LX": "sThumbLX", "LY": "sThumbLY", "RX": "sThumbRX", "RY": "sThumbRY", "LT": "bLeftTrigger", "RT": "bRightTrigger"}
+RULE_DEFAULTS = {
+    "input": "",
+    "address": "",
+    "type": "f",
+    "mode": "hold",
+    "deadzone": 0.0,
+    "curve": 1.0,
+    "scale": 1.0,
+    "invert": False,
+    "pulse_sec": 0.06,
+}
+RULE_CHOICES = {
+    "type": ("f", "i"),
+    "mode": ("hold", "toggle", "pulse"),
+}
+RULE_RANGES = {
+    "deadzone": (0.0, 0.99),
+    "curve": (0.1, 10.0),
+    "scale": (-1000.0, 1000.0),
+    "pulse_sec": (0.001, 10.0),
+}
 
-def save_config(cfg: dict):
-    CONFIG_PATH.write_text(json.dumps(cfg, ensure_ascii=False, indent=2), encoding="utf-8")
-
-class App(tk.Toplevel):
-    # ★exe統合のため Tk() ではなく Toplevel で開く（UI仕様は同じ）
-    def __init__(self, master: tk.Tk):
-        super().__init__(master)
-        self.title("pad2osc - 設定")
-        self.geometry("900x540")
-        self.minsize(860, 500)
-
-        self.cfg = load_config()
-        self.vars = {}
-        self._build()
-
-        # 二重起動防止（同一プロセス内で複数開いてもOKだが、見た目が嫌ならここで制御可能）
-        self.protocol("WM_DELETE_WINDOW", self.destroy)
-
-    def _combo_button(self, parent, var):
-        values = [n.split()[0] for n, _ in BUTTON_CHOICES]
-        return ttk.Combobox(parent, textvariable=var, values=values, width=10, state="readonly")
-
-    def _row(self, parent, r, label, widget):
-        ttk.Label(parent, text=label).grid(row=r, column=0, sticky="w", padx=(0,10), pady=4)
-        widget.grid(row=r, column=1, sticky="we", pady=4)
-        parent.grid_columnconfigure(1, weight=1)
-
-    def _build(self):
-        pad = 12
-        root = ttk.Frame(self, padding=pad)
-        root.pack(fill="both", expand=True)
-
-        left = ttk.Frame(root)
-        right = ttk.Frame(root)
-        left.grid(row=0, column=0, sticky="nsew", padx=(0, pad))
-        right.grid(row=0, column=1, sticky="nsew")
-        root.grid_columnconfigure(0, weight=1)
-        root.grid_columnconfigure(1, weight=1)
-
-        # ---- Left: Connection + Tuning ----
-        lf_conn = ttk.Labelframe(left, text="接続", padding=pad)
-        lf_conn.pack(fill="x", pady=(0, pad))
-
-        self.vars["vrc_ip"] = tk.StringVar(value=self.cfg.get("vrc_ip", DEFAULT_CONFIG["vrc_ip"]))
-        self.vars["vrc_port"] = tk.IntVar(value=int(self.cfg.get("vrc_port", DEFAULT_CONFIG["vrc_port"])))
-        self.vars["hz"] = tk.IntVar(value=int(self.cfg.get("hz", DEFAULT_CONFIG["hz"])))
-
-        self._row(lf_conn, 0, "VRChat IP", ttk.Entry(lf_conn, textvariable=self.vars["vrc_ip"], width=18))
-        self._row(lf_conn, 1, "VRChat Port", ttk.Spinbox(lf_conn, from_=1, to=65535, textvariable=self.vars["vrc_port"], width=10))
-        self._row(lf_conn, 2, "送信Hz", ttk.Spinbox(lf_conn, from_=10, to=240, textvariable=self.vars["hz"], width=10))
-
-        # ★追加：前面抑制
-        self.vars["suppress_when_vrchat_foreground"] = tk.BooleanVar(
-            value=bool(self.cfg.get("suppress_when_vrchat_foreground", True))
-        )
-        ttk.Checkbutton(
-            lf_conn,
-            text="VRChatがアクティブならOSC送信しない",
-            variable=self.vars["suppress_when_vrchat_foreground"],
-        ).grid(row=3, column=0, columnspan=2, sticky="w", pady=(6,0))
-
-        self.vars["vrchat_process_name"] = tk.StringVar(value=str(self.cfg.get("vrchat_process_name", "VRChat.exe")))
-        self._row(lf_conn, 4, "VRChatプロセス名", ttk.Entry(lf_conn, textvariable=self.vars["vrchat_process_name"], width=18))
-
-        lf_tune = ttk.Labelframe(left, text="チューニング", padding=pad)
-        lf_tune.pack(fill="both", expand=True)
-
-        self.vars["deadzone_left"] = tk.IntVar(value=int(self.cfg.get("deadzone_left", DEFAULT_CONFIG["deadzone_left"])))
-        self.vars["deadzone_right"] = tk.IntVar(value=int(self.cfg.get("deadzone_right", DEFAULT_CONFIG["deadzone_right"])))
-        self.vars["trigger_threshold"] = tk.IntVar(value=int(self.cfg.get("trigger_threshold", DEFAULT_CONFIG["trigger_threshold"])))
-
-        self.vars["move_invert_y"] = tk.BooleanVar(value=bool(self.cfg.get("move_invert_y", DEFAULT_CONFIG["move_invert_y"])))
-        self.vars["look_gain"] = tk.DoubleVar(value=float(self.cfg.get("look_gain", DEFAULT_CONFIG["look_gain"])))
-        self.vars["look_invert_y"] = tk.BooleanVar(value=bool(self.cfg.get("look_invert_y", DEFAULT_CONFIG["look_invert_y"])))
-        self.vars["curve_gamma"] = tk.DoubleVar(value=float(self.cfg.get("curve_gamma", DEFAULT_CONFIG["curve_gamma"])))
-        self.vars["failsafe_timeout_sec"] = tk.DoubleVar(value=float(self.cfg.get("failsafe_timeout_sec", DEFAULT_CONFIG["failsafe_timeout_sec"])))
-
-        self._row(lf_tune, 0, "左デッドゾーン", ttk.Spinbox(lf_tune, from_=0, to=20000, textvariable=self.vars["deadzone_left"], width=10))
-        self._row(lf_tune, 1, "右デッドゾーン", ttk.Spinbox(lf_tune, from_=0, to=20000, textvariable=self.vars["deadzone_right"], width=10))
-        self._row(lf_tune, 2, "トリガ閾値", ttk.Spinbox(lf_tune, from_=0, to=255, textvariable=self.vars["trigger_threshold"], width=10))
-
-        ttk.Checkbutton(lf_tune, text="移動Y反転", variable=self.vars["move_invert_y"]).grid(row=3, column=0, columnspan=2, sticky="w", pady=(6,0))
-        ttk.Checkbutton(lf_tune, text="視点Y反転", variable=self.vars["look_invert_y"]).grid(row=4, column=0, columnspan=2, sticky="w")
-
-        self._row(lf_tune, 5, "視点感度", ttk.Scale(lf_tune, from_=0.1, to=3.0, variable=self.vars["look_gain"], orient="horizontal"))
-        self._row(lf_tune, 6, "カーブ γ（1.0=線形）", ttk.Scale(lf_tune, from_=1.0, to=2.4, variable=self.vars["curve_gamma"], orient="horizontal"))
-        self._row(lf_tune, 7, "フェイルセーフ秒", ttk.Scale(lf_tune, from_=0.05, to=1.0, variable=self.vars["failsafe_timeout_sec"], orient="horizontal"))
-
-        # ---- Right: Buttons + Addresses ----
-        lf_btn = ttk.Labelframe(right, text="ボタン割り当て", padding=pad)
-        lf_btn.pack(fill="x", pady=(0, pad))
-
-        self.vars["jump_button"] = tk.StringVar(value=str(self.cfg.get("jump_button", DEFAULT_CONFIG["jump_button"])))
-        self.vars["voice_button"] = tk.StringVar(value=str(self.cfg.get("voice_button", DEFAULT_CONFIG["voice_button"])))
-        self.vars["voice_mode"] = tk.StringVar(value=str(self.cfg.get("voice_mode", DEFAULT_CONFIG["voice_mode"])))
-
-        self._row(lf_btn, 0, "Jump", self._combo_button(lf_btn, self.vars["jump_button"]))
-        self._row(lf_btn, 1, "Voice (Mic)", self._combo_button(lf_btn, self.vars["voice_button"]))
-
-        voice_mode = ttk.Combobox(lf_btn, textvariable=self.vars["voice_mode"], values=["pulse", "hold"], width=10, state="readonly")
-        self._row(lf_btn, 2, "Voice mode", voice_mode)
-        ttk.Label(lf_btn, text='pulse=0→1→0（Toggle Voice向け） / hold=押してる間1（PTT向け）').grid(
-            row=3, column=0, columnspan=2, sticky="w", pady=(0,6)
-        )
+class ConfigError(ValueError):
+    pass
 
-        self.vars["enable_grab_triggers"] = tk.BooleanVar(value=bool(self.cfg.get("enable_grab_triggers", True)))
-        ttk.Checkbutton(lf_btn, text="トリガーでGrab（LT=Left / RT=Right）", variable=self.vars["enable_grab_triggers"]).grid(
-            row=4, column=0, columnspan=2, sticky="w", pady=(6,0)
-        )
+CONFIG_CHOICES = {
+    "voice_mode": ("pulse", "hold"),
+    "osc_transport": ("message", "bundle"),
+    "sched_policy": ("skip", "catchup"),
+    "input_backend": ("auto", "xinput", "evdev", "synthetic", "replay"),
+    "axis_fold": ("latest", "peak"),
+    "foreground_watch": ("hook", "poll"),
+}
+
+CONFIG_RANGES = {
+    "vrc_port": (1, 65535),
+    "hz": (1, 1000),
+    "poll_hz": (1, 10000),
+    "deadzone_left": (0, 32766),
+    "deadzone_right": (0, 32766),
+    "trigger_threshold": (0, 254),
+    "look_gain": (0.0, 100.0),
+    "curve_gamma": (0.1, 10.0),
+    "failsafe_timeout_sec": (0.0, 60.0),
+    "filter_min_cutoff": (0.01, 100.0),
+    "filter_beta": (0.0, 100.0),
+    "filter_predict_ms": (0.0, 100.0),
+    "keepalive_sec": (0.01, 60.0),
+    "stats_port": (0, 65535),
+    "replay_speed": (0.01, 100.0),
+}
 
-        lf_addr = ttk.Labelframe(right, text="OSCアドレス", padding=pad)
-        lf_addr.pack(fill="both", expand=True)
-
-        for k, label, r in [
-            ("addr_move_x", "Horizontal", 0),
-            ("addr_move_y", "Vertical", 1),
-            ("addr_look_x", "LookHorizontal", 2),
-            ("addr_look_y", "LookVertical", 3),
-            ("addr_jump", "Jump", 4),
-            ("addr_voice", "Voice", 5),
-        ]:
-            self.vars[k] = tk.StringVar(value=str(self.cfg.get(k, DEFAULT_CONFIG[k])))
-            self._row(lf_addr, r, label, ttk.Entry(lf_addr, textvariable=self.vars[k], width=36))
-
-        bottom = ttk.Frame(root)
-        bottom.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(pad,0))
-
-        ttk.Button(bottom, text="読み込み", command=self.on_load).pack(side="left")
-        ttk.Button(bottom, text="保存", command=self.on_save).pack(side="left", padx=(8,0))
-        ttk.Button(bottom, text="デフォルト", command=self.on_default).pack(side="left", padx=(8,0))
-        ttk.Label(bottom, text=f"保存先: {CONFIG_PATH.name}").pack(side="right")
-
-    def gather(self) -> dict:
-        cfg = {k: v.get() for k, v in self.vars.items()}
-
-        for k in ["vrc_port", "hz", "deadzone_left", "deadzone_right", "trigger_threshold"]:
-            cfg[k] = int(float(cfg[k]))
-        for k in ["look_gain", "curve_gamma", "failsafe_timeout_sec"]:
-            cfg[k] = float(cfg[k])
-        for k in ["move_invert_y", "look_invert_y", "enable_grab_triggers", "suppress_when_vrchat_foreground"]:
-            cfg[k] = bool(cfg[k])
-
-        cfg["voice_mode"] = str(cfg.get("voice_mode", "pulse")).lower()
-        if cfg["voice_mode"] not in ("pulse", "hold"):
-            cfg["voice_mode"] = "pulse"
-
-        cfg["grab_left_addr"] = DEFAULT_CONFIG["grab_left_addr"]
-        cfg["grab_right_addr"] = DEFAULT_CONFIG["grab_right_addr"]
+def _check_value(key: str, value, where: str = ""):
+    # DEFAULT_CONFIG の型に合わせて検査する（bool は int 扱いしない / float 欄は int も可）
+    default = DEFAULT_CONFIG[key]
+    if isinstance(default, bool):
+        ok = isinstance(value, bool)
+    elif isinstance(default, int):
+        ok = isinstance(value, int) and not isinstance(value, bool)
+    elif isinstance(default, float):
+        ok = isinstance(value, (int, float)) and not isinstance(value, bool)
+    else:
+        ok = isinstance(value, type(default))
+    if not ok:
+        raise ConfigError(f"{where}{key}: expected {type(default).__name__}, got {value!r}")
+    if key in CONFIG_CHOICES and value not in CONFIG_CHOICES[key]:
+        raise ConfigError(f"{where}{key}: must be one of {', '.join(CONFIG_CHOICES[key])}, got {value!r}")
+    if key in CONFIG_RANGES:
+        lo, hi = CONFIG_RANGES[key]
+        if not lo <= value <= hi:
+            raise ConfigError(f"{where}{key}: must be between {lo} and {hi}, got {value!r}")
+    if key in ("jump_button", "voice_button") and value not in BUTTON_MASKS:
+        raise ConfigError(f"{where}{key}: unknown button {value!r}")
+    if (key.startswith("addr_") or key.endswith("_addr")) and not value.startswith("/"):
+        raise ConfigError(f"{where}{key}: OSC address must start with '/', got {value!r}")
+    if key == "rules":
+        for i, rule in enumerate(value):
+            _check_rule(rule, f"{where}rules[{i}].")
+    if key == "destinations":
+        for e in value:
+            try:
+                parse_dest(e)
+            except (KeyError, TypeError, ValueError):
+                raise ConfigError(f"{where}{key}: bad destination {e!r}") from None
+    return float(value) if isinstance(default, float) else value
+
+def _check_rule(rule, where: str):
+    if not isinstance(rule, dict):
+        raise ConfigError(f"{where[:-1]}: must be an object")
+    for key, value in rule.items():
+        if key not in RULE_DEFAULTS:
+            raise ConfigError(f"{where}{key}: unknown key")
+        default = RULE_DEFAULTS[key]
+        if isinstance(default, bool):
+            ok = isinstance(value, bool)
+        elif isinstance(default, float):
+            ok = isinstance(value, (int, float)) and not isinstance(value, bool)
+        else:
+            ok = isinstance(value, str)
+        if not ok:
+            raise ConfigError(f"{where}{key}: expected {type(default).__name__}, got {value!r}")
+        if key in RULE_CHOICES and value not in RULE_CHOICES[key]:
+            raise ConfigError(f"{where}{key}: must be one of {', '.join(RULE_CHOICES[key])}, got {value!r}")
+        if key in RULE_RANGES:
+            lo, hi = RULE_RANGES[key]
+            if not lo <= value <= hi:
+                raise ConfigError(f"{where}{key}: must be between {lo} and {hi}, got {value!r}")
+    name = rule.get("input")
+    if name not in RULE_AXES and (name not in BUTTON_MASKS or name == "None"):
+        raise ConfigError(f"{where}input: must be a button ({', '.join(list(BUTTON_MASKS)[1:])}) or axis ({', '.join(RULE_AXES)}), got {name!r}")
+    if not str(rule.get("address", "")).startswith("/"):
+        raise ConfigError(f"{where}address: OSC address must start with '/', got {rule.get('address')!r}")
+
+def validate_config(raw) -> dict:
+    if not isinstance(raw, dict):
+        raise ConfigError("config must be a JSON object")
+    cfg = DEFAULT_CONFIG.copy()
+    for key, value in raw.items():
+        if key not in DEFAULT_CONFIG:
+            raise ConfigError(f"unknown key: {key}")
+        cfg[key] = _check_value(key, value)
+
+    pads = []
+    for i, entry in enumerate(cfg["pads"]):
+        where = f"pads[{i}]."
+        if not isinstance(entry, dict):
+            raise ConfigError(f"pads[{i}]: must be an object")
+        pad = {}
+        for key, value in entry.items():
+            if key == "slot":
+                if value != "auto" and not (isinstance(value, int) and not isinstance(value, bool) and 0 <= value < MAX_SLOTS):
+                    raise ConfigError(f"{where}slot: must be 0-{MAX_SLOTS - 1} or \"auto\", got {value!r}")
+                pad[key] = value
+            elif key in ("pads", "profiles") or key not in DEFAULT_CONFIG:
+                raise ConfigError(f"{where}{key}: unknown key")
+            else:
+                pad[key] = _check_value(key, value, where)
+        pads.append(pad)
+    cfg["pads"] = pads
+    cfg["profiles"] = _check_profiles(cfg["profiles"])
+    cfg["destinations"] = list(cfg["destinations"])
+    if cfg["input_backend"] == "replay" and not cfg["replay_file"]:
+        raise ConfigError("replay_file: required when input_backend is \"replay\"")
+    return cfg
+
+def _check_profiles(entries) -> list:
+    profiles = []
+    owner = {}  # 小文字のプロセス名 → 最初に書いたプロファイル
+    for i, entry in enumerate(entries):
+        where = f"profiles[{i}]."
+        if not isinstance(entry, dict):
+            raise ConfigError(f"profiles[{i}]: must be an object")
+        prof = {key: list(value) if isinstance(value, list) else value for key, value in PROFILE_DEFAULTS.items()}
+        for key, value in entry.items():
+            if key == "name":
+                if not isinstance(value, str):
+                    raise ConfigError(f"{where}name: expected str, got {value!r}")
+            elif key == "processes":
+                if not isinstance(value, list) or not all(isinstance(v, str) and v for v in value):
+                    raise ConfigError(f"{where}processes: expected a list of process names, got {value!r}")
+                value = list(value)
+            elif key == "suppress":
+                if not isinstance(value, bool):
+                    raise ConfigError(f"{where}suppress: expected bool, got {value!r}")
+            elif key in PROFILE_GLOBAL_KEYS:
+                raise ConfigError(f"{where}{key}: cannot be set per profile")
+            elif key not in DEFAULT_CONFIG:
+                raise ConfigError(f"{where}{key}: unknown key")
+            else:
+                value = _check_value(key, value, where)
+            prof[key] = value
+        if not prof["processes"]:
+            raise ConfigError(f"{where}processes: at least one process name is required")
+        for name in prof["processes"]:
+            if name.lower() in owner:
+                raise ConfigError(f"{where}processes: {name!r} is already used by profiles[{owner[name.lower()]}]")
+            owner[name.lower()] = i
+        profiles.append(prof)
+    return profiles
+
+def load_config() -> dict:
+    # ファイルが無ければデフォルト。壊れていれば ConfigError（黙ってデフォルトに戻さない）
+    if not CONFIG_PATH.exists():
+        return validate_config({})
+    try:
+        raw = json.loads(CONFIG_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"{CONFIG_PATH.name}: {e}") from e
+    return validate_config(raw)
+
+def save_config(cfg: dict):
+    # 一時ファイルに書いてから置き換える（engine や外部ツールが書きかけの config.json を読まない）
+    tmp = CONFIG_PATH.with_name(CONFIG_PATH.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cfg, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    for attempt in range(CONFIG_REPLACE_RETRIES):
+        try:
+            os.replace(tmp, CONFIG_PATH)
+            return
+        except PermissionError:
+            # Windows: 他のプロセスが読んでいる間は置き換えられない。少し待って再試行
+            if attempt == CONFIG_REPLACE_RETRIES - 1:
+                raise
+            time.sleep(0.05)
+
+# config の受け渡し
+# 設定ウィンドウ（同じプロセス）は push_config で検証済みの dict を直接渡し、engine は次の tick で反映する
+# 外部エディタでの変更は ConfigWatcher が別スレッドで低頻度に拾う（engine の tick では stat しない）
+
+CONFIG_WATCH_SEC = 1.0
+CONFIG_REPLACE_RETRIES = 10
+
+class ConfigChannel:
+    # 最新の1件だけを保持する（連続で保存されたら最後のものだけ反映）
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = None
+
+    def push(self, cfg: dict):
+        with self.lock:
+            self.pending = cfg
+
+    def take(self):
+        # engine 側。pending が無ければロックも取らない
+        if self.pending is None:
+            return None
+        with self.lock:
+            cfg, self.pending = self.pending, None
         return cfg
 
-    def apply_cfg(self, cfg: dict):
-        self.cfg = cfg
-        for k, var in self.vars.items():
-            if k in cfg:
-                var.set(cfg[k])
+config_channel = ConfigChannel()
 
-    def on_load(self):
-        self.apply_cfg(load_config())
-        messagebox.showinfo("読み込み", "config.json を読み込みました。")
+def push_config(cfg: dict):
+    # cfg は validate_config 済みであること
+    config_channel.push(cfg)
 
-    def on_save(self):
-        save_config(self.gather())
-        messagebox.showinfo("保存", "config.json に保存しました。\n実行中なら自動で反映されます。")
+class ConfigWatcher(threading.Thread):
+    # CONFIG_PATH の mtime / size が変わったら読み直して channel に送る。壊れていれば送らない
+    def __init__(self, channel: ConfigChannel, interval: float = None):
+        super().__init__(daemon=True, name="config-watch")
+        self.channel = channel
+        self.interval = CONFIG_WATCH_SEC if interval is None else interval
+        self.stop = threading.Event()
+        self.key = self._stat()
 
-    def on_default(self):
-        self.apply_cfg(DEFAULT_CONFIG.copy())
-        messagebox.showinfo("デフォルト", "デフォルト設定を読み込みました（未保存）。")
+    def _stat(self):
+        try:
+            st = CONFIG_PATH.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def run(self):
+        while not self.stop.wait(self.interval):
+            key = self._stat()
+            if key is None or key == self.key:
+                continue
+            self.key = key
+            try:
+                self.channel.push(load_config())
+            except ConfigError as e:
+                print(f"{APP_TITLE}: config not applied: {e}", file=sys.stderr)
 
 # =====================
 # Engine (run.py の中身相当：前面抑制＋zero_all＋failsafe＋auto reload)
@@ -283,44 +407,132 @@ def apply_curve(v: float, gamma: float) -> float:
     s = 1.0 if v >= 0 else -1.0
     return s * (abs(v) ** gamma)
 
+# Lookup tables: 入力は 16bit スティック / 8bit トリガーだけなので
+# deadzone + curve + gain + invert を config 読み込み時に全入力値ぶん計算しておく
+STICK_LUT_OFFSET = 32768  # index = sThumb + 32768
+
+def build_stick_lut(deadzone: int, gamma: float, gain: float) -> array:
+    return array("f", [apply_curve(norm_thumb(v, deadzone), gamma) * gain for v in range(-32768, 32768)])
+
+def build_trigger_lut(threshold: int, gamma: float = 1.0, gain: float = 1.0) -> array:
+    return array("f", [apply_curve(norm_trigger(v, threshold), gamma) * gain for v in range(256)])
+
+_lut_cache = {}  # 前回の compile_config で作ったテーブル（同じパラメータなら再利用）
+
+def get_lut(luts: dict, key: tuple) -> array:
+    lut = luts.get(key)
+    if lut is None:
+        lut = _lut_cache.get(key)
+        if lut is None:
+            if key[0] == "stick" and key[3] != 1.0:
+                # gain 違いは gain=1.0 のテーブルを掛け算するだけ（curve を何度も計算しない）
+                gain = key[3]
+                lut = array("f", [v * gain for v in get_lut(luts, key[:3] + (1.0,))])
+            elif key[0] == "stick":
+                lut = build_stick_lut(*key[1:])
+            else:
+                lut = build_trigger_lut(*key[1:])
+        luts[key] = lut
+    return lut
+
+# One Euro filter（Casiez et al. 2012）。1サンプル O(1)、dt は実際の tick 間隔
+FILTER_D_CUTOFF = 1.0  # 速度推定のカットオフ Hz
+FILTER_MAX_DT = 0.1  # 間が空いたら（抑制明けなど）そこから追い直す
+
+def smoothing_alpha(cutoff: float, dt: float) -> float:
+    tau = 1.0 / (2.0 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+class OneEuro:
+    __slots__ = ("min_cutoff", "beta", "lead", "y", "dy", "primed")
+
+    def __init__(self, min_cutoff: float, beta: float, lead: float = 0.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.lead = lead  # 予測する秒数
+        self.reset()
+
+    def reset(self):
+        self.y = 0.0
+        self.dy = 0.0
+        self.primed = False
+
+    def __call__(self, x: float, dt: float) -> float:
+        if not self.primed or dt <= 0.0 or dt > FILTER_MAX_DT:
+            self.y = x
+            self.dy = 0.0
+            self.primed = True
+            return x
+        dy = self.dy + smoothing_alpha(FILTER_D_CUTOFF, dt) * ((x - self.y) / dt - self.dy)
+        y = self.y + smoothing_alpha(self.min_cutoff + self.beta * abs(dy), dt) * (x - self.y)
+        self.dy = dy
+        self.y = y
+        if self.lead:
+            # 予測はフィルタ値と生の入力の間に収める（遅れは取り戻すが、生の入力を追い越さない）
+            # 速度の向きと逆側に生の入力がある（ノイズ・折り返し）ときはフィルタ値のまま
+            p = y + dy * self.lead
+            y = min(max(p, min(y, x)), max(y, x))
+        return y if abs(y) >= 1e-4 else 0.0
+
 # Foreground process name (robust: QueryFullProcessImageNameW)
-kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
-user32 = ctypes.WinDLL("user32", use_last_error=True)
-
-GetForegroundWindow = user32.GetForegroundWindow
-GetWindowThreadProcessId = user32.GetWindowThreadProcessId
-OpenProcess = kernel32.OpenProcess
-CloseHandle = kernel32.CloseHandle
-QueryFullProcessImageNameW = kernel32.QueryFullProcessImageNameW
-
-PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
-
-GetForegroundWindow.restype = ctypes.c_void_p
-GetWindowThreadProcessId.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_uint)]
-GetWindowThreadProcessId.restype = ctypes.c_uint
-OpenProcess.argtypes = [ctypes.c_uint, ctypes.c_int, ctypes.c_uint]
-OpenProcess.restype = ctypes.c_void_p
-CloseHandle.argtypes = [ctypes.c_void_p]
-CloseHandle.restype = ctypes.c_int
-QueryFullProcessImageNameW.argtypes = [
-    ctypes.c_void_p, ctypes.c_uint, ctypes.c_wchar_p, ctypes.POINTER(ctypes.c_uint)
-]
-QueryFullProcessImageNameW.restype = ctypes.c_int
+if sys.platform == "win32":
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    user32 = ctypes.WinDLL("user32", use_last_error=True)
+
+    GetForegroundWindow = user32.GetForegroundWindow
+    GetWindowThreadProcessId = user32.GetWindowThreadProcessId
+    OpenProcess = kernel32.OpenProcess
+    CloseHandle = kernel32.CloseHandle
+    QueryFullProcessImageNameW = kernel32.QueryFullProcessImageNameW
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+    GetForegroundWindow.restype = ctypes.c_void_p
+    GetWindowThreadProcessId.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_uint)]
+    GetWindowThreadProcessId.restype = ctypes.c_uint
+    OpenProcess.argtypes = [ctypes.c_uint, ctypes.c_int, ctypes.c_uint]
+    OpenProcess.restype = ctypes.c_void_p
+    CloseHandle.argtypes = [ctypes.c_void_p]
+    CloseHandle.restype = ctypes.c_int
+    QueryFullProcessImageNameW.argtypes = [
+        ctypes.c_void_p, ctypes.c_uint, ctypes.c_wchar_p, ctypes.POINTER(ctypes.c_uint)
+    ]
+    QueryFullProcessImageNameW.restype = ctypes.c_int
 
-def foreground_process_name() -> str:
-    hwnd = GetForegroundWindow()
-    if not hwnd:
-        return ""
-    pid = ctypes.c_uint(0)
-    GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
-    if pid.value == 0:
-        return ""
-    hproc = OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, 0, pid.value)
+    # foreground change hook (WinEventForegroundWatcher)
+    import ctypes.wintypes
+
+    SetWinEventHook = user32.SetWinEventHook
+    UnhookWinEvent = user32.UnhookWinEvent
+    GetMessageW = user32.GetMessageW
+    PostThreadMessageW = user32.PostThreadMessageW
+    GetCurrentThreadId = kernel32.GetCurrentThreadId
+
+    EVENT_SYSTEM_FOREGROUND = 0x0003
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    WM_QUIT = 0x0012
+
+    WINEVENTPROC = ctypes.WINFUNCTYPE(
+        None, ctypes.c_void_p, ctypes.c_uint, ctypes.c_void_p, ctypes.c_long, ctypes.c_long, ctypes.c_uint, ctypes.c_uint
+    )
+    SetWinEventHook.argtypes = [ctypes.c_uint, ctypes.c_uint, ctypes.c_void_p, WINEVENTPROC, ctypes.c_uint, ctypes.c_uint, ctypes.c_uint]
+    SetWinEventHook.restype = ctypes.c_void_p
+    UnhookWinEvent.argtypes = [ctypes.c_void_p]
+    UnhookWinEvent.restype = ctypes.c_int
+    GetMessageW.argtypes = [ctypes.POINTER(ctypes.wintypes.MSG), ctypes.c_void_p, ctypes.c_uint, ctypes.c_uint]
+    GetMessageW.restype = ctypes.c_int
+    PostThreadMessageW.argtypes = [ctypes.c_uint, ctypes.c_uint, ctypes.c_void_p, ctypes.c_void_p]
+    PostThreadMessageW.restype = ctypes.c_int
+    GetCurrentThreadId.restype = ctypes.c_uint
+
+def process_image_name(pid: int, buf=None) -> str:
+    hproc = OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, 0, pid)
     if not hproc:
         return ""
     try:
-        size = ctypes.c_uint(4096)
-        buf = ctypes.create_unicode_buffer(size.value)
+        if buf is None:
+            buf = ctypes.create_unicode_buffer(4096)
+        size = ctypes.c_uint(len(buf))
         ok = QueryFullProcessImageNameW(hproc, 0, buf, ctypes.byref(size))
         if not ok:
             return ""
@@ -329,7 +541,126 @@ def foreground_process_name() -> str:
     finally:
         CloseHandle(hproc)
 
-# XInput
+def window_pid(hwnd) -> int:
+    pid = ctypes.c_uint(0)
+    GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+    return pid.value
+
+def foreground_process_name() -> str:
+    if sys.platform != "win32":
+        return ""
+    hwnd = GetForegroundWindow()
+    if not hwnd:
+        return ""
+    pid = window_pid(hwnd)
+    if pid == 0:
+        return ""
+    return process_image_name(pid)
+
+# =====================
+# Foreground providers
+# name() は前面プロセス名を小文字で返す。tick ごとに OpenProcess しないよう各実装でキャッシュする
+# =====================
+
+FOREGROUND_TTL = 1.0  # 同じ hwnd / pid ならこの秒数は名前を引き直さない
+
+class ForegroundProvider:
+    def name(self) -> str:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class FakeForegroundProvider(ForegroundProvider):
+    # テスト・ベンチ・非 Windows 用。current を書き換えると前面が切り替わったことになる
+    def __init__(self, current: str = ""):
+        self.current = current.lower()
+
+    def set(self, current: str):
+        self.current = current.lower()
+
+    def name(self) -> str:
+        return self.current
+
+class Win32ForegroundProvider(ForegroundProvider):
+    # hwnd が同じで TTL 内ならキャッシュ。hwnd が変わっても pid が同じなら名前は引き直さない
+    def __init__(self, ttl: float = FOREGROUND_TTL):
+        self.ttl = ttl
+        self._buf = ctypes.create_unicode_buffer(4096)
+        self._hwnd = None
+        self._pid = 0
+        self._name = ""
+        self._expires = 0.0
+
+    def name(self) -> str:
+        hwnd = GetForegroundWindow()
+        now = time.perf_counter()
+        if hwnd == self._hwnd and now < self._expires:
+            return self._name
+        pid = window_pid(hwnd) if hwnd else 0
+        if pid != self._pid or now >= self._expires:
+            self._name = process_image_name(pid, self._buf).lower() if pid else ""
+            self._pid = pid
+        self._hwnd = hwnd
+        self._expires = now + self.ttl
+        return self._name
+
+class WinEventForegroundWatcher(ForegroundProvider):
+    # EVENT_SYSTEM_FOREGROUND をフックし、前面が変わったときだけ名前を更新する（name() は属性を読むだけ）
+    def __init__(self):
+        self._name = foreground_process_name().lower()
+        self._buf = ctypes.create_unicode_buffer(4096)
+        self._thread_id = 0
+        self.hooked = False  # SetWinEventHook に成功したか（失敗したら make_foreground_provider がポーリングに戻す）
+        self._ready = threading.Event()
+        self._proc = WINEVENTPROC(self._on_event)  # GC されないよう保持
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait(1.0)
+
+    def _on_event(self, _hook, _event, hwnd, _id_object, _id_child, _thread, _time):
+        pid = window_pid(hwnd) if hwnd else 0
+        self._name = process_image_name(pid, self._buf).lower() if pid else ""
+
+    def _run(self):
+        self._thread_id = GetCurrentThreadId()
+        hook = SetWinEventHook(
+            EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND, None, self._proc, 0, 0, WINEVENT_OUTOFCONTEXT
+        )
+        self.hooked = bool(hook)
+        self._ready.set()
+        if not hook:
+            return
+        msg = ctypes.wintypes.MSG()
+        try:
+            while GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+                pass
+        finally:
+            UnhookWinEvent(hook)
+
+    def name(self) -> str:
+        return self._name
+
+    def close(self):
+        if self._thread_id:
+            PostThreadMessageW(self._thread_id, WM_QUIT, None, None)
+
+def make_foreground_provider(mode: str) -> ForegroundProvider:
+    if sys.platform != "win32":
+        return FakeForegroundProvider("")
+    if mode == "hook":
+        watcher = WinEventForegroundWatcher()
+        if watcher.hooked:
+            return watcher
+        watcher.close()
+        print(f"{APP_TITLE}: foreground hook not installed, polling instead", file=sys.stderr)
+    return Win32ForegroundProvider()
+
+# =====================
+# Input backends
+# どのバックエンドも XINPUT_STATE（dwPacketNumber + 12byte の XINPUT_GAMEPAD）を埋める
+# =====================
+
 class XINPUT_GAMEPAD(ctypes.Structure):
     _fields_ = [
         ("wButtons", ctypes.c_ushort),
@@ -342,10 +673,37 @@ class XINPUT_GAMEPAD(ctypes.Structure):
     ]
 
 class XINPUT_STATE(ctypes.Structure):
-    _fields_ = [("dwPacketNumber", ctypes.c_ulong), ("Gamepad", XINPUT_GAMEPAD)]
+    # DWORD (c_ulong は Linux だと 8byte になるので c_uint32)
+    _fields_ = [("dwPacketNumber", ctypes.c_uint32), ("Gamepad", XINPUT_GAMEPAD)]
 
 ERROR_SUCCESS = 0
+MAX_SLOTS = 4
+
+class InputBackend:
+    # poll() は入力スレッドと ControllerDiscovery の両方から呼ばれる（スレッドセーフであること）
+    name = ""
+
+    def poll(self, slot: int, st: XINPUT_STATE) -> bool:
+        raise NotImplementedError
 
+    def scan(self):
+        pass
+
+    def wait(self, timeout: float):
+        # 次の入力まで待つ。イベント駆動できるバックエンドは上書きする
+        time.sleep(timeout)
+
+    def close(self):
+        pass
+
+class NullBackend(InputBackend):
+    # バックエンドを作れなかったとき用（何も繋がっていない扱い）
+    name = "none"
+
+    def poll(self, slot: int, st: XINPUT_STATE) -> bool:
+        return False
+
+# XInput (Windows)
 def load_xinput():
     for name in ("xinput1_4.dll", "xinput1_3.dll", "xinput9_1_0.dll"):
         try:
@@ -354,21 +712,364 @@ def load_xinput():
             pass
     raise RuntimeError("XInput DLL not found")
 
-XInput = load_xinput()
-XInputGetState = XInput.XInputGetState
-XInputGetState.argtypes = [ctypes.c_uint, ctypes.POINTER(XINPUT_STATE)]
-XInputGetState.restype = ctypes.c_uint
+class XInputBackend(InputBackend):
+    name = "xinput"
+
+    def __init__(self):
+        self._get_state = load_xinput().XInputGetState
+        self._get_state.argtypes = [ctypes.c_uint, ctypes.POINTER(XINPUT_STATE)]
+        self._get_state.restype = ctypes.c_uint
+
+    def poll(self, slot: int, st: XINPUT_STATE) -> bool:
+        return self._get_state(slot, st) == ERROR_SUCCESS
+
+# evdev (Linux): /dev/input/event* を O_NONBLOCK + epoll で読む
+EV_SYN, EV_KEY, EV_ABS = 0x00, 0x01, 0x03
+SYN_REPORT = 0
+ABS_X, ABS_Y, ABS_Z, ABS_RX, ABS_RY, ABS_RZ = 0x00, 0x01, 0x02, 0x03, 0x04, 0x05
+ABS_GAS, ABS_BRAKE = 0x09, 0x0A
+ABS_HAT0X, ABS_HAT0Y = 0x10, 0x11
+BTN_SOUTH = 0x130
+
+# xpad 準拠（BTN_X=0x133 / BTN_Y=0x134）
+EVDEV_BUTTONS = {
+    0x130: 0x1000,  # A
+    0x131: 0x2000,  # B
+    0x133: 0x4000,  # X
+    0x134: 0x8000,  # Y
+    0x136: 0x0100,  # LB
+    0x137: 0x0200,  # RB
+    0x13A: 0x0020,  # Back
+    0x13B: 0x0010,  # Start
+    0x13D: 0x0040,  # LS
+    0x13E: 0x0080,  # RS
+    0x220: 0x0001,  # DPad Up
+    0x221: 0x0002,  # DPad Down
+    0x222: 0x0004,  # DPad Left
+    0x223: 0x0008,  # DPad Right
+}
+EVDEV_STICKS = {ABS_X: "sThumbLX", ABS_Y: "sThumbLY", ABS_RX: "sThumbRX", ABS_RY: "sThumbRY"}
+EVDEV_TRIGGERS = {ABS_Z: "bLeftTrigger", ABS_BRAKE: "bLeftTrigger", ABS_RZ: "bRightTrigger", ABS_GAS: "bRightTrigger"}
+
+INPUT_EVENT = struct.Struct("llHHi")
+INPUT_ABSINFO = struct.Struct("6i")
+
+def _ioc_read(nr: int, size: int) -> int:
+    return (2 << 30) | (size << 16) | (ord("E") << 8) | nr
+
+class EvdevDevice:
+    def __init__(self, path: str, fd: int, absinfo: dict):
+        self.path = path
+        self.fd = fd
+        self.absinfo = absinfo  # code -> (min, max)
+        self.state = XINPUT_STATE()
+        self.hat = [0, 0]
+
+    def scale(self, code: int, value: int, lo: int, hi: int) -> int:
+        vmin, vmax = self.absinfo.get(code, (lo, hi))
+        if vmax <= vmin:
+            return 0
+        return int(lo + (value - vmin) * (hi - lo) / (vmax - vmin))
+
+    def handle(self, etype: int, code: int, value: int):
+        gp = self.state.Gamepad
+        if etype == EV_KEY:
+            mask = EVDEV_BUTTONS.get(code, 0)
+            if mask:
+                gp.wButtons = (gp.wButtons | mask) if value else (gp.wButtons & ~mask)
+        elif etype == EV_ABS:
+            if code in EVDEV_STICKS:
+                v = self.scale(code, value, -32768, 32767)
+                if code in (ABS_Y, ABS_RY):
+                    v = -1 - v  # evdev は下が正、XInput は上が正
+                setattr(gp, EVDEV_STICKS[code], v)
+            elif code in EVDEV_TRIGGERS:
+                setattr(gp, EVDEV_TRIGGERS[code], self.scale(code, value, 0, 255))
+            elif code in (ABS_HAT0X, ABS_HAT0Y):
+                self.hat[code - ABS_HAT0X] = value
+                b = gp.wButtons & ~0x000F
+                if self.hat[1] < 0:
+                    b |= 0x0001
+                elif self.hat[1] > 0:
+                    b |= 0x0002
+                if self.hat[0] < 0:
+                    b |= 0x0004
+                elif self.hat[0] > 0:
+                    b |= 0x0008
+                gp.wButtons = b
+        elif etype == EV_SYN and code == SYN_REPORT:
+            self.state.dwPacketNumber = (self.state.dwPacketNumber + 1) & 0xFFFFFFFF
+
+class EvdevBackend(InputBackend):
+    name = "evdev"
+
+    def __init__(self, pattern: str = "/dev/input/event*"):
+        import fcntl
+        import glob
+        import select
+        self._fcntl = fcntl
+        self._glob = glob
+        self.pattern = pattern
+        self.epoll = select.epoll()
+        self.devices = [None] * MAX_SLOTS  # slot -> EvdevDevice（抜けても他のスロット番号は変わらない）
+        self.by_fd = {}
+        self.lock = threading.Lock()
+        self.scan()
+
+    def _is_gamepad(self, fd: int):
+        keys = bytearray(0x300 // 8)
+        self._fcntl.ioctl(fd, _ioc_read(0x20 + EV_KEY, len(keys)), keys, True)
+        if not keys[BTN_SOUTH // 8] & (1 << (BTN_SOUTH % 8)):
+            return None
+        absinfo = {}
+        for code in list(EVDEV_STICKS) + list(EVDEV_TRIGGERS):
+            buf = bytearray(INPUT_ABSINFO.size)
+            try:
+                self._fcntl.ioctl(fd, _ioc_read(0x40 + code, len(buf)), buf, True)
+            except OSError:
+                continue
+            _, vmin, vmax, _, _, _ = INPUT_ABSINFO.unpack(buf)
+            absinfo[code] = (vmin, vmax)
+        return absinfo if ABS_X in absinfo else None
+
+    def scan(self):
+        with self.lock:
+            self._scan()
+
+    def _scan(self):
+        known = {d.path for d in self.devices if d is not None}
+        for path in sorted(self._glob.glob(self.pattern)):
+            if path in known or None not in self.devices:
+                continue
+            try:
+                fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+            except OSError:
+                continue
+            try:
+                absinfo = self._is_gamepad(fd)
+            except OSError:
+                absinfo = None
+            if absinfo is None:
+                os.close(fd)
+                continue
+            dev = EvdevDevice(path, fd, absinfo)
+            self.devices[self.devices.index(None)] = dev
+            self.by_fd[fd] = dev
+            self.epoll.register(fd, 0x001)  # EPOLLIN
+
+    def _drop(self, dev: EvdevDevice):
+        self.devices[self.devices.index(dev)] = None
+        del self.by_fd[dev.fd]
+        try:
+            self.epoll.unregister(dev.fd)
+        except OSError:
+            pass
+        os.close(dev.fd)
+
+    def _pump(self):
+        for fd, _ in self.epoll.poll(0):
+            dev = self.by_fd.get(fd)
+            if dev is None:
+                continue
+            try:
+                data = os.read(fd, INPUT_EVENT.size * 64)
+            except BlockingIOError:
+                continue
+            except OSError:  # ENODEV: 抜かれた
+                self._drop(dev)
+                continue
+            for _, _, etype, code, value in INPUT_EVENT.iter_unpack(data[: len(data) - len(data) % INPUT_EVENT.size]):
+                dev.handle(etype, code, value)
+
+    def wait(self, timeout: float):
+        self.epoll.poll(timeout)
+
+    def poll(self, slot: int, st: XINPUT_STATE) -> bool:
+        with self.lock:
+            self._pump()
+            dev = self.devices[slot]
+            if dev is None:
+                return False
+            ctypes.memmove(ctypes.addressof(st), ctypes.addressof(dev.state), ctypes.sizeof(XINPUT_STATE))
+            return True
+
+    def close(self):
+        with self.lock:
+            for dev in self.devices:
+                if dev is not None:
+                    self._drop(dev)
+            self.epoll.close()
+
+# synthetic: ハードなしで map/送信パイプラインを回す（負荷試験・動作確認用）
+def synthetic_pattern(t: float, slot: int, gp: XINPUT_GAMEPAD):
+    phase = t * 0.5 + slot * 0.25
+    gp.sThumbLX = int(32767 * math.cos(2 * math.pi * phase))
+    gp.sThumbLY = int(32767 * math.sin(2 * math.pi * phase))
+    gp.sThumbRX = int(20000 * math.sin(2 * math.pi * phase * 3))
+    gp.sThumbRY = 0
+    gp.bLeftTrigger = int(255 * (0.5 + 0.5 * math.sin(2 * math.pi * phase)))
+    gp.bRightTrigger = 255 - gp.bLeftTrigger
+    gp.wButtons = 0x1000 if (t % 1.0) < 0.1 else 0
+
+class SyntheticBackend(InputBackend):
+    name = "synthetic"
+
+    def __init__(self, slots: int = MAX_SLOTS, update_hz: float = 250.0, script=None):
+        # script(t, slot, gamepad) で任意の入力を書き込める。省略時は synthetic_pattern
+        self.slots = slots
+        self.update_hz = update_hz
+        self.script = script or synthetic_pattern
+        self.t0 = time.perf_counter()
+
+    def poll(self, slot: int, st: XINPUT_STATE) -> bool:
+        if slot >= self.slots:
+            return False
+        t = time.perf_counter() - self.t0
+        packet = int(t * self.update_hz) & 0xFFFFFFFF
+        if packet != st.dwPacketNumber:
+            self.script(packet / self.update_hz, slot, st.Gamepad)
+            st.dwPacketNumber = packet
+        return True
+
+# Record / replay
+# 固定長レコードの追記ファイル: ヘッダ 16 byte + InputRecord(28 byte) * N
+# 再生は mmap 上に InputRecord 配列を重ねるだけで、パースはしない
+REC_MAGIC = b"P2OREC\0\0"
+REC_VERSION = 1
+REC_HEADER = struct.Struct("<8sII")  # magic, version, record size
+RECORDINGS_DIR = BASE_DIR / "recordings"
+
+class InputRecord(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("t_ns", ctypes.c_uint64),  # 記録開始からの経過 ns
+        ("packet", ctypes.c_uint32),  # dwPacketNumber
+        ("slot", ctypes.c_uint16),
+        ("_reserved", ctypes.c_uint16),
+        ("gamepad", XINPUT_GAMEPAD),
+    ]
 
-def get_state(user_index: int):
-    st = XINPUT_STATE()
-    res = XInputGetState(user_index, ctypes.byref(st))
-    return st if res == ERROR_SUCCESS else None
+class Recorder:
+    # 入力スレッドから write() される（変化したときだけ）。close() はトレイ側から
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.f = open(path, "wb", buffering=1 << 16)
+        self.f.write(REC_HEADER.pack(REC_MAGIC, REC_VERSION, ctypes.sizeof(InputRecord)))
+        self.rec = InputRecord()
+        self.t0 = time.perf_counter_ns()
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def write(self, slot: int, st: XINPUT_STATE):
+        rec = self.rec
+        with self.lock:
+            if self.f is None:
+                return
+            rec.t_ns = time.perf_counter_ns() - self.t0
+            rec.packet = st.dwPacketNumber
+            rec.slot = slot
+            rec.gamepad = st.Gamepad
+            self.f.write(rec)
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            if self.f is not None:
+                self.f.close()
+                self.f = None
+
+def copy_gamepad(dst: XINPUT_GAMEPAD, src: XINPUT_GAMEPAD):
+    # 代入（dst = src）だと mmap 上の src への参照が dst に残って mmap を閉じられないので memmove
+    ctypes.memmove(ctypes.addressof(dst), ctypes.addressof(src), ctypes.sizeof(XINPUT_GAMEPAD))
+
+def open_recording(path: Path):
+    # 戻り値: (mmap, records)。records は mmap 上の InputRecord 配列（コピーなし）
+    # mmap を閉じる前に records への参照を全部捨てること
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < REC_HEADER.size:
+            raise ValueError(f"not a pad2osc recording: {path}")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    magic, version, rec_size = REC_HEADER.unpack_from(mm)
+    if magic != REC_MAGIC or version != REC_VERSION or rec_size != ctypes.sizeof(InputRecord):
+        mm.close()
+        raise ValueError(f"not a pad2osc recording: {path}")
+    n = (size - REC_HEADER.size) // rec_size
+    records = (InputRecord * n).from_buffer(mm, REC_HEADER.size)
+    return mm, records
+
+class ReplayBackend(InputBackend):
+    # 記録の時刻どおりに（speed 倍で）状態を出す。最後まで行ったら先頭から繰り返す
+    name = "replay"
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.mm, self.records = open_recording(Path(path))
+        self.speed = speed
+        self.states = [XINPUT_STATE() for _ in range(MAX_SLOTS)]
+        self.present = [False] * MAX_SLOTS
+        self.cursor = 0
+        self.lock = threading.Lock()
+        self.t0 = time.perf_counter()
+
+    def _advance(self):
+        records = self.records
+        n = len(records)
+        if n == 0:
+            return
+        t_ns = (time.perf_counter() - self.t0) * self.speed * 1e9
+        i = self.cursor
+        while i < n:
+            rec = records[i]
+            if rec.t_ns > t_ns:
+                break
+            if rec.slot < MAX_SLOTS:
+                st = self.states[rec.slot]
+                copy_gamepad(st.Gamepad, rec.gamepad)
+                st.dwPacketNumber = (st.dwPacketNumber + 1) & 0xFFFFFFFF
+                self.present[rec.slot] = True
+            i += 1
+        if i >= n:
+            i = 0
+            self.t0 = time.perf_counter()
+        self.cursor = i
+
+    def poll(self, slot: int, st: XINPUT_STATE) -> bool:
+        with self.lock:
+            if self.records is None:
+                return False
+            self._advance()
+            if not self.present[slot]:
+                return False
+            ctypes.memmove(ctypes.addressof(st), ctypes.addressof(self.states[slot]), ctypes.sizeof(XINPUT_STATE))
+            return True
+
+    def close(self):
+        with self.lock:
+            if self.records is not None:
+                self.records = None
+                self.mm.close()
+
+INPUT_BACKENDS = {
+    "xinput": XInputBackend,
+    "evdev": EvdevBackend,
+    "synthetic": SyntheticBackend,
+    "replay": ReplayBackend,
+}
 
-def find_first_controller():
-    for i in range(4):
-        if get_state(i) is not None:
-            return i
-    return None
+def resolve_backend_name(name: str) -> str:
+    name = str(name).lower()
+    if name == "auto":
+        return "xinput" if sys.platform == "win32" else "evdev"
+    return name
+
+def make_backend(name: str, replay_file: str = "", replay_speed: float = 1.0) -> InputBackend:
+    name = resolve_backend_name(name)
+    if name not in INPUT_BACKENDS:
+        raise ValueError(f"unknown input_backend: {name}")
+    if name == "replay":
+        return INPUT_BACKENDS[name](replay_file, replay_speed)
+    return INPUT_BACKENDS[name]()
 
 BUTTON_MASKS = {
     "None": 0,
@@ -379,207 +1080,1655 @@ BUTTON_MASKS = {
     "Up": 0x0001, "Down": 0x0002, "Left": 0x0004, "Right": 0x0008,
 }
 
-def is_pressed(wButtons: int, name: str) -> int:
-    mask = BUTTON_MASKS.get(name, 0)
-    return 1 if (mask and (wButtons & mask)) else 0
-
 @dataclass
 class Mapped:
-    move_x: float
-    move_y: float
-    look_x: float
-    look_y: float
-    jump: int
-    voice_down: int
-    grab_l: float
-    grab_r: float
-
-def map_state(st: XINPUT_STATE, cfg: dict) -> Mapped:
+    move_x: float = 0.0
+    move_y: float = 0.0
+    look_x: float = 0.0
+    look_y: float = 0.0
+    jump: int = 0
+    voice_down: int = 0
+    grab_l: float = 0.0
+    grab_r: float = 0.0
+
+def map_state(st: XINPUT_STATE, rc: "RuntimeConfig", out: Mapped = None) -> Mapped:
     gp = st.Gamepad
 
-    lx = norm_thumb(gp.sThumbLX, cfg["deadzone_left"])
-    ly = norm_thumb(gp.sThumbLY, cfg["deadzone_left"])
-    rx = norm_thumb(gp.sThumbRX, cfg["deadzone_right"])
-    ry = norm_thumb(gp.sThumbRY, cfg["deadzone_right"])
+    move_x = rc.lut_move_x[gp.sThumbLX + STICK_LUT_OFFSET]
+    move_y = rc.lut_move_y[gp.sThumbLY + STICK_LUT_OFFSET]
+    look_x = rc.lut_look_x[gp.sThumbRX + STICK_LUT_OFFSET]
+    look_y = rc.lut_look_y[gp.sThumbRY + STICK_LUT_OFFSET]
 
-    move_x = lx
-    move_y = -ly if cfg["move_invert_y"] else ly
+    jump = 1 if gp.wButtons & rc.jump_mask else 0
+    voice_down = 1 if gp.wButtons & rc.voice_mask else 0
 
-    look_x = apply_curve(rx, cfg["curve_gamma"]) * cfg["look_gain"]
-    look_y = apply_curve(ry, cfg["curve_gamma"]) * cfg["look_gain"]
-    if cfg["look_invert_y"]:
-        look_y *= -1.0
-
-    jump = is_pressed(gp.wButtons, cfg["jump_button"])
-    voice_down = is_pressed(gp.wButtons, cfg["voice_button"])
-
-    if cfg["enable_grab_triggers"]:
-        grab_l = norm_trigger(gp.bLeftTrigger, cfg["trigger_threshold"])
-        grab_r = norm_trigger(gp.bRightTrigger, cfg["trigger_threshold"])
+    if rc.grab:
+        grab_l = rc.lut_trigger[gp.bLeftTrigger]
+        grab_r = rc.lut_trigger[gp.bRightTrigger]
     else:
         grab_l = 0.0
         grab_r = 0.0
 
-    return Mapped(move_x, move_y, look_x, look_y, jump, voice_down, grab_l, grab_r)
+    # out を渡せば結果をそこへ書き込む（hot loop で Mapped を毎tick作らない）
+    if out is None:
+        return Mapped(move_x, move_y, look_x, look_y, jump, voice_down, grab_l, grab_r)
+    out.move_x = move_x
+    out.move_y = move_y
+    out.look_x = look_x
+    out.look_y = look_y
+    out.jump = jump
+    out.voice_down = voice_down
+    out.grab_l = grab_l
+    out.grab_r = grab_r
+    return out
 
-stop_event = threading.Event()
+# =====================
+# Rules（config の "rules"：任意の入力 → 任意の OSC アドレス）
+# config 読み込み時に LUT・マスク・出力位置を決めておき、Pad ごとに op（クロージャ）を作る
+# tick では op(gp, now) を順に呼ぶだけ（mode 文字列での分岐や dict 参照はしない）
+# =====================
 
-def engine_loop():
-    cfg = load_config()
-    mtime = CONFIG_PATH.stat().st_mtime if CONFIG_PATH.exists() else 0.0
-    client = SimpleUDPClient(cfg["vrc_ip"], cfg["vrc_port"])
-    idx = find_first_controller()
-
-    prev_voice = 0
-    voice_pulse_until = 0.0
-    suppressed_prev = False
-    last_ok = time.time()
-
-    def osc_f(addr, val: float): client.send_message(addr, float(val))
-    def osc_i(addr, val: int): client.send_message(addr, int(val))
-
-    def zero_all():
-        osc_f(cfg["addr_move_x"], 0.0)
-        osc_f(cfg["addr_move_y"], 0.0)
-        osc_f(cfg["addr_look_x"], 0.0)
-        osc_f(cfg["addr_look_y"], 0.0)
-        osc_i(cfg["addr_jump"], 0)
-        osc_i(cfg["addr_voice"], 0)
-        if cfg["enable_grab_triggers"]:
-            osc_f(cfg["grab_left_addr"], 0.0)
-            osc_f(cfg["grab_right_addr"], 0.0)
+@dataclass(frozen=True)
+class RuleSpec:
+    header: bytes  # エンコード済みアドレス + 型タグ
+    tag: str
+    mode: str
+    mask: int  # ボタン（軸なら 0）
+    field: str  # 軸の XINPUT_GAMEPAD フィールド（ボタンなら ""）
+    lut: array  # 軸: deadzone + curve + scale 済み
+    offset: int  # lut の index = 生の値 + offset
+    on: float  # ボタン / toggle / pulse のオン値
+    pulse_sec: float
+
+def compile_rule(rule: dict, luts: dict) -> RuleSpec:
+    r = {**RULE_DEFAULTS, **rule}
+    tag = r["type"]
+    gain = -r["scale"] if r["invert"] else r["scale"]
+    on = int(round(gain)) if tag == "i" else float(gain)
+    field = RULE_AXES.get(r["input"], "")
+    mask = 0
+    lut = None
+    offset = 0
+    if field.startswith("sThumb"):
+        lut = get_lut(luts, ("stick", int(r["deadzone"] * 32767), r["curve"], gain))
+        offset = STICK_LUT_OFFSET
+    elif field:
+        lut = get_lut(luts, ("trigger", int(r["deadzone"] * 255), r["curve"], gain))
+    else:
+        mask = BUTTON_MASKS[r["input"]]
+    return RuleSpec(osc_header(r["address"], tag), tag, r["mode"], mask, field, lut, offset, on, r["pulse_sec"])
+
+def make_rule_op(spec: RuleSpec, frame: "OscFrame", index: int):
+    # 戻り値: op(gp, now)。toggle / pulse の状態は op ごと（= Pad ごと）に持つ
+    set_value = frame.set_i if spec.tag == "i" else frame.set_f
+    on = spec.on
+    lut = spec.lut
+    offset = spec.offset
+    mask = spec.mask
+
+    if spec.field:
+        get = operator.attrgetter(spec.field)
+        if spec.mode == "hold":
+            if spec.tag == "i":
+                def op(gp, now):
+                    set_value(index, round(lut[get(gp) + offset]))
+            else:
+                def op(gp, now):
+                    set_value(index, lut[get(gp) + offset])
+            return op
+
+        def pressed(gp):
+            return lut[get(gp) + offset] != 0.0
+    else:
+        if spec.mode == "hold":
+            def op(gp, now):
+                set_value(index, on if gp.wButtons & mask else 0)
+            return op
+
+        def pressed(gp):
+            return gp.wButtons & mask != 0
+
+    if spec.mode == "toggle":
+        state = False
+        prev = False
+
+        def op(gp, now):
+            nonlocal state, prev
+            down = pressed(gp)
+            if down and not prev:
+                state = not state
+            prev = down
+            set_value(index, on if state else 0)
+        return op
+
+    pulse_sec = spec.pulse_sec
+    until = 0.0
+    prev = False
+
+    def op(gp, now):
+        nonlocal until, prev
+        down = pressed(gp)
+        if down and not prev:
+            until = now + pulse_sec
+        prev = down
+        set_value(index, on if now < until else 0)
+    return op
 
-    while not stop_event.is_set():
-        # auto reload config
+# =====================
+# OSC (pre-encoded datagrams)
+# アドレスと型タグは config 読み込み時に一度だけエンコードし、毎tickは値の4byteだけ書き換える
+# =====================
+
+_F32 = struct.Struct(">f")
+_I32 = struct.Struct(">i")
+OSC_BUNDLE_HEADER = b"#bundle\0" + struct.pack(">Q", 1)  # timetag 1 = immediately
+
+OUT_MOVE_X, OUT_MOVE_Y, OUT_LOOK_X, OUT_LOOK_Y, OUT_JUMP, OUT_VOICE, OUT_GRAB_L, OUT_GRAB_R = range(8)
+
+def osc_string(s: str) -> bytes:
+    b = s.encode("utf-8") + b"\0"
+    return b + b"\0" * (-len(b) % 4)
+
+class OscFrame:
+    # bundle=True: 1 datagram (#bundle), False: 1 datagram per address
+    def __init__(self, items, bundled: bool):
+        # items: (pre-encoded address + type tag, tag)
+        self.bundled = bundled
+        self.buf = bytearray(OSC_BUNDLE_HEADER if bundled else b"")
+        self.offsets = []
+        self.packers = []
+        # last value written per address + dirty flag (send_changed 用)
+        self.values = [None] * len(items)
+        self.dirty = bytearray(len(items))
+        self._clean = bytes(len(items))
+        spans = []
+        for header, tag in items:
+            msg = header
+            if bundled:
+                self.buf += _I32.pack(len(msg) + 4)
+            start = len(self.buf)
+            self.buf += msg
+            self.offsets.append(len(self.buf))
+            self.packers.append(_F32.pack_into if tag == "f" else _I32.pack_into)
+            self.buf += b"\0\0\0\0"
+            spans.append((start, len(self.buf)))
+        whole = memoryview(self.buf)
+        self.datagrams = [whole] if bundled else [whole[a:b] for a, b in spans]
+
+    def set_f(self, i: int, v: float):
+        if v != self.values[i]:
+            self.values[i] = v
+            _F32.pack_into(self.buf, self.offsets[i], v)
+            self.dirty[i] = 1
+
+    def set_i(self, i: int, v: int):
+        if v != self.values[i]:
+            self.values[i] = v
+            _I32.pack_into(self.buf, self.offsets[i], v)
+            self.dirty[i] = 1
+
+    def zero(self):
+        for i, (pack, off) in enumerate(zip(self.packers, self.offsets)):
+            pack(self.buf, off, 0)
+            self.values[i] = 0
+            self.dirty[i] = 1
+
+    def send(self, dests):
+        for dgram in self.datagrams:
+            for d in dests:
+                d.send(dgram)
+        self.dirty[:] = self._clean
+
+    def send_changed(self, dests) -> bool:
+        # bundle は1 datagram なので何か変わっていれば丸ごと送る
+        if self.bundled:
+            if any(self.dirty):
+                self.send(dests)
+                return True
+            return False
+        sent = False
+        for i, dgram in enumerate(self.datagrams):
+            if self.dirty[i]:
+                for d in dests:
+                    d.send(dgram)
+                self.dirty[i] = 0
+                sent = True
+        return sent
+
+def osc_header(addr: str, tag: str) -> bytes:
+    return osc_string(addr) + osc_string("," + tag)
+
+def build_frame(rc: "RuntimeConfig") -> OscFrame:
+    return OscFrame(rc.osc_items, rc.bundled)
+
+# =====================
+# OSC output (fan-out)
+# 宛先ごとに connect 済みの非ブロッキング UDP ソケットを持つ。
+# 詰まり・到達不能は宛先ごとのカウンタに数えるだけで、他の宛先の送信は止めない
+# =====================
+
+class Destination:
+    def __init__(self, ip: str, port: int):
+        self.label = f"{ip}:{port}"
+        self.sock = None
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = ""
+        try:
+            family, _, _, _, sockaddr = socket.getaddrinfo(ip, port, type=socket.SOCK_DGRAM)[0]
+            sock = socket.socket(family, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            sock.connect(sockaddr)
+            self.sock = sock
+        except (OSError, UnicodeError) as e:  # 解決できない / IDNA で表せないホスト名
+            self.last_error = str(e)
+
+    def send(self, dgram):
+        if self.sock is None:
+            self.dropped += 1
+            return
+        try:
+            self.sock.send(dgram)
+            self.sent += 1
+        except BlockingIOError:
+            self.dropped += 1  # socket buffer full
+        except OSError as e:  # ICMP unreachable etc.
+            self.errors += 1
+            self.last_error = str(e)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+
+    def stats(self) -> dict:
+        return {
+            "dest": self.label,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+class OscOutput:
+    # 同じ ip:port の宛先は複数パッドで共有する
+    def __init__(self):
+        self.dests = {}
+
+    def target(self, ip: str, port: int) -> Destination:
+        key = (str(ip), int(port))
+        if key not in self.dests:
+            self.dests[key] = Destination(*key)
+        return self.dests[key]
+
+    def close(self):
+        for d in self.dests.values():
+            d.close()
+
+    def stats(self) -> list:
+        return [d.stats() for d in self.dests.values()]
+
+def parse_dest(entry):
+    # "host:port" / {"ip": ..., "port": ...}
+    if isinstance(entry, dict):
+        return str(entry["ip"]), int(entry["port"])
+    host, _, port = str(entry).rpartition(":")
+    return host.strip("[]"), int(port)
+
+def pad_destinations(cfg: dict) -> list:
+    return [(cfg["vrc_ip"], int(cfg["vrc_port"]))] + [parse_dest(e) for e in cfg.get("destinations") or []]
+
+# =====================
+# Scheduler (deadline based, perf_counter)
+# 粗く sleep → 最後の SCHED_SPIN_SEC だけ spin して期限ちょうどに起きる
+# =====================
+
+SCHED_SPIN_SEC = 0.0008
+SCHED_MAX_CATCHUP = 4  # catchup でもこれ以上遅れたら諦めて再同期
+SCHED_WINDOW = 1024
+
+def percentile(sorted_vals, q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+class RateScheduler:
+    def __init__(self, hz: int, policy: str = "skip"):
+        self.policy = policy
+        self.period = 1.0 / max(1, int(hz))
+        self.lateness = array("d", bytes(8 * SCHED_WINDOW))
+        self.ticks = 0
+        self.skipped = 0
+        self.armed = False
+        self.reset()
+
+    def set_rate(self, hz: int, policy: str = None):
+        self.period = 1.0 / max(1, int(hz))
+        if policy is not None:
+            self.policy = policy
+        self.reset()
+
+    def reset(self):
+        self.armed = False
+        self.deadline = time.perf_counter()
+        self.window_start = self.deadline
+        self.window_ticks = 0
+
+    def wait(self, wake: threading.Event = None) -> bool:
+        # True: wake がセットされて期限前に起きた（期限はそのまま次回に持ち越し）
+        if not self.armed:
+            self.deadline += self.period
+            behind = time.perf_counter() - self.deadline
+            if behind > 0.0:
+                if self.policy == "catchup" and behind < SCHED_MAX_CATCHUP * self.period:
+                    pass  # run the next tick immediately, deadline grid unchanged
+                else:
+                    missed = int(behind / self.period) + 1
+                    self.skipped += missed
+                    self.deadline += missed * self.period
+            self.armed = True
+        remaining = self.deadline - time.perf_counter()
+        if remaining > SCHED_SPIN_SEC:
+            if wake is None:
+                time.sleep(remaining - SCHED_SPIN_SEC)
+            elif wake.wait(remaining - SCHED_SPIN_SEC):
+                wake.clear()
+                return True
+        while time.perf_counter() < self.deadline:
+            pass
+        self.armed = False
+        self.lateness[self.ticks % SCHED_WINDOW] = time.perf_counter() - self.deadline
+        self.ticks += 1
+        self.window_ticks += 1
+        return False
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self.window_start
+        n = min(self.ticks, SCHED_WINDOW)
+        late = sorted(self.lateness[:n])
+        return {
+            "target_hz": 1.0 / self.period,
+            "achieved_hz": self.window_ticks / elapsed if elapsed > 0 else 0.0,
+            "ticks": self.ticks,
+            "skipped": self.skipped,
+            "jitter_p50_us": percentile(late, 0.50) * 1e6,
+            "jitter_p99_us": percentile(late, 0.99) * 1e6,
+            "jitter_max_us": (late[-1] if late else 0.0) * 1e6,
+        }
+
+# =====================
+# Stats
+# perf_counter_ns の区間を固定バケットのヒストグラムに積む。無効時は stats=None で計測コードを通らない
+# =====================
+
+HIST_SUB = 4  # 2倍ごとのバケットをさらに4分割（誤差 ~25%）
+HIST_BUCKETS = 64 * HIST_SUB
+
+def hist_upper_ns(i: int) -> int:
+    bl, sub = divmod(i, HIST_SUB)
+    if bl < 3:
+        return 1 << bl
+    return (HIST_SUB + sub + 1) << (bl - 3)
+
+class Histogram:
+    __slots__ = ("counts", "count", "max")
+
+    def __init__(self):
+        self.counts = array("Q", bytes(8 * HIST_BUCKETS))
+        self.count = 0
+        self.max = 0
+
+    def add(self, ns: int):
+        bl = ns.bit_length()
+        self.counts[bl * HIST_SUB + ((ns >> (bl - 3)) & 3 if bl >= 3 else 0)] += 1
+        self.count += 1
+        if ns > self.max:
+            self.max = ns
+
+    def percentile_ns(self, q: float) -> int:
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if c and seen >= target:
+                return min(hist_upper_ns(i), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "p50_us": self.percentile_ns(0.50) / 1000,
+            "p99_us": self.percentile_ns(0.99) / 1000,
+            "max_us": self.max / 1000,
+        }
+
+class EngineStats:
+    STAGES = ("poll", "foreground", "map", "encode", "send", "tick")
+
+    def __init__(self):
+        for name in self.STAGES:
+            setattr(self, name, Histogram())
+
+    def snapshot(self) -> dict:
+        return {name: getattr(self, name).summary() for name in self.STAGES}
+
+def stats_snapshot() -> dict:
+    snap = {"stages": engine_stats.snapshot() if engine_stats is not None else {}}
+    if scheduler is not None:
+        rate = scheduler.stats()
+        snap["ticks"] = rate["ticks"]
+        snap["skipped_ticks"] = rate["skipped"]
+        snap["rate"] = rate
+    if output is not None:
+        dests = output.stats()
+        snap["sends"] = sum(d["sent"] for d in dests)
+        snap["send_errors"] = sum(d["errors"] for d in dests)
+        snap["send_drops"] = sum(d["dropped"] for d in dests)
+        snap["destinations"] = dests
+    return snap
+
+def start_stats_server(port: int):
+    # 127.0.0.1 のみ。GET /stats → stats_snapshot() の JSON
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StatsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ("/", "/stats"):
+                self.send_error(404)
+                return
+            body = json.dumps(stats_snapshot()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), StatsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# =====================
+# Input thread
+# 入力のポーリング（evdev はイベント待ち）を送信ループから分離し、最新の1件だけを LatestSlot に置く
+# =====================
+
+OVERSAMPLE_HZ = 1000
+
+class SampleFold:
+    # oversample: 前回の送信フレームから今までの入力サンプルを1フレームにまとめる
+    # add() は入力スレッド、fold() は engine（Pad.tick）から呼ばれる
+    AXES = ("sThumbLX", "sThumbLY", "sThumbRX", "sThumbRY", "bLeftTrigger", "bRightTrigger")
+
+    def __init__(self, peak: bool):
+        self.lock = threading.Lock()
+        self.peak = peak
+        self.buttons = 0  # 最後のサンプルのボタン
+        self.rising = 0  # 前回 fold 以降に押されたボタン
+        self.falling = 0  # 前回 fold 以降に離されたボタン
+        self.latest = [0] * len(self.AXES)
+        self.axes = [0] * len(self.AXES)  # peak: 絶対値最大のサンプル
+
+    def add(self, gp: XINPUT_GAMEPAD):
+        with self.lock:
+            b = gp.wButtons
+            self.rising |= b & ~self.buttons
+            self.falling |= self.buttons & ~b
+            self.buttons = b
+            if self.peak:
+                latest = self.latest
+                axes = self.axes
+                for i, name in enumerate(self.AXES):
+                    v = getattr(gp, name)
+                    latest[i] = v
+                    if abs(v) > abs(axes[i]):
+                        axes[i] = v
+
+    def fold(self, gp: XINPUT_GAMEPAD, prev_buttons: int):
+        # gp（最新サンプルのコピー）を送信用に書き換える。prev_buttons = 前フレームで送ったボタン
+        # 前フレームで離していたボタンが押されていれば 1、押していたボタンが一度でも離されていれば 0
+        # （tick 内の短いタップは 1 フレームだけ押下、離して押し直しは 0 を挟んで次フレームで押下）
+        # 戻り値: 最新サンプルと違う値にした（peak を使った）か
+        peaked = False
+        with self.lock:
+            rising, falling = self.rising, self.falling
+            self.rising = self.falling = 0
+            if self.peak:
+                peaked = self.axes != self.latest
+                for name, v in zip(self.AXES, self.axes):
+                    setattr(gp, name, v)
+                self.axes[:] = self.latest
+        gp.wButtons = (gp.wButtons | (rising & ~prev_buttons)) & ~(falling & prev_buttons)
+        return peaked
+
+class LatestSlot:
+    # single-slot, latest-wins. seqlock: 書き込み中は seq が奇数、読み手は seq が変わったら読み直す
+    def __init__(self, event: threading.Event):
+        self.state = XINPUT_STATE()
+        self.seq = 0
+        self.connected = False
+        self.last_ok = time.perf_counter()
+        self.event = event
+        self.fold = None  # SampleFold（oversample 時のみ）
+
+    def publish(self, st: XINPUT_STATE, connected: bool):
+        self.seq += 1
+        ctypes.memmove(ctypes.addressof(self.state), ctypes.addressof(st), ctypes.sizeof(XINPUT_STATE))
+        self.connected = connected
+        self.seq += 1
+        fold = self.fold
+        if fold is not None and connected:
+            fold.add(st.Gamepad)
+        self.event.set()
+
+    def read(self, out: XINPUT_STATE) -> bool:
+        while True:
+            seq = self.seq
+            if not seq & 1:
+                ctypes.memmove(ctypes.addressof(out), ctypes.addressof(self.state), ctypes.sizeof(XINPUT_STATE))
+                connected = self.connected
+                if self.seq == seq:
+                    return connected
+            # 書き込み中: GIL を持ったまま回ると書き手が進めないので譲る
+            time.sleep(0)
+
+controller_listeners = []  # fn(slot, connected): パッドの接続/切断通知（トレイ表示など）
+
+def notify_controller(slot: int, connected: bool):
+    for fn in list(controller_listeners):
         try:
-            if CONFIG_PATH.exists():
-                new_mtime = CONFIG_PATH.stat().st_mtime
-                if new_mtime != mtime:
-                    cfg = load_config()
-                    client = SimpleUDPClient(cfg["vrc_ip"], cfg["vrc_port"])
-                    mtime = new_mtime
+            fn(slot, connected)
         except Exception:
             pass
 
-        # suppress when VRChat foreground
-        if cfg.get("suppress_when_vrchat_foreground", True):
-            fg = foreground_process_name()
-            if fg.lower() == str(cfg.get("vrchat_process_name", "VRChat.exe")).lower():
-                if not suppressed_prev:
-                    zero_all()
-                    prev_voice = 0
-                    voice_pulse_until = 0.0
-                suppressed_prev = True
-                time.sleep(0.02)
-                continue
-            suppressed_prev = False
+DISCOVERY_MIN_DELAY = 0.1
+DISCOVERY_MAX_DELAY = 2.0
+DISCOVERY_LOST_MAX_DELAY = 0.25  # 切断から DISCOVERY_LOST_WINDOW 秒以内のスロットはこれ以上空けない
+DISCOVERY_LOST_WINDOW = 30.0
+
+class ControllerDiscovery(threading.Thread):
+    # 未接続スロットの探索だけを受け持つ（空スロットの XInput probe は遅いので入力スレッドではやらない）
+    # 見つからないスロットは DISCOVERY_MAX_DELAY まで指数バックオフ。切断されたスロットは lost() で即再探索
+    # XInput には接続通知がないので、切断直後（電池切れ・ケーブル抜けからの復帰を待つ間）だけ
+    # バックオフの上限を DISCOVERY_LOST_MAX_DELAY に下げて、戻ってきたパッドを早く拾う
+    def __init__(self, inp: "InputThread"):
+        super().__init__(daemon=True)
+        self.inp = inp
+        self.wake = threading.Event()
+        self.delay = [DISCOVERY_MIN_DELAY] * MAX_SLOTS
+        self.next_probe = [0.0] * MAX_SLOTS
+        self.lost_at = [-math.inf] * MAX_SLOTS
+
+    def lost(self, idx: int):
+        self.delay[idx] = DISCOVERY_MIN_DELAY
+        self.next_probe[idx] = 0.0
+        self.lost_at[idx] = time.perf_counter()
+        self.wake.set()
+
+    def max_delay(self, idx: int, now: float) -> float:
+        if now - self.lost_at[idx] < DISCOVERY_LOST_WINDOW:
+            return DISCOVERY_LOST_MAX_DELAY
+        return DISCOVERY_MAX_DELAY
+
+    def run(self):
+        probe = XINPUT_STATE()
+        while not self.inp.stop.is_set():
+            backend = self.inp.backend
+            active = self.inp.active
+            now = time.perf_counter()
+            wanted = [i for i in self.inp.wanted_slots() if not active[i]]
+            due = [i for i in wanted if now >= self.next_probe[i]]
+            if due and backend is not None:
+                backend.scan()
+                for i in due:
+                    if backend.poll(i, probe):
+                        self.delay[i] = DISCOVERY_MIN_DELAY
+                        self.inp.attach(backend, i)
+                    else:
+                        self.next_probe[i] = now + self.delay[i]
+                        self.delay[i] = min(self.max_delay(i, now), self.delay[i] * 2)
+            pending = [self.next_probe[i] for i in wanted if not active[i]]
+            timeout = (min(pending) - time.perf_counter()) if pending else DISCOVERY_MAX_DELAY
+            self.wake.wait(max(0.005, timeout))
+            self.wake.clear()
+
+class InputThread(threading.Thread):
+    # 接続中のパッドだけを1スレッドでポーリングする（探索は ControllerDiscovery）
+    # slot key は 0..3 か "auto"（明示指定されていない最初の接続中パッド）
+    def __init__(self, backend_spec: tuple, poll_hz: int, keys):
+        super().__init__(daemon=True)
+        self.event = threading.Event()  # どれかの slot が変化したら set
+        self.slots = {k: LatestSlot(self.event) for k in list(range(MAX_SLOTS)) + ["auto"]}
+        self.stop = threading.Event()
+        self.attached = threading.Event()
+        self.active = [False] * MAX_SLOTS
+        self.backend = None
+        self.stats = None  # EngineStats（poll の計測）
+        self.discovery = ControllerDiscovery(self)
+        self.configure(backend_spec, poll_hz, keys)
+
+    def configure(self, backend_spec: tuple, poll_hz: int, keys):
+        # backend_spec: make_backend() の引数 (name, replay_file, replay_speed)
+        self.backend_spec = backend_spec
+        self.poll_period = 1.0 / max(1, int(poll_hz))
+        self.keys = tuple(keys)
+        self.discovery.wake.set()
+
+    def wanted_slots(self):
+        keys = self.keys
+        if "auto" in keys:
+            return range(MAX_SLOTS)
+        return [k for k in keys if k != "auto"]
+
+    def attach(self, backend: InputBackend, idx: int):
+        if backend is self.backend and not self.active[idx]:
+            self.active[idx] = True
+            self.attached.set()
+            notify_controller(idx, True)
+
+    def detach(self, idx: int):
+        if self.active[idx]:
+            self.active[idx] = False
+            self.discovery.lost(idx)
+            notify_controller(idx, False)
+
+    def run(self):
+        backend_spec = self.backend_spec
+        try:
+            backend = make_backend(*backend_spec)
+        except (OSError, ValueError) as e:
+            print(f"{APP_TITLE}: input backend not started: {e}", file=sys.stderr)
+            backend = NullBackend()
+        self.backend = backend
+        self.discovery.start()
+        st = XINPUT_STATE()
+        last_packet = {}
+        last_idx = {}
+        while not self.stop.is_set():
+            if self.backend_spec != backend_spec:
+                backend_spec = self.backend_spec
+                try:
+                    new_backend = make_backend(*backend_spec)
+                except Exception as e:
+                    print(f"{APP_TITLE}: input backend not changed: {e}", file=sys.stderr)
+                    new_backend = None
+                if new_backend is not None:
+                    for idx in range(MAX_SLOTS):
+                        self.detach(idx)
+                    self.backend = new_backend
+                    backend.close()
+                    backend = new_backend
+
+            keys = self.keys
+            active = self.active
+            auto_idx = None
+            if "auto" in keys:
+                for idx in range(MAX_SLOTS):
+                    if active[idx] and idx not in keys:
+                        auto_idx = idx
+                        break
+
+            any_active = False
+            for key in keys:
+                idx = auto_idx if key == "auto" else key
+                slot = self.slots[key]
+                if idx is None or not active[idx]:
+                    if slot.connected:
+                        slot.publish(st, False)
+                    continue
+                stats = self.stats
+                if stats is not None:
+                    t0 = time.perf_counter_ns()
+                    ok = backend.poll(idx, st)
+                    stats.poll.add(time.perf_counter_ns() - t0)
+                else:
+                    ok = backend.poll(idx, st)
+                if ok:
+                    any_active = True
+                    slot.last_ok = time.perf_counter()
+                    if st.dwPacketNumber != last_packet.get(key) or idx != last_idx.get(key) or not slot.connected:
+                        last_packet[key] = st.dwPacketNumber
+                        last_idx[key] = idx
+                        slot.publish(st, True)
+                        rec = recorder
+                        if rec is not None:
+                            rec.write(idx, st)
+                else:
+                    slot.publish(st, False)
+                    self.detach(idx)
+
+            if any_active:
+                backend.wait(self.poll_period)
+            else:
+                # 何も繋がっていない間は ControllerDiscovery からの attach を待つだけ
+                self.attached.wait(0.5)
+                self.attached.clear()
+        self.discovery.wake.set()
+        backend.close()
 
-        if idx is None:
-            idx = find_first_controller()
-            time.sleep(0.2)
-            continue
+stop_event = threading.Event()
+scheduler = None  # 実行中の RateScheduler（トレイから統計を見る用）
+output = None  # 実行中の OscOutput（同上）
+engine_stats = None  # EngineStats（stats_enabled のときだけ作る）
+config_overrides = {}  # コマンドライン指定（config.json より優先。リロード後も維持）
+recorder = None  # 記録中の Recorder（トレイの「入力を記録」）
+preview = None  # PreviewRing（設定画面のプレビューを開いている間だけ）
+
+def start_recording(path: Path = None) -> Path:
+    global recorder
+    if path is None:
+        path = RECORDINGS_DIR / time.strftime("%Y%m%d-%H%M%S.p2orec")
+    stop_recording()
+    recorder = Recorder(path)
+    return path
+
+def stop_recording():
+    # 戻り値: 閉じた Recorder（記録していなければ None）
+    global recorder
+    rec, recorder = recorder, None
+    if rec is not None:
+        rec.close()
+    return rec
+
+# =====================
+# Runtime config
+# load_config() の dict を読み込み時に一度だけ解決しておく（tick 中は属性参照だけ）
+# =====================
 
-        st = get_state(idx)
-        now = time.time()
+class RuntimeConfig:
+    __slots__ = (
+        "raw", "slot", "hz", "period", "poll_hz", "sched_policy", "input_backend", "backend_spec",
+        "deadzone_left", "deadzone_right", "trigger_threshold", "curve_gamma",
+        "lut_move_x", "lut_move_y", "lut_look_x", "lut_look_y", "lut_trigger",
+        "jump_mask", "voice_mask", "voice_hold", "grab",
+        "failsafe_timeout", "send_on_change", "keepalive_sec",
+        "filter", "filter_min_cutoff", "filter_beta", "filter_lead",
+        "bundled", "osc_items", "builtin_outputs", "rules", "dests",
+        "suppress", "process_name", "foreground_watch",
+        "stats_enabled", "stats_port", "oversample", "axis_fold", "pads",
+    )
 
-        if st is None:
-            if now - last_ok > float(cfg.get("failsafe_timeout_sec", 0.25)):
-                zero_all()
-            idx = find_first_controller()
-            time.sleep(0.1)
+    def __init__(self, cfg: dict, pads=(), luts: dict = None):
+        init = object.__setattr__
+        luts = {} if luts is None else luts
+        init(self, "raw", cfg)
+        init(self, "slot", cfg.get("slot", "auto"))
+        init(self, "hz", cfg["hz"])
+        init(self, "period", 1.0 / cfg["hz"])
+        init(self, "poll_hz", cfg["poll_hz"])
+        init(self, "sched_policy", cfg["sched_policy"])
+        init(self, "input_backend", resolve_backend_name(cfg["input_backend"]))
+        init(self, "backend_spec", (self.input_backend, cfg["replay_file"], cfg["replay_speed"]))
+
+        init(self, "deadzone_left", cfg["deadzone_left"])
+        init(self, "deadzone_right", cfg["deadzone_right"])
+        init(self, "trigger_threshold", cfg["trigger_threshold"])
+        init(self, "curve_gamma", cfg["curve_gamma"])
+
+        dz_l, dz_r, gamma, gain = cfg["deadzone_left"], cfg["deadzone_right"], cfg["curve_gamma"], cfg["look_gain"]
+        init(self, "lut_move_x", get_lut(luts, ("stick", dz_l, 1.0, 1.0)))
+        init(self, "lut_move_y", get_lut(luts, ("stick", dz_l, 1.0, -1.0 if cfg["move_invert_y"] else 1.0)))
+        init(self, "lut_look_x", get_lut(luts, ("stick", dz_r, gamma, gain)))
+        init(self, "lut_look_y", get_lut(luts, ("stick", dz_r, gamma, -gain if cfg["look_invert_y"] else gain)))
+        init(self, "lut_trigger", get_lut(luts, ("trigger", cfg["trigger_threshold"])))
+
+        init(self, "jump_mask", BUTTON_MASKS[cfg["jump_button"]])
+        init(self, "voice_mask", BUTTON_MASKS[cfg["voice_button"]])
+        init(self, "voice_hold", cfg["voice_mode"] == "hold")
+        init(self, "grab", cfg["enable_grab_triggers"])
+
+        init(self, "failsafe_timeout", cfg["failsafe_timeout_sec"])
+        init(self, "send_on_change", cfg["send_on_change"])
+        init(self, "filter", cfg["filter_enabled"])
+        init(self, "filter_min_cutoff", cfg["filter_min_cutoff"])
+        init(self, "filter_beta", cfg["filter_beta"])
+        init(self, "filter_lead", cfg["filter_predict_ms"] / 1000.0)
+        init(self, "keepalive_sec", cfg["keepalive_sec"])
+
+        items = [
+            (osc_header(cfg["addr_move_x"], "f"), "f"),
+            (osc_header(cfg["addr_move_y"], "f"), "f"),
+            (osc_header(cfg["addr_look_x"], "f"), "f"),
+            (osc_header(cfg["addr_look_y"], "f"), "f"),
+            (osc_header(cfg["addr_jump"], "i"), "i"),
+            (osc_header(cfg["addr_voice"], "i"), "i"),
+        ]
+        if cfg["enable_grab_triggers"]:
+            items.append((osc_header(cfg["grab_left_addr"], "f"), "f"))
+            items.append((osc_header(cfg["grab_right_addr"], "f"), "f"))
+        init(self, "builtin_outputs", len(items))
+        rules = tuple(compile_rule(rule, luts) for rule in cfg["rules"])
+        items.extend((spec.header, spec.tag) for spec in rules)
+        init(self, "rules", rules)
+        init(self, "bundled", cfg["osc_transport"] == "bundle")
+        init(self, "osc_items", tuple(items))
+        init(self, "dests", tuple(pad_destinations(cfg)))
+
+        init(self, "suppress", cfg["suppress_when_vrchat_foreground"])
+        init(self, "process_name", cfg["vrchat_process_name"].lower())
+        init(self, "foreground_watch", cfg["foreground_watch"])
+        init(self, "stats_enabled", cfg["stats_enabled"])
+        init(self, "stats_port", cfg["stats_port"])
+        init(self, "oversample", cfg["oversample"])
+        init(self, "axis_fold", cfg["axis_fold"])
+        init(self, "pads", tuple(pads))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RuntimeConfig is immutable")
+
+def compile_config(cfg: dict, luts: dict = None) -> RuntimeConfig:
+    # cfg は validate_config() 済みであること。LUT はパッド間（luts を渡せばプロファイル間も）で共有する
+    global _lut_cache
+    luts = {} if luts is None else luts
+    pads = [RuntimeConfig({**cfg, **entry, "pads": []}, luts=luts) for entry in cfg["pads"] or [{"slot": "auto"}]]
+    rc = RuntimeConfig(cfg, pads, luts)
+    _lut_cache = luts
+    return rc
+
+class Pad:
+    # 1パッド分の送信状態（mapping / OSC frame / 宛先 / voice pulse）
+    def __init__(self, rc: RuntimeConfig, slot: LatestSlot, output: OscOutput):
+        self.rc = rc
+        self.slot = slot
+        self.frame = build_frame(rc)
+        self.dests = [output.target(ip, port) for ip, port in rc.dests]
+        self.stats = None  # EngineStats
+
+        # 毎tick使い回すバッファ
+        self.st = XINPUT_STATE()
+        self.m = Mapped()
+
+        self.prev_voice = 0
+        self.prev_buttons = 0  # oversample: 前フレームで送ったボタン
+        self.folded = False  # oversample: 前フレームで peak 値を送った
+        # スムージング: move_x, move_y, look_x, look_y
+        self.filters = None
+        if rc.filter:
+            self.filters = tuple(OneEuro(rc.filter_min_cutoff, rc.filter_beta, rc.filter_lead) for _ in range(4))
+        # rules: 組み込み出力のあとに並ぶ
+        self.rule_ops = tuple(make_rule_op(spec, self.frame, rc.builtin_outputs + i) for i, spec in enumerate(rc.rules))
+        self.last_tick = 0.0
+        self.voice_pulse_until = 0.0
+        self.failsafe_sent = False
+        self.last_packet = None
+        self.last_full_send = 0.0
+
+    def zero_all(self):
+        self.frame.zero()
+        self.frame.send(self.dests)
+        self.last_packet = None
+        self.prev_voice = 0
+        self.voice_pulse_until = 0.0
+        if self.filters is not None:
+            for f in self.filters:
+                f.reset()
+
+    def resume(self):
+        # プロファイルが切り替わって送信を再開する。次の tick で全値を送り直す（送っていない間に受信側の値は変わっている）
+        self.last_packet = None
+        self.last_full_send = -math.inf
+
+    def drain(self):
+        # 送信していない間（前面抑制中）に溜まったエッジを捨てる。解除直後に古いタップを送らない
+        fold = self.slot.fold
+        if fold is not None:
+            fold.fold(self.st.Gamepad, 0)
+        self.prev_buttons = 0
+
+    def tick(self, now: float, change_only: bool):
+        rc = self.rc
+        frame = self.frame
+        m = self.m
+        st = self.st
+
+        if not self.slot.read(st):
+            if not self.failsafe_sent and now - self.slot.last_ok > rc.failsafe_timeout:
+                self.zero_all()
+                self.failsafe_sent = True
+            return
+        self.failsafe_sent = False
+
+        stats = self.stats
+        if stats is not None:
+            t0 = time.perf_counter_ns()
+
+        remap = not change_only or st.dwPacketNumber != self.last_packet
+        fold = self.slot.fold
+        if fold is not None:
+            # 前フレームが peak / ラッチした値なら、入力が変わっていなくても送り直す
+            peaked = fold.fold(st.Gamepad, self.prev_buttons)
+            if peaked or self.folded or st.Gamepad.wButtons != self.prev_buttons:
+                remap = True
+            self.folded = peaked
+            self.prev_buttons = st.Gamepad.wButtons
+
+        # change-driven: same dwPacketNumber → pad state unchanged, skip remapping
+        if remap:
+            map_state(st, rc, m)
+            self.last_packet = st.dwPacketNumber
+            if stats is not None:
+                t1 = time.perf_counter_ns()
+                stats.map.add(t1 - t0)
+                t0 = t1
+
+        filters = self.filters
+        if filters is None:
+            frame.set_f(OUT_MOVE_X, m.move_x)
+            frame.set_f(OUT_MOVE_Y, m.move_y)
+            frame.set_f(OUT_LOOK_X, m.look_x)
+            frame.set_f(OUT_LOOK_Y, m.look_y)
+        else:
+            # 入力が変わらない tick も回して収束させる（dt は実際の tick 間隔）
+            dt = now - self.last_tick
+            self.last_tick = now
+            frame.set_f(OUT_MOVE_X, filters[0](m.move_x, dt))
+            frame.set_f(OUT_MOVE_Y, filters[1](m.move_y, dt))
+            frame.set_f(OUT_LOOK_X, filters[2](m.look_x, dt))
+            frame.set_f(OUT_LOOK_Y, filters[3](m.look_y, dt))
+        frame.set_i(OUT_JUMP, m.jump)
+
+        # voice pulse/hold
+        if rc.voice_hold:
+            frame.set_i(OUT_VOICE, m.voice_down)
+        else:
+            if m.voice_down == 1 and self.prev_voice == 0:
+                self.voice_pulse_until = now + 0.06
+            frame.set_i(OUT_VOICE, 1 if now < self.voice_pulse_until else 0)
+            self.prev_voice = m.voice_down
+
+        if rc.grab:
+            frame.set_f(OUT_GRAB_L, m.grab_l)
+            frame.set_f(OUT_GRAB_R, m.grab_r)
+
+        gp = st.Gamepad
+        for op in self.rule_ops:
+            op(gp, now)
+
+        if stats is not None:
+            t1 = time.perf_counter_ns()
+            stats.encode.add(t1 - t0)
+
+        if not change_only or now - self.last_full_send >= rc.keepalive_sec:
+            frame.send(self.dests)
+            self.last_full_send = now
+        else:
+            frame.send_changed(self.dests)
+
+        if stats is not None:
+            stats.send.add(time.perf_counter_ns() - t1)
+
+def make_pads(rc: RuntimeConfig, inp: InputThread, output: OscOutput, stats: EngineStats = None) -> list:
+    pads = [Pad(prc, inp.slots[prc.slot], output) for prc in rc.pads]
+    for pad in pads:
+        pad.stats = stats
+    return pads
+
+def configure_input(rc: RuntimeConfig, inp: InputThread, stats: EngineStats = None):
+    # 入力スレッドの設定（slot・oversample・poll_hz）を rc に合わせる
+    poll_hz = rc.poll_hz
+    for key in inp.slots:
+        inp.slots[key].fold = None
+    for prc in rc.pads:
+        if prc.oversample:
+            inp.slots[prc.slot].fold = SampleFold(prc.axis_fold == "peak")
+            poll_hz = max(poll_hz, OVERSAMPLE_HZ)
+    inp.stats = stats
+    inp.configure(rc.backend_spec, poll_hz, [prc.slot for prc in rc.pads])
+
+def select_stats(rc: RuntimeConfig):
+    # rc で計測が有効なら EngineStats（初回だけ作る）、無効なら None
+    global engine_stats
+    if rc.stats_enabled and engine_stats is None:
+        engine_stats = EngineStats()
+    return engine_stats if rc.stats_enabled else None
+
+def apply_stats_config(rc: RuntimeConfig, server):
+    # 計測の有効/無効と HTTP エンドポイントを rc に合わせる。戻り値: (stats or None, server or None)
+    stats = select_stats(rc)
+    port = rc.stats_port if rc.stats_enabled else 0
+    if server is not None and server.server_address[1] != port:
+        server.shutdown()
+        server.server_close()
+        server = None
+    if server is None and port:
+        try:
+            server = start_stats_server(port)
+        except OSError as e:
+            print(f"{APP_TITLE}: stats endpoint not started: {e}", file=sys.stderr)
+    return stats, server
+
+def compile_engine_config(cfg: dict, luts: dict = None) -> RuntimeConfig:
+    # コマンドライン指定は pads の要素・プロファイルより優先（pads の各要素にも重ねる）
+    if config_overrides:
+        pads = [{**pad, **config_overrides} for pad in cfg["pads"]]
+        cfg = {**cfg, **config_overrides, "pads": pads}
+    return compile_config(cfg, luts)
+
+# =====================
+# Profiles（前面アプリごとの設定）
+# config 読み込み時に全プロファイルの RuntimeConfig と Pad を作り、前面プロセス名 → Profile の dict にしておく
+# 前面が変わったら dict を1回引いて差し替えるだけ（config の再読込・ソケットの作り直しはしない）
+# =====================
+
+class Profile:
+    __slots__ = ("name", "rc", "pads", "suppress")
+
+    def __init__(self, name: str, rc: RuntimeConfig, pads: list, suppress: bool):
+        self.name = name
+        self.rc = rc
+        self.pads = pads
+        self.suppress = suppress
+
+def compile_profile(cfg: dict, entry: dict) -> RuntimeConfig:
+    # 優先順: プロファイル > pads の要素 > トップレベル（pads の各要素にもプロファイルの値を重ねる）
+    overrides = {k: v for k, v in entry.items() if k not in PROFILE_DEFAULTS}
+    pads = [{**pad, **overrides} for pad in cfg["pads"]]
+    return compile_engine_config({**cfg, **overrides, "pads": pads}, _lut_cache)
+
+def build_profiles(cfg: dict, rc: RuntimeConfig, inp: InputThread, output: OscOutput, stats: EngineStats = None):
+    # 戻り値: (既定の Profile, {小文字のプロセス名: Profile})
+    # 宛先は output で共有するので、プロファイルごとの宛先もここで一度だけ作られる
+    # 作るだけで入力スレッドには触らない（configure_input は呼び出し側が差し替えるときに呼ぶ）
+    default = Profile("", rc, make_pads(rc, inp, output, stats), False)
+    index = {}
+    if rc.suppress:
+        # 従来の suppress_when_vrchat_foreground（同じプロセスを profiles に書いたらそちらが優先）
+        index[rc.process_name] = Profile(cfg["vrchat_process_name"], rc, default.pads, True)
+    for entry in cfg["profiles"]:
+        if entry["suppress"]:
+            prof = Profile(entry["name"], rc, default.pads, True)
+        else:
+            prc = compile_profile(cfg, entry)
+            prof = Profile(entry["name"], prc, make_pads(prc, inp, output, stats), False)
+        for name in entry["processes"]:
+            index[name.lower()] = prof
+    return default, index
+
+class ProfileSelector:
+    # 前面プロセス名 → Profile の切り替え。select() は毎 tick 呼ぶ（dict を1回引くだけ）
+    # 切り替わったら、離れるプロファイルの出力を一度だけ 0 にし（押しっぱなしを残さない）、
+    # 新しいプロファイルは次の tick で全値を送り直す。最初は既定のプロファイル
+    def __init__(self, default: Profile, index: dict):
+        self.default = default
+        self.index = index
+        self.active = default
+
+    def select(self, name: str):
+        # 戻り値: (今の Profile, 離れた Profile)。切り替わらなかった tick は (active, None)
+        prof = self.index.get(name, self.default)
+        left = self.active
+        if prof is left:
+            return prof, None
+        if not left.suppress:
+            for pad in left.pads:
+                pad.zero_all()
+        for pad in prof.pads:
+            pad.resume()
+        self.active = prof
+        return prof, left
+
+def engine_loop(foreground: ForegroundProvider = None, status: "EngineStatus" = None):
+    # foreground を渡せばそれを使う（テスト・ベンチ用の FakeForegroundProvider など）
+    # status: 別プロセス実行時の共有メモリ（停止・再読込の指示を受け、状態を書き出す）
+    global scheduler, output
+    watcher = ConfigWatcher(config_channel)  # 読み込みより先に stat（間の変更を取りこぼさない）
+    cfg = load_config()
+    rc = compile_engine_config(cfg)
+    inp = InputThread(rc.backend_spec, rc.poll_hz, [prc.slot for prc in rc.pads])
+    output = OscOutput()
+    stats, stats_server = apply_stats_config(rc, None)
+    selector = ProfileSelector(*build_profiles(cfg, rc, inp, output, stats))
+    configure_input(rc, inp, stats)
+    inp.start()
+    watcher.start()
+
+    own_foreground = foreground is None
+    if own_foreground:
+        foreground = make_foreground_provider(rc.foreground_watch)
+    fg_mode = rc.foreground_watch
+    sched = scheduler = RateScheduler(rc.hz, rc.sched_policy)
+    if status is not None:
+        config_gen = status.config_gen
+        status_due = 0.0
+
+    while not stop_event.is_set():
+        new_cfg = config_channel.take()
+        if status is not None:
+            if status.stop:
+                break
+            if status.config_gen != config_gen:
+                # GUI が保存した直後（config.json は置き換え済みなので書きかけは読まない）
+                config_gen = status.config_gen
+                try:
+                    new_cfg = load_config()
+                except ConfigError as e:
+                    print(f"{APP_TITLE}: config not applied: {e}", file=sys.stderr)
+
+        # 新しい config の反映（同じ内容なら何もしない。壊れた config は届かないので今の設定のまま続ける）
+        # 全部作り終えてから差し替える。途中で失敗したら今の設定のまま（同じ config が次に届けばやり直す）
+        # try の中では作るだけ。入力スレッド・計測サーバー・送信先など動いているものは else でだけ触る
+        if new_cfg is not None and new_cfg != cfg:
+            new_output = None
+            try:
+                new_rc = compile_engine_config(new_cfg)
+                new_stats = select_stats(new_rc)
+                new_output = OscOutput()
+                new_selector = ProfileSelector(*build_profiles(new_cfg, new_rc, inp, new_output, new_stats))
+                new_foreground = None
+                if own_foreground and new_rc.foreground_watch != fg_mode:
+                    new_foreground = make_foreground_provider(new_rc.foreground_watch)
+            except Exception as e:
+                if new_output is not None:
+                    new_output.close()
+                print(f"{APP_TITLE}: config not applied: {e}", file=sys.stderr)
+            else:
+                cfg, rc, stats = new_cfg, new_rc, new_stats
+                selector = new_selector
+                configure_input(rc, inp, stats)
+                _, stats_server = apply_stats_config(rc, stats_server)
+                output.close()
+                output = new_output
+                sched.set_rate(rc.hz, rc.sched_policy)
+                if new_foreground is not None:
+                    foreground.close()
+                    foreground = new_foreground
+                    fg_mode = rc.foreground_watch
+
+        if stats is not None:
+            tick_start = time.perf_counter_ns()
+
+        # 前面アプリでプロファイルを選ぶ（profiles が空なら前面を見ない）
+        if selector.index:
+            active, left = selector.select(foreground.name())
+        else:
+            active, left = selector.active, None
+        if stats is not None:
+            stats.foreground.add(time.perf_counter_ns() - tick_start)
+        if left is not None:
+            prc = active.rc
+            if (prc.hz, prc.sched_policy) != (left.rc.hz, left.rc.sched_policy):
+                sched.set_rate(prc.hz, prc.sched_policy)
+        pads = active.pads
+        if active.suppress:
+            for pad in pads:
+                pad.drain()
+            time.sleep(0.02)
+            sched.reset()
             continue
 
-        last_ok = now
-        m = map_state(st, cfg)
+        change_only = active.rc.send_on_change
+        now = time.perf_counter()
+        for pad in pads:
+            pad.tick(now, change_only)
+
+        if stats is not None:
+            stats.tick.add(time.perf_counter_ns() - tick_start)
+
+        pv = preview
+        if pv is not None and pads:
+            pv.push(pads[0])
+
+        if status is not None:
+            publish_mapped(status, pads)
+            if now >= status_due:
+                status_due = now + ENGINE_STATUS_PERIOD
+                publish_status(status)
+
+        # change-driven なら入力の変化で即起きる。固定レートは期限まで待つ
+        sched.wait(inp.event if change_only else None)
+
+    inp.stop.set()
+    watcher.stop.set()
+    stop_recording()
+    output.close()
+    if stats_server is not None:
+        stats_server.shutdown()
+        stats_server.server_close()
+    if own_foreground:
+        foreground.close()
+
+def replay_session(path, cfg: dict = None, realtime: bool = False, send: bool = True, on_mapped=None) -> dict:
+    # 記録ファイルを map_state → OSC 送信に通す。realtime=False なら待たずに全件（設定の一括評価用）
+    # on_mapped(t_sec, slot, Mapped) で変換結果を受け取れる。cfg 省略時は config.json
+    rc = compile_config(validate_config(cfg) if cfg is not None else load_config())
+    mm, records = open_recording(Path(path))
+    output = OscOutput()
+    event = threading.Event()
+    pads_by_key = {}
+    for prc in rc.pads:
+        pad = Pad(prc, LatestSlot(event), output)
+        if not send:
+            pad.dests = []
+        pads_by_key.setdefault(prc.slot, []).append(pad)
+
+    routes = {}  # 記録の slot → Pad（"auto" は最初に出てきた未指定 slot）
+    st = XINPUT_STATE()
+    count = 0
+    t = 0.0
+    start = time.perf_counter()
+    try:
+        for rec in records:
+            idx = rec.slot
+            pads = routes.get(idx)
+            if pads is None:
+                pads = pads_by_key.get(idx) or pads_by_key.pop("auto", [])
+                routes[idx] = pads
+            if not pads:
+                continue
+            t = rec.t_ns / 1e9
+            if realtime:
+                delay = start + t - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            copy_gamepad(st.Gamepad, rec.gamepad)
+            st.dwPacketNumber = rec.packet
+            for pad in pads:
+                pad.slot.publish(st, True)
+                pad.tick(t, False)
+                if on_mapped is not None:
+                    on_mapped(t, idx, pad.m)
+            count += 1
+    finally:
+        elapsed = time.perf_counter() - start
+        total = len(records)
+        rec = records = None
+        mm.close()
+        output.close()
+    return {
+        "records": total,
+        "replayed": count,
+        "input_sec": t,
+        "elapsed_sec": elapsed,
+        "speedup": t / elapsed if elapsed > 0 else 0.0,
+    }
+
+# =====================
+# Preview
+# 設定画面のライブプレビュー用。engine が毎tick 1件書き、GUI が ~30fps で最新を読む固定長リング
+# 書き手は1人（engine）・ロックなし。各レコードは末尾の seq を最後に書き、読み手は seq で書きかけを捨てる
+# 画面を閉じている間は preview = None で engine 側は何もしない
+# =====================
 
-        osc_f(cfg["addr_move_x"], m.move_x)
-        osc_f(cfg["addr_move_y"], m.move_y)
-        osc_f(cfg["addr_look_x"], m.look_x)
-        osc_f(cfg["addr_look_y"], m.look_y)
-        osc_i(cfg["addr_jump"], m.jump)
+PREVIEW_SLOTS = 64
+PREVIEW_HEADER = struct.Struct("<Q")  # 書いた件数
+# raw: LX LY RX RY LT RT buttons / 送信値: move_x move_y look_x look_y jump voice grab_l grab_r / seq
+PREVIEW_RECORD = struct.Struct("<hhhhBBH8fQ")
+PREVIEW_SEQ_OFFSET = PREVIEW_RECORD.size - 8
+PREVIEW_BYTES = PREVIEW_HEADER.size + PREVIEW_SLOTS * PREVIEW_RECORD.size
+
+class PreviewRing:
+    def __init__(self, buf=None):
+        # buf: PREVIEW_BYTES 以上の書き込み可能バッファ（別プロセス時は共有メモリ）。省略時は自前
+        self.buf = buf if buf is not None else bytearray(PREVIEW_BYTES)
+        self.count = PREVIEW_HEADER.unpack_from(self.buf)[0]
+
+    def push(self, pad: "Pad"):
+        gp = pad.st.Gamepad
+        sent = [v or 0 for v in pad.frame.values[:pad.rc.builtin_outputs]]
+        sent += [0] * (8 - len(sent))
+        n = self.count + 1
+        off = PREVIEW_HEADER.size + (n % PREVIEW_SLOTS) * PREVIEW_RECORD.size
+        buf = self.buf
+        struct.pack_into("<Q", buf, off + PREVIEW_SEQ_OFFSET, 0)
+        PREVIEW_RECORD.pack_into(
+            buf, off,
+            gp.sThumbLX, gp.sThumbLY, gp.sThumbRX, gp.sThumbRY, gp.bLeftTrigger, gp.bRightTrigger, gp.wButtons,
+            *sent, n,
+        )
+        PREVIEW_HEADER.pack_into(buf, 0, n)
+        self.count = n
+
+    def latest(self, k: int = 1) -> list:
+        # 新しい順に最大 k 件（書きかけ・上書きされたものは除く）
+        buf = self.buf
+        n = PREVIEW_HEADER.unpack_from(buf)[0]
+        out = []
+        for seq in range(n, max(0, n - min(k, PREVIEW_SLOTS - 1)), -1):
+            rec = PREVIEW_RECORD.unpack_from(buf, PREVIEW_HEADER.size + (seq % PREVIEW_SLOTS) * PREVIEW_RECORD.size)
+            if rec[-1] == seq:
+                out.append(rec)
+        return out
+
+def open_preview() -> PreviewRing:
+    global preview
+    if preview is None:
+        preview = PreviewRing()
+    return preview
+
+def close_preview():
+    global preview
+    preview = None
 
-        # voice pulse/hold
-        mode = str(cfg.get("voice_mode", "pulse")).lower()
-        if mode == "hold":
-            osc_i(cfg["addr_voice"], m.voice_down)
+# =====================
+# Engine process
+# engine_process=True のとき engine_loop を別プロセスで動かし、GUI とは共有メモリ（EngineStatus）だけでやりとりする
+# GUI → engine: stop / config_gen / record   engine → GUI: 状態・カウンタ・変換後の値
+# 数値は1つずつ書くだけ（ロックなし）。表示用なので途中の値が混ざっても構わない
+# =====================
+
+ENGINE_MAX_PADS = 4
+ENGINE_STATUS_PERIOD = 0.25  # カウンタ類を書き出す間隔（変換後の値は毎tick）
+ENGINE_RESTART_MIN = 1.0  # 落ちたときの再起動待ち（連続で落ちるほど倍々に延ばす）
+ENGINE_RESTART_MAX = 30.0
+ENGINE_STARTING, ENGINE_RUNNING, ENGINE_STOPPED = 0, 1, 2
+
+class EngineStatus(ctypes.Structure):
+    _fields_ = [
+        # GUI → engine
+        ("stop", ctypes.c_uint32),
+        ("config_gen", ctypes.c_uint32),  # 増えたら config.json を読み直す（外部での変更は子プロセスの ConfigWatcher が拾う）
+        ("record", ctypes.c_uint32),  # 1: record_path に記録 / 0: 停止
+        ("record_path", ctypes.c_char * 512),  # UTF-8
+        ("preview", ctypes.c_uint32),  # 1: 共有メモリのプレビューリングに書く
+        # engine → GUI
+        ("state", ctypes.c_uint32),
+        ("pid", ctypes.c_uint32),
+        ("connected", ctypes.c_uint32),  # slot ごとのビット
+        ("recording", ctypes.c_uint32),
+        ("record_count", ctypes.c_uint64),
+        ("ticks", ctypes.c_uint64),
+        ("skipped", ctypes.c_uint64),
+        ("sent", ctypes.c_uint64),
+        ("dropped", ctypes.c_uint64),
+        ("errors", ctypes.c_uint64),
+        ("target_hz", ctypes.c_double),
+        ("achieved_hz", ctypes.c_double),
+        ("jitter_p50_us", ctypes.c_double),
+        ("jitter_p99_us", ctypes.c_double),
+        ("jitter_max_us", ctypes.c_double),
+        ("pad_count", ctypes.c_uint32),
+        ("mapped", (ctypes.c_float * 8) * ENGINE_MAX_PADS),  # Mapped の順
+    ]
+
+def publish_mapped(status: EngineStatus, pads: list):
+    status.pad_count = min(len(pads), ENGINE_MAX_PADS)
+    for pad, out in zip(pads, status.mapped):
+        m = pad.m
+        out[0] = m.move_x
+        out[1] = m.move_y
+        out[2] = m.look_x
+        out[3] = m.look_y
+        out[4] = m.jump
+        out[5] = m.voice_down
+        out[6] = m.grab_l
+        out[7] = m.grab_r
+
+process_preview = None  # 子プロセス: 共有メモリ上の PreviewRing
+
+def publish_status(status: EngineStatus):
+    global preview
+    if (preview is not None) != bool(status.preview):
+        preview = process_preview if status.preview else None
+
+    sched = scheduler
+    if sched is not None:
+        rate = sched.stats()
+        status.ticks = rate["ticks"]
+        status.skipped = rate["skipped"]
+        status.target_hz = rate["target_hz"]
+        status.achieved_hz = rate["achieved_hz"]
+        status.jitter_p50_us = rate["jitter_p50_us"]
+        status.jitter_p99_us = rate["jitter_p99_us"]
+        status.jitter_max_us = rate["jitter_max_us"]
+    out = output
+    if out is not None:
+        dests = out.stats()
+        status.sent = sum(d["sent"] for d in dests)
+        status.dropped = sum(d["dropped"] for d in dests)
+        status.errors = sum(d["errors"] for d in dests)
+
+    # 記録の開始/停止（GUI が record を書き換える）
+    rec = recorder
+    if status.record and rec is None:
+        start_recording(Path(status.record_path.decode("utf-8")))
+    elif not status.record and rec is not None:
+        status.record_count = stop_recording().count
+    elif rec is not None:
+        status.record_count = rec.count
+    status.recording = 1 if recorder is not None else 0
+
+def engine_process_main(shm_name: str, config_path: str, overrides: dict):
+    # 子プロセスの入口（spawn されるので引数は pickle できるものだけ）
+    global CONFIG_PATH, process_preview, preview
+    from multiprocessing import shared_memory
+
+    CONFIG_PATH = Path(config_path)
+    config_overrides.update(overrides)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    status = EngineStatus.from_buffer(shm.buf)
+    ring_buf = shm.buf[ctypes.sizeof(EngineStatus):]
+    process_preview = PreviewRing(ring_buf)
+
+    def on_controller(slot, connected):
+        if connected:
+            status.connected |= 1 << slot
         else:
-            if m.voice_down == 1 and prev_voice == 0:
-                voice_pulse_until = now + 0.06
-            osc_i(cfg["addr_voice"], 1 if now < voice_pulse_until else 0)
-            prev_voice = m.voice_down
+            status.connected &= ~(1 << slot)
 
-        if cfg.get("enable_grab_triggers", True):
-            osc_f(cfg["grab_left_addr"], m.grab_l)
-            osc_f(cfg["grab_right_addr"], m.grab_r)
+    controller_listeners.append(on_controller)
+    status.pid = os.getpid()
+    status.state = ENGINE_RUNNING
+    try:
+        engine_loop(status=status)
+    finally:
+        status.state = ENGINE_STOPPED
+        controller_listeners.remove(on_controller)
+        preview = process_preview = None
+        ring_buf.release()
+        del status
+        shm.close()
+
+class EngineProcess:
+    # GUI 側から見た別プロセスの engine。落ちたら ENGINE_RESTART_* の間隔で起動し直す
+    def __init__(self):
+        from multiprocessing import shared_memory
+
+        self.shm = shared_memory.SharedMemory(create=True, size=ctypes.sizeof(EngineStatus) + PREVIEW_BYTES)
+        self.status = EngineStatus.from_buffer(self.shm.buf)
+        self.ring_buf = self.shm.buf[ctypes.sizeof(EngineStatus):]
+        self.proc = None
+        self.stopping = threading.Event()
+        self.monitor = threading.Thread(target=self._monitor, daemon=True)
+        self.connected = 0
+        self.restarts = 0
+
+    def start(self):
+        self._spawn()
+        self.monitor.start()
+
+    def _spawn(self):
+        import multiprocessing
+
+        status = self.status
+        status.stop = 0
+        status.state = ENGINE_STARTING
+        status.connected = 0
+        status.record = status.recording = 0  # 落ちる前の記録は続けない（同じファイルを上書きしない）
+        ctx = multiprocessing.get_context("spawn")
+        self.proc = ctx.Process(
+            target=engine_process_main,
+            args=(self.shm.name, str(CONFIG_PATH), dict(config_overrides)),
+            name=f"{APP_TITLE}-engine",
+            daemon=True,
+        )
+        self.proc.start()
+
+    def _monitor(self):
+        delay = ENGINE_RESTART_MIN
+        last_ticks = 0
+        while not self.stopping.wait(0.5):
+            status = self.status
+            connected = status.connected
+            if connected != self.connected:
+                for slot in range(MAX_SLOTS):
+                    bit = 1 << slot
+                    if (connected ^ self.connected) & bit:
+                        notify_controller(slot, bool(connected & bit))
+                self.connected = connected
+
+            if self.proc.is_alive():
+                if status.ticks != last_ticks:
+                    last_ticks = status.ticks
+                    delay = ENGINE_RESTART_MIN  # 動いていれば待ちを戻す
+                continue
 
-        hz = int(cfg.get("hz", 60))
-        time.sleep(max(0.001, 1.0 / hz))
+            print(f"{APP_TITLE}: engine process exited ({self.proc.exitcode}); restarting in {delay:.0f}s", file=sys.stderr)
+            for slot in range(MAX_SLOTS):
+                if self.connected & (1 << slot):
+                    notify_controller(slot, False)
+            self.connected = 0
+            if self.stopping.wait(delay):
+                break
+            delay = min(delay * 2, ENGINE_RESTART_MAX)
+            last_ticks = 0
+            self.restarts += 1
+            self._spawn()
+
+    def reload(self, cfg: dict = None):
+        # 保存直後に読み直させる（ConfigWatcher を待たない）。子プロセスは置き換え済みの config.json を読む
+        self.status.config_gen = (self.status.config_gen + 1) & 0xFFFFFFFF
+
+    def start_recording(self) -> Path:
+        path = RECORDINGS_DIR / time.strftime("%Y%m%d-%H%M%S.p2orec")
+        self.status.record_path = str(path).encode("utf-8")
+        self.status.record = 1
+        return path
+
+    def stop_recording(self, timeout: float = 1.0):
+        # 戻り値: (path, 件数)。engine が止めるのを少し待つ
+        status = self.status
+        status.record = 0
+        deadline = time.perf_counter() + timeout
+        while status.recording and time.perf_counter() < deadline:
+            time.sleep(0.02)
+        return Path(status.record_path.decode("utf-8")), status.record_count
+
+    def open_preview(self) -> PreviewRing:
+        # 子プロセスが flag を見るのは ENGINE_STATUS_PERIOD ごと（開いてすぐは空のことがある）
+        self.status.preview = 1
+        return PreviewRing(self.ring_buf)
+
+    def close_preview(self):
+        self.status.preview = 0
+
+    @property
+    def recording(self) -> bool:
+        return bool(self.status.record)
+
+    def snapshot(self) -> dict:
+        # stats_snapshot() と同じ形（ステージ計測は子プロセス内。stats_port で見る）
+        s = self.status
+        return {
+            "stages": {},
+            "ticks": s.ticks,
+            "skipped_ticks": s.skipped,
+            "rate": {
+                "target_hz": s.target_hz,
+                "achieved_hz": s.achieved_hz,
+                "ticks": s.ticks,
+                "skipped": s.skipped,
+                "jitter_p50_us": s.jitter_p50_us,
+                "jitter_p99_us": s.jitter_p99_us,
+                "jitter_max_us": s.jitter_max_us,
+            },
+            "sends": s.sent,
+            "send_errors": s.errors,
+            "send_drops": s.dropped,
+            "destinations": [{"dest": "(all)", "sent": s.sent, "dropped": s.dropped, "errors": s.errors}],
+            "engine_restarts": self.restarts,
+        }
+
+    def stop(self, timeout: float = 3.0):
+        self.stopping.set()
+        self.status.stop = 1
+        proc = self.proc
+        if proc is not None:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join(1.0)
+        if self.monitor.is_alive():
+            self.monitor.join(1.0)
+        del self.status
+        self.ring_buf.release()
+        self.shm.unlink()
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # status を誰かがまだ持っている（プロセス終了時に解放される）
 
 # =====================
-# Tray
+# Entry
+# トレイ/設定画面（gui.py）は使うときだけ import する。--headless なら tkinter / pystray / PIL を読まない
 # =====================
 
-def create_tray_image():
-    img = Image.new("RGBA", (64, 64), (0, 0, 0, 0))
-    d = ImageDraw.Draw(img)
-    d.rounded_rectangle((6, 6, 58, 58), radius=14, fill=(30, 30, 30, 255))
-    d.ellipse((18, 18, 46, 46), fill=(0, 200, 255, 255))
-    return img
+def parse_args(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(prog=APP_TITLE, description="XInput / evdev gamepad → VRChat OSC")
+    ap.add_argument("--headless", action="store_true", help="トレイ・設定画面なしで送信だけ行う")
+    ap.add_argument("--config", help="config.json のパス")
+    ap.add_argument("--hz", type=int, help="送信Hz（config.json より優先）")
+    ap.add_argument("--dest", help="送信先 ip:port（config.json の vrc_ip / vrc_port より優先）")
+    return ap.parse_args(argv)
+
+def apply_args(args):
+    global CONFIG_PATH
+    if args.config:
+        CONFIG_PATH = Path(args.config).resolve()
+    if args.hz is not None:
+        config_overrides["hz"] = _check_value("hz", args.hz, "--")
+    if args.dest:
+        try:
+            ip, port = parse_dest(args.dest)
+        except (KeyError, TypeError, ValueError):
+            raise ConfigError(f"--dest: expected ip:port, got {args.dest!r}") from None
+        config_overrides["vrc_ip"] = ip
+        config_overrides["vrc_port"] = _check_value("vrc_port", port, "--")
 
-def main():
-    # Tk はメインスレッドに置く（Aboutが押せない問題の根治）
-    root = tk.Tk()
-    root.withdraw()
+def run_headless() -> int:
+    import signal
 
-    # engine start
-    th = threading.Thread(target=engine_loop, daemon=True)
-    th.start()
+    try:
+        load_config()
+    except ConfigError as e:
+        print(f"{APP_TITLE}: config.json が不正です: {e}", file=sys.stderr)
+        return 1
 
-    settings_window_ref = {"win": None}
+    def on_controller(slot, connected):
+        print(f"{APP_TITLE}: pad {slot} {'connected' if connected else 'disconnected'}", file=sys.stderr)
 
-    def open_settings(_icon, _item):
-        def _():
-            # 既に開いてるなら前面へ
-            win = settings_window_ref["win"]
-            if win is not None and win.winfo_exists():
-                win.deiconify()
-                win.lift()
-                win.focus_force()
-                return
-            settings_window_ref["win"] = App(root)
-        root.after(0, _)
-
-    def show_about(_icon, _item):
-        def _():
-            root.attributes("-topmost", True)
-            messagebox.showinfo(APP_TITLE, f"{APP_TITLE} Version {VERSION}\nby kaguyachan\nhttps://kaguyachan.net/", parent=root)
-            root.attributes("-topmost", False)
-        root.after(0, _)
-
-    def do_exit(_icon, _item):
-        def _():
-            stop_event.set()
-            try:
-                icon.stop()
-            except Exception:
-                pass
-            root.quit()
-        root.after(0, _)
-
-    icon = Icon(
-        APP_TITLE,
-        create_tray_image(),
-        APP_TITLE,
-        Menu(
-            MenuItem("設定", open_settings),
-            MenuItem("バージョン情報", show_about),
-            MenuItem("終了", do_exit),
-        ),
-    )
+    controller_listeners.append(on_controller)
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
 
-    icon.run_detached()
-    root.mainloop()
+    th = threading.Thread(target=engine_loop, daemon=True)
+    th.start()
+    try:
+        while th.is_alive():
+            th.join(0.5)
+    except KeyboardInterrupt:
+        stop_event.set()
+        th.join(2.0)
+    return 0
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    try:
+        apply_args(args)
+    except ConfigError as e:
+        print(f"{APP_TITLE}: {e}", file=sys.stderr)
+        return 2
+    if args.headless:
+        return run_headless()
+    import gui
+    gui.run_tray()
+    return 0
 
 if __name__ == "__main__":
-    main()
+    import multiprocessing
+    multiprocessing.freeze_support()  # exe で engine_process を使うとき
+    # gui.py の "import main" がこのモジュールを指すように（二重に読み込まない）
+    sys.modules.setdefault("main", sys.modules[__name__])
+    sys.exit(main())
 
@@ -0,0 +1,70 @@
+import json
+import socket
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import main  # noqa: E402
+
+class FakeDest:
+    # Destination の代わり。送られた datagram を bytes で溜める
+    def __init__(self):
+        self.sent = []
+
+    def send(self, dgram):
+        self.sent.append(bytes(dgram))
+
+@pytest.fixture
+def fake_dest():
+    return FakeDest()
+
+@pytest.fixture
+def config_path(tmp_path, monkeypatch):
+    path = tmp_path / "config.json"
+    monkeypatch.setattr(main, "CONFIG_PATH", path)
+    return path
+
+@pytest.fixture
+def receiver():
+    # 127.0.0.1 の UDP 受信ソケット（port は getsockname()[1]）
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(0.5)
+    yield sock
+    sock.close()
+
+class EngineRun:
+    def __init__(self, foreground: main.FakeForegroundProvider):
+        self.foreground = foreground
+        self.errors = []
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        try:
+            main.engine_loop(self.foreground)
+        except BaseException as e:
+            self.errors.append(e)
+
+@pytest.fixture
+def run_engine(config_path):
+    # start(cfg) で config.json を書いて engine_loop を別スレッドで起動する。終了時に止める
+    runs = []
+
+    def start(cfg: dict, foreground: str = "") -> EngineRun:
+        config_path.write_text(json.dumps(cfg), encoding="utf-8")
+        main.stop_event.clear()
+        main.scheduler = main.output = None  # 前のテストの engine の値を見ない
+        run = EngineRun(main.FakeForegroundProvider(foreground))
+        runs.append(run)
+        run.thread.start()
+        return run
+
+    yield start
+    main.stop_event.set()
+    for run in runs:
+        run.thread.join(2.0)
+    main.stop_event.clear()
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+import main
+
+def test_defaults_validate():
+    cfg = main.validate_config({})
+    assert cfg == {**main.DEFAULT_CONFIG, "pads": [], "profiles": [], "destinations": []}
+
+@pytest.mark.parametrize("raw, message", [
+    ([], "must be a JSON object"),
+    ({"bogus": 1}, "unknown key: bogus"),
+    ({"hz": "60"}, "hz: expected int"),
+    ({"hz": True}, "hz: expected int"),
+    ({"hz": 0}, "hz: must be between"),
+    ({"voice_mode": "tap"}, "voice_mode: must be one of"),
+    ({"jump_button": "Z"}, "jump_button: unknown button"),
+    ({"addr_jump": "input/Jump"}, "addr_jump: OSC address must start with '/'"),
+    ({"destinations": ["nohost"]}, "destinations: bad destination"),
+    ({"pads": [5]}, "pads[0]: must be an object"),
+    ({"pads": [{"slot": 9}]}, "pads[0].slot: must be"),
+    ({"pads": [{"slot": 0, "pads": []}]}, "pads[0].pads: unknown key"),
+    ({"pads": [{"slot": 0, "hz": -1}]}, "pads[0].hz: must be between"),
+    ({"input_backend": "replay"}, "replay_file: required"),
+])
+def test_validate_errors(raw, message):
+    with pytest.raises(main.ConfigError) as e:
+        main.validate_config(raw)
+    assert message in str(e.value)
+
+def test_float_fields_accept_int():
+    cfg = main.validate_config({"look_gain": 2})
+    assert cfg["look_gain"] == 2.0 and isinstance(cfg["look_gain"], float)
+
+def test_load_config_missing_file_is_default(config_path):
+    assert main.load_config() == main.validate_config({})
+
+def test_load_config_broken_file_raises(config_path):
+    config_path.write_text('{"hz": 60', encoding="utf-8")
+    with pytest.raises(main.ConfigError):
+        main.load_config()
+
+def test_save_config_replaces_file(config_path):
+    cfg = main.validate_config({"hz": 90})
+    main.save_config(cfg)
+    assert json.loads(config_path.read_text(encoding="utf-8"))["hz"] == 90
+    assert main.load_config() == cfg
+    assert [p.name for p in config_path.parent.iterdir()] == ["config.json"]
+
+def test_compile_config_pads_override_top_level():
+    rc = main.compile_config(main.validate_config({"vrc_port": 9000, "pads": [{"slot": 1, "vrc_port": 9002}]}))
+    assert rc.pads[0].slot == 1
+    assert rc.pads[0].dests[0] == ("127.0.0.1", 9002)
+
+def test_runtime_config_is_immutable():
+    rc = main.compile_config(main.validate_config({}))
+    with pytest.raises(AttributeError):
+        rc.hz = 120
+
+def test_command_line_overrides_win_over_pads_and_profiles(monkeypatch):
+    monkeypatch.setattr(main, "config_overrides", {})
+    main.apply_args(main.parse_args(["--hz", "120", "--dest", "127.0.0.1:9100"]))
+    cfg = main.validate_config({
+        "pads": [{"slot": 0, "hz": 60, "vrc_port": 9002}],
+        "profiles": [{"name": "x", "processes": ["x.exe"], "vrc_port": 9003}],
+    })
+    rc = main.compile_engine_config(cfg)
+    assert rc.hz == 120
+    assert (rc.pads[0].hz, rc.pads[0].dests[0]) == (120, ("127.0.0.1", 9100))
+    prc = main.compile_profile(cfg, cfg["profiles"][0])
+    assert prc.pads[0].dests[0] == ("127.0.0.1", 9100)
+
+def test_bad_dest_flag_is_config_error(monkeypatch):
+    monkeypatch.setattr(main, "config_overrides", {})
+    with pytest.raises(main.ConfigError):
+        main.apply_args(main.parse_args(["--dest", "nohost"]))
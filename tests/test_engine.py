@@ -0,0 +1,114 @@
+import json
+import time
+
+import pytest
+
+import main
+
+BASE = {"input_backend": "synthetic", "hz": 60, "suppress_when_vrchat_foreground": False}
+
+def wait_for(cond, timeout=2.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if cond():
+            return True
+        time.sleep(0.005)
+    return False
+
+def target_hz():
+    sched = main.scheduler
+    return sched.stats()["target_hz"] if sched is not None else None
+
+def test_pushed_config_applies_on_next_tick(run_engine, receiver):
+    cfg = main.validate_config({**BASE, "vrc_port": receiver.getsockname()[1]})
+    run = run_engine(cfg)
+    assert wait_for(lambda: target_hz() == 60)
+    main.push_config({**cfg, "hz": 120})
+    assert wait_for(lambda: target_hz() == 120, timeout=0.5)
+    assert receiver.recv(4096)
+    assert not run.errors
+
+def test_same_config_is_not_reapplied(run_engine):
+    cfg = main.validate_config(BASE)
+    run_engine(cfg)
+    assert wait_for(lambda: main.output is not None and target_hz() == 60)
+    output = main.output
+    main.push_config(dict(cfg))
+    time.sleep(0.1)
+    assert main.output is output
+
+def test_external_edit_is_picked_up(run_engine, config_path, monkeypatch):
+    monkeypatch.setattr(main, "CONFIG_WATCH_SEC", 0.05)
+    run_engine(main.validate_config(BASE))
+    assert wait_for(lambda: target_hz() == 60)
+    config_path.write_text(json.dumps({**BASE, "hz": 90}), encoding="utf-8")
+    assert wait_for(lambda: target_hz() == 90, timeout=main.CONFIG_WATCH_SEC + 2.0)
+    config_path.write_text('{"hz": 30', encoding="utf-8")  # 壊れた config は無視
+    time.sleep(main.CONFIG_WATCH_SEC + 0.3)
+    assert target_hz() == 90
+
+def test_failed_reload_keeps_current_config(run_engine, monkeypatch):
+    cfg = main.validate_config(BASE)
+    run = run_engine(cfg)
+    assert wait_for(lambda: main.output is not None and target_hz() == 60)
+    output = main.output
+    real = main.build_profiles
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(main, "build_profiles", broken)
+    new_cfg = {**cfg, "hz": 120}
+    main.push_config(new_cfg)
+    time.sleep(0.1)
+    assert target_hz() == 60
+    assert main.output is output
+
+    # 同じ config をもう一度送れば反映される（失敗した config を「反映済み」にしない）
+    monkeypatch.setattr(main, "build_profiles", real)
+    main.push_config(dict(new_cfg))
+    assert wait_for(lambda: target_hz() == 120)
+    assert not run.errors
+
+def test_failed_profile_build_leaves_input_alone(run_engine, monkeypatch):
+    threads = []
+
+    class SpyInput(main.InputThread):
+        def __init__(self, *args):
+            super().__init__(*args)
+            threads.append(self)
+
+    def make_pads(rc, *args):
+        # プロファイルの Pad だけ作れない（宛先の解決に失敗した、など）
+        if rc.pads[0].dests[0][0] == "10.9.9.9":
+            raise UnicodeError("label too long")
+        return real(rc, *args)
+
+    real = main.make_pads
+    monkeypatch.setattr(main, "InputThread", SpyInput)
+    monkeypatch.setattr(main, "make_pads", make_pads)
+    cfg = main.validate_config(BASE)
+    run = run_engine(cfg)
+    assert wait_for(lambda: main.output is not None and target_hz() == 60)
+    inp = threads[0]
+    output = main.output
+    poll_period = inp.poll_period
+
+    profile = {"name": "x", "processes": ["x.exe"], "vrc_ip": "10.9.9.9"}
+    main.push_config(main.validate_config({**cfg, "hz": 120, "oversample": True, "poll_hz": 100, "profiles": [profile]}))
+    time.sleep(0.1)
+    assert target_hz() == 60
+    assert main.output is output
+    assert inp.poll_period == poll_period
+    assert all(slot.fold is None for slot in inp.slots.values())
+    assert not run.errors
+
+@pytest.mark.parametrize("axis_fold", ["latest", "peak"])
+def test_engine_starts_with_oversample(run_engine, receiver, axis_fold):
+    cfg = {**BASE, "vrc_port": receiver.getsockname()[1], "oversample": True, "axis_fold": axis_fold}
+    run = run_engine(cfg)
+    assert wait_for(lambda: target_hz() == 60 or bool(run.errors))
+    assert not run.errors
+    assert receiver.recv(4096)
+    time.sleep(0.1)
+    assert run.thread.is_alive()
@@ -0,0 +1,54 @@
+import random
+import statistics
+
+import main
+
+DT = 1 / 120
+
+def run(f, xs):
+    return [f(x, DT) for x in xs]
+
+def noisy_constant(n=2000, seed=1):
+    rnd = random.Random(seed)
+    return [0.5 + rnd.gauss(0, 0.02) for _ in range(n)]
+
+def test_first_sample_passes_through():
+    f = main.OneEuro(1.0, 0.5)
+    assert f(0.3, DT) == 0.3
+
+def test_smooths_noise():
+    xs = noisy_constant()
+    ys = run(main.OneEuro(1.0, 0.5), xs)[10:]
+    assert statistics.pstdev(ys) < statistics.pstdev(xs) / 3
+
+def test_prediction_keeps_smoothing_on_noise():
+    # 予測ありでもノイズの多い静止入力を生の値に戻さない
+    xs = noisy_constant()
+    plain = run(main.OneEuro(1.0, 0.5), xs)[10:]
+    predicted = run(main.OneEuro(1.0, 0.5, lead=0.02), xs)[10:]
+    assert statistics.pstdev(predicted) < 2 * statistics.pstdev(plain)
+    raw_hits = sum(y == x for x, y in zip(xs[10:], predicted))
+    assert raw_hits < len(predicted) * 0.2
+
+def test_prediction_stays_between_filtered_and_raw():
+    xs = noisy_constant(500) + [i / 100 for i in range(100)] + [1.0 - i / 50 for i in range(50)]
+    plain = main.OneEuro(1.0, 0.5)
+    predicted = main.OneEuro(1.0, 0.5, lead=0.05)
+    for x in xs:
+        y0 = plain(x, DT)
+        y = predicted(x, DT)
+        assert min(y0, x) - 1e-4 <= y <= max(y0, x) + 1e-4
+
+def test_prediction_reduces_ramp_lag():
+    xs = [i / 120 for i in range(60)]
+    lag_plain = xs[-1] - run(main.OneEuro(1.0, 0.5), xs)[-1]
+    lag_pred = xs[-1] - run(main.OneEuro(1.0, 0.5, lead=0.02), xs)[-1]
+    assert 0 <= lag_pred < lag_plain
+
+def test_reset_and_long_gap_restart():
+    f = main.OneEuro(1.0, 0.5)
+    f(0.0, DT)
+    f(0.2, DT)
+    assert f(0.9, main.FILTER_MAX_DT + 1) == 0.9
+    f.reset()
+    assert f(-0.4, DT) == -0.4
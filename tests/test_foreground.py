@@ -0,0 +1,22 @@
+import main
+
+def test_fake_foreground_provider_lowercases():
+    fg = main.FakeForegroundProvider("VRChat.exe")
+    assert fg.name() == "vrchat.exe"
+    fg.set("OBS64.EXE")
+    assert fg.name() == "obs64.exe"
+
+def test_hook_failure_falls_back_to_polling(monkeypatch, capsys):
+    class Unhooked:
+        hooked = False
+        closed = False
+
+        def close(self):
+            Unhooked.closed = True
+
+    monkeypatch.setattr(main.sys, "platform", "win32")
+    monkeypatch.setattr(main, "WinEventForegroundWatcher", Unhooked)
+    monkeypatch.setattr(main, "Win32ForegroundProvider", lambda: "polling")
+    assert main.make_foreground_provider("hook") == "polling"
+    assert Unhooked.closed
+    assert "polling instead" in capsys.readouterr().err
@@ -0,0 +1,184 @@
+import threading
+import time
+
+import pytest
+
+import main
+from test_engine import wait_for
+
+A = main.BUTTON_MASKS["A"]
+B = main.BUTTON_MASKS["B"]
+
+def gamepad(buttons=0, lx=0):
+    gp = main.XINPUT_GAMEPAD()
+    gp.wButtons = buttons
+    gp.sThumbLX = lx
+    return gp
+
+def test_latest_slot_roundtrip():
+    event = threading.Event()
+    slot = main.LatestSlot(event)
+    st = main.XINPUT_STATE()
+    st.dwPacketNumber = 7
+    st.Gamepad.sThumbLX = 1234
+    slot.publish(st, True)
+    assert event.is_set()
+    out = main.XINPUT_STATE()
+    assert slot.read(out)
+    assert (out.dwPacketNumber, out.Gamepad.sThumbLX) == (7, 1234)
+    slot.publish(st, False)
+    assert not slot.read(out)
+
+def test_latest_slot_read_waits_for_writer():
+    slot = main.LatestSlot(threading.Event())
+    slot.seq = 1  # 書き込み途中で止まっている
+    out = main.XINPUT_STATE()
+    result = []
+    reader = threading.Thread(target=lambda: result.append(slot.read(out)))
+    reader.start()
+    reader.join(0.05)
+    assert reader.is_alive() and not result
+    slot.state.Gamepad.sThumbLX = 99
+    slot.connected = True
+    slot.seq = 2
+    reader.join(1.0)
+    assert result == [True] and out.Gamepad.sThumbLX == 99
+
+def test_fold_keeps_tap_between_ticks():
+    fold = main.SampleFold(peak=False)
+    fold.add(gamepad(A))
+    fold.add(gamepad(0))
+    gp = gamepad(0)  # 最新サンプル: 離している
+    fold.fold(gp, prev_buttons=0)
+    assert gp.wButtons & A
+
+def test_fold_release_and_repress_sends_release_first():
+    fold = main.SampleFold(peak=False)
+    fold.add(gamepad(A))
+    fold.fold(gamepad(A), prev_buttons=0)
+    fold.add(gamepad(0))
+    fold.add(gamepad(A))
+    gp = gamepad(A)
+    fold.fold(gp, prev_buttons=A)
+    assert not gp.wButtons & A
+    gp = gamepad(A)
+    fold.fold(gp, prev_buttons=0)
+    assert gp.wButtons & A
+
+def test_fold_peak_axes():
+    fold = main.SampleFold(peak=True)
+    fold.add(gamepad(lx=30000))
+    fold.add(gamepad(lx=100))
+    gp = gamepad(lx=100)
+    assert fold.fold(gp, 0)
+    assert gp.sThumbLX == 30000
+    gp = gamepad(lx=100)
+    assert not fold.fold(gp, 0)
+    assert gp.sThumbLX == 100
+
+def test_synthetic_backend_script():
+    def script(t, slot, gp):
+        gp.wButtons = B if slot == 1 else 0
+
+    backend = main.SyntheticBackend(slots=2, update_hz=1000, script=script)
+    st = main.XINPUT_STATE()
+    st.dwPacketNumber = 0xFFFFFFFF  # 直前と違う packet にして script を必ず呼ばせる
+    assert backend.poll(1, st)
+    assert st.Gamepad.wButtons == B
+    assert not backend.poll(2, st)
+
+def test_record_replay_roundtrip(tmp_path):
+    path = tmp_path / "rec.p2orec"
+    rec = main.Recorder(path)
+    st = main.XINPUT_STATE()
+    for i in range(5):
+        st.dwPacketNumber = i + 1
+        st.Gamepad.sThumbLX = i * 1000
+        st.Gamepad.wButtons = A if i % 2 else 0
+        rec.write(i % 2, st)
+    rec.close()
+
+    mm, records = main.open_recording(path)
+    try:
+        assert len(records) == 5
+        assert [r.gamepad.sThumbLX for r in records] == [0, 1000, 2000, 3000, 4000]
+        assert [r.slot for r in records] == [0, 1, 0, 1, 0]
+        assert all(a.t_ns <= b.t_ns for a, b in zip(records, records[1:]))
+    finally:
+        del records
+        mm.close()
+
+    backend = main.ReplayBackend(str(path), speed=100.0)
+    try:
+        out = main.XINPUT_STATE()
+        assert backend.poll(0, out)
+        assert backend.poll(1, out)
+        assert not backend.poll(2, out)
+    finally:
+        backend.close()
+
+    # "auto" のパッド1台なら最初に出てきた slot だけ
+    assert main.replay_session(path, {}, realtime=False, send=False)["replayed"] == 3
+    cfg = {"pads": [{"slot": 0}, {"slot": 1}]}
+    assert main.replay_session(path, cfg, realtime=False, send=False)["replayed"] == 5
+
+def test_open_recording_rejects_other_files(tmp_path):
+    path = tmp_path / "x.p2orec"
+    path.write_bytes(b"not a recording at all")
+    with pytest.raises(ValueError):
+        main.open_recording(path)
+
+class PlugBackend(main.InputBackend):
+    # present のスロットだけ繋がっている。probes に poll された (slot, 時刻) を残す
+    def __init__(self, present=()):
+        self.present = set(present)
+        self.probes = []
+
+    def poll(self, slot, st):
+        self.probes.append((slot, time.perf_counter()))
+        return slot in self.present
+
+@pytest.fixture
+def discovery():
+    # 入力スレッドは起動せず、探索スレッドだけを動かす
+    inputs = []
+
+    def start(backend, keys):
+        inp = main.InputThread(("synthetic", "", 1.0), 500, keys)
+        inp.backend = backend
+        inp.discovery.start()
+        inputs.append(inp)
+        return inp
+
+    yield start
+    for inp in inputs:
+        inp.stop.set()
+        inp.discovery.wake.set()
+        inp.discovery.join(1.0)
+
+def test_discovery_attaches_present_pad(discovery):
+    inp = discovery(PlugBackend(present={2}), [2])
+    assert inp.attached.wait(1.0)
+    assert inp.active == [False, False, True, False]
+
+def test_discovery_backs_off_missing_slot(discovery):
+    backend = PlugBackend()
+    inp = discovery(backend, [0])
+    time.sleep(0.5)
+    # 0.1 → 0.2 → 0.4 秒と間隔が伸びるので、0.5 秒では数回しか probe しない
+    assert 2 <= len(backend.probes) <= 4
+    assert inp.discovery.delay[0] > main.DISCOVERY_MIN_DELAY
+
+def test_discovery_finds_returning_pad_quickly(discovery, monkeypatch):
+    monkeypatch.setattr(main, "DISCOVERY_MIN_DELAY", 0.01)
+    monkeypatch.setattr(main, "DISCOVERY_LOST_MAX_DELAY", 0.03)
+    backend = PlugBackend(present={0})
+    inp = discovery(backend, [0])
+    assert inp.attached.wait(1.0)
+    backend.present.clear()
+    inp.detach(0)
+    time.sleep(0.7)  # 上限なしのバックオフなら次の probe は 1 秒以上先
+    plugged = time.perf_counter()
+    backend.present.add(0)
+    assert wait_for(lambda: inp.active[0], timeout=1.0)
+    assert time.perf_counter() - plugged < 0.2
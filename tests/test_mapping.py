@@ -0,0 +1,63 @@
+import pytest
+
+import main
+
+def reference_map(gp, cfg):
+    # LUT を使わない元の計算（map_state はこれと同じ値を返すこと）
+    lx = main.norm_thumb(gp.sThumbLX, cfg["deadzone_left"])
+    ly = main.norm_thumb(gp.sThumbLY, cfg["deadzone_left"])
+    rx = main.norm_thumb(gp.sThumbRX, cfg["deadzone_right"])
+    ry = main.norm_thumb(gp.sThumbRY, cfg["deadzone_right"])
+    look_y = main.apply_curve(ry, cfg["curve_gamma"]) * cfg["look_gain"]
+    grab = cfg["enable_grab_triggers"]
+    return (
+        lx,
+        -ly if cfg["move_invert_y"] else ly,
+        main.apply_curve(rx, cfg["curve_gamma"]) * cfg["look_gain"],
+        -look_y if cfg["look_invert_y"] else look_y,
+        main.norm_trigger(gp.bLeftTrigger, cfg["trigger_threshold"]) if grab else 0.0,
+        main.norm_trigger(gp.bRightTrigger, cfg["trigger_threshold"]) if grab else 0.0,
+    )
+
+STICK_VALUES = [-32768, -32767, -20000, -8001, -8000, -4001, 0, 4000, 4001, 12345, 32767]
+TRIGGER_VALUES = [0, 30, 40, 41, 128, 255]
+
+@pytest.mark.parametrize("raw", [
+    {},
+    {
+        "deadzone_left": 8000, "deadzone_right": 4000, "curve_gamma": 1.7, "look_gain": 2.5,
+        "move_invert_y": True, "look_invert_y": True, "trigger_threshold": 40, "enable_grab_triggers": True,
+    },
+])
+def test_map_state_matches_reference(raw):
+    cfg = main.validate_config(raw)
+    rc = main.compile_config(cfg, {})
+    st = main.XINPUT_STATE()
+    gp = st.Gamepad
+    out = main.Mapped()
+    for i, v in enumerate(STICK_VALUES):
+        gp.sThumbLX = v
+        gp.sThumbLY = STICK_VALUES[-1 - i]
+        gp.sThumbRX = v
+        gp.sThumbRY = STICK_VALUES[-1 - i]
+        gp.bLeftTrigger = TRIGGER_VALUES[i % len(TRIGGER_VALUES)]
+        gp.bRightTrigger = TRIGGER_VALUES[-1 - i % len(TRIGGER_VALUES)]
+        m = main.map_state(st, rc, out)
+        got = (m.move_x, m.move_y, m.look_x, m.look_y, m.grab_l, m.grab_r)
+        assert got == pytest.approx(reference_map(gp, cfg), rel=1e-6, abs=1e-7)
+
+def test_get_lut_derives_scaled_table_from_unit_gain():
+    luts = {}
+    key = ("stick", 5000, 1.5, -2.0)
+    lut = main.get_lut(luts, key)
+    base = luts[("stick", 5000, 1.5, 1.0)]  # gain 違いは gain=1.0 のテーブルから作る
+    assert list(lut) == pytest.approx([v * -2.0 for v in base])
+    assert list(lut) == pytest.approx(list(main.build_stick_lut(5000, 1.5, -2.0)), rel=1e-6, abs=1e-7)
+    assert main.get_lut(luts, key) is lut
+
+def test_compile_config_reuses_tables_across_reloads():
+    cfg = main.validate_config({"look_gain": 3.0})
+    first = main.compile_config(cfg)
+    second = main.compile_config(main.validate_config({"look_gain": 3.0, "hz": 90}))
+    assert second.lut_look_x is first.lut_look_x
+    assert second.lut_trigger is first.lut_trigger
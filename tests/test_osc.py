@@ -0,0 +1,95 @@
+import socket
+import struct
+import time
+
+import main
+
+def test_osc_string_padding():
+    assert main.osc_string("/a") == b"/a\0\0"
+    assert main.osc_string("/abc") == b"/abc\0\0\0\0"
+
+def test_message_frame_encoding(fake_dest):
+    items = [(main.osc_header("/x", "f"), "f"), (main.osc_header("/jump", "i"), "i")]
+    frame = main.OscFrame(items, bundled=False)
+    frame.set_f(0, 0.5)
+    frame.set_i(1, 1)
+    frame.send([fake_dest])
+    assert fake_dest.sent == [
+        b"/x\0\0,f\0\0" + struct.pack(">f", 0.5),
+        b"/jump\0\0\0,i\0\0" + struct.pack(">i", 1),
+    ]
+
+def test_bundle_frame_encoding(fake_dest):
+    items = [(main.osc_header("/x", "f"), "f"), (main.osc_header("/y", "f"), "f")]
+    frame = main.OscFrame(items, bundled=True)
+    frame.set_f(0, 1.0)
+    frame.set_f(1, -1.0)
+    frame.send([fake_dest])
+    (dgram,) = fake_dest.sent
+    assert dgram.startswith(main.OSC_BUNDLE_HEADER)
+    msg = b"/x\0\0,f\0\0" + struct.pack(">f", 1.0)
+    rest = dgram[len(main.OSC_BUNDLE_HEADER):]
+    assert rest[:4] == struct.pack(">i", len(msg))
+    assert rest[4:4 + len(msg)] == msg
+    assert rest[8 + len(msg):] == b"/y\0\0,f\0\0" + struct.pack(">f", -1.0)
+
+def test_send_changed_only_sends_dirty(fake_dest):
+    items = [(main.osc_header("/a", "f"), "f"), (main.osc_header("/b", "f"), "f")]
+    frame = main.OscFrame(items, bundled=False)
+    frame.set_f(0, 0.1)
+    frame.set_f(1, 0.2)
+    assert frame.send_changed([fake_dest])
+    fake_dest.sent.clear()
+    frame.set_f(0, 0.1)  # 同じ値
+    assert not frame.send_changed([fake_dest])
+    frame.set_f(1, 0.3)
+    assert frame.send_changed([fake_dest])
+    assert len(fake_dest.sent) == 1 and fake_dest.sent[0].startswith(b"/b")
+
+def test_zero_marks_everything_dirty(fake_dest):
+    items = [(main.osc_header("/a", "f"), "f"), (main.osc_header("/b", "i"), "i")]
+    frame = main.OscFrame(items, bundled=False)
+    frame.zero()
+    frame.send_changed([fake_dest])
+    assert len(fake_dest.sent) == 2
+    assert frame.values == [0, 0]
+
+def test_parse_dest():
+    assert main.parse_dest("127.0.0.1:9001") == ("127.0.0.1", 9001)
+    assert main.parse_dest("[::1]:9001") == ("::1", 9001)
+    assert main.parse_dest({"ip": "10.0.0.2", "port": 9000}) == ("10.0.0.2", 9000)
+
+def test_unresolvable_destination_counts_drops():
+    dest = main.Destination("a" * 70 + ".invalid", 9000)  # IDNA のラベル上限（63）超え
+    assert dest.sock is None and dest.last_error
+    dest.send(b"x")
+    dest.send(b"x")
+    assert (dest.sent, dest.dropped, dest.errors) == (0, 2, 0)
+
+def test_refused_destination_counts_errors():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()  # 誰も受けていない port（ICMP port unreachable が返る）
+    dest = main.Destination("127.0.0.1", port)
+    try:
+        for _ in range(3):
+            dest.send(b"x")
+            time.sleep(0.01)
+        assert dest.errors >= 1 and dest.last_error
+    finally:
+        dest.close()
+
+def test_failing_destination_does_not_block_others(receiver):
+    output = main.OscOutput()
+    bad = output.target("a" * 70 + ".invalid", 9000)
+    good = output.target("127.0.0.1", receiver.getsockname()[1])
+    assert output.target("127.0.0.1", receiver.getsockname()[1]) is good
+    frame = main.OscFrame([(main.osc_header("/x", "f"), "f")], bundled=False)
+    frame.set_f(0, 0.5)
+    try:
+        frame.send([bad, good])
+        assert receiver.recv(4096) == b"/x\0\0,f\0\0" + struct.pack(">f", 0.5)
+        assert (bad.dropped, good.sent) == (1, 1)
+    finally:
+        output.close()
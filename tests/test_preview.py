@@ -0,0 +1,56 @@
+import struct
+from types import SimpleNamespace
+
+import main
+
+def fake_pad():
+    # PreviewRing.push が読むのは st.Gamepad / frame.values / rc.builtin_outputs だけ
+    return SimpleNamespace(
+        st=main.XINPUT_STATE(),
+        frame=SimpleNamespace(values=[0.0] * 8),
+        rc=SimpleNamespace(builtin_outputs=8),
+    )
+
+def push_n(ring, pad, n):
+    for _ in range(n):
+        pad.st.Gamepad.sThumbLX = (ring.count + 1) % 32768
+        pad.frame.values[0] = float(ring.count + 1)
+        ring.push(pad)
+
+def test_latest_is_newest_first_and_bounded_by_k():
+    ring = main.PreviewRing()
+    pad = fake_pad()
+    push_n(ring, pad, 2)
+    assert [r[-1] for r in ring.latest(10)] == [2, 1]
+    push_n(ring, pad, 8)
+    recs = ring.latest(5)
+    assert [r[-1] for r in recs] == [10, 9, 8, 7, 6]
+    assert [r[0] for r in recs] == [10, 9, 8, 7, 6]
+    assert recs[0][7] == 10.0  # 送った値の1つ目
+    assert ring.latest(0) == []
+
+def test_wraparound_keeps_the_newest_slots_minus_one():
+    ring = main.PreviewRing()
+    pad = fake_pad()
+    push_n(ring, pad, main.PREVIEW_SLOTS * 2 + 5)
+    n = ring.count
+    recs = ring.latest(main.PREVIEW_SLOTS * 3)
+    # 次に書き込まれるスロットは読まない（書きかけの可能性がある）
+    assert len(recs) == main.PREVIEW_SLOTS - 1
+    assert [r[-1] for r in recs] == list(range(n, n - main.PREVIEW_SLOTS + 1, -1))
+    assert all(r[0] == r[-1] for r in recs)
+
+def test_records_with_mismatched_seq_are_dropped():
+    ring = main.PreviewRing()
+    push_n(ring, fake_pad(), 5)
+    off = main.PREVIEW_HEADER.size + (4 % main.PREVIEW_SLOTS) * main.PREVIEW_RECORD.size
+    struct.pack_into("<Q", ring.buf, off + main.PREVIEW_SEQ_OFFSET, 0)  # 書きかけの record
+    assert [r[-1] for r in ring.latest(3)] == [5, 3]
+
+def test_reader_on_shared_buffer_sees_writer():
+    buf = bytearray(main.PREVIEW_BYTES)
+    writer = main.PreviewRing(buf)
+    push_n(writer, fake_pad(), 3)
+    reader = main.PreviewRing(buf)
+    assert reader.count == 3
+    assert [r[-1] for r in reader.latest(2)] == [3, 2]
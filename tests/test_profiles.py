@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+
+import main
+from test_engine import target_hz, wait_for
+
+@pytest.mark.parametrize("profiles, message", [
+    ([5], "profiles[0]: must be an object"),
+    ([{"processes": []}], "profiles[0].processes: at least one process name is required"),
+    ([{"processes": "obs64.exe"}], "profiles[0].processes: expected a list"),
+    ([{"processes": ["a.exe"], "name": 1}], "profiles[0].name: expected str"),
+    ([{"processes": ["a.exe"], "suppress": "yes"}], "profiles[0].suppress: expected bool"),
+    ([{"processes": ["a.exe"], "poll_hz": 100}], "profiles[0].poll_hz: cannot be set per profile"),
+    ([{"processes": ["a.exe"], "pads": []}], "profiles[0].pads: cannot be set per profile"),
+    ([{"processes": ["a.exe"], "bogus": 1}], "profiles[0].bogus: unknown key"),
+    ([{"processes": ["a.exe"], "hz": 0}], "profiles[0].hz: must be between"),
+    ([{"processes": ["a.exe"]}, {"processes": ["A.EXE"]}], "profiles[1].processes: 'A.EXE' is already used by profiles[0]"),
+])
+def test_profile_errors(profiles, message):
+    with pytest.raises(main.ConfigError) as e:
+        main.validate_config({"profiles": profiles})
+    assert message in str(e.value)
+
+def test_profile_defaults_are_filled_in():
+    (prof,) = main.validate_config({"profiles": [{"processes": ["obs64.exe"], "look_gain": 2}]})["profiles"]
+    assert prof == {"name": "", "processes": ["obs64.exe"], "suppress": False, "look_gain": 2.0}
+
+def test_profile_overrides_top_level():
+    cfg = main.validate_config({"vrc_port": 9000, "profiles": [{"processes": ["obs64.exe"], "vrc_port": 9100}]})
+    rc = main.compile_profile(cfg, cfg["profiles"][0])
+    assert rc.pads[0].dests[0] == ("127.0.0.1", 9100)
+
+def test_profile_wins_over_pad_entries():
+    cfg = main.validate_config({
+        "pads": [{"slot": 0, "vrc_port": 9000, "look_gain": 2.0}, {"slot": 1, "vrc_port": 9002}],
+        "profiles": [{"processes": ["obs64.exe"], "vrc_port": 9100}],
+    })
+    rc = main.compile_profile(cfg, cfg["profiles"][0])
+    assert [prc.dests[0][1] for prc in rc.pads] == [9100, 9100]
+    assert [prc.slot for prc in rc.pads] == [0, 1]
+    # プロファイルに無いキーは pads の要素のまま
+    assert rc.pads[0].raw["look_gain"] == 2.0
+
+class Dest:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, dgram):
+        self.sent.append(bytes(dgram))
+
+def make_profile(name, suppress=False, pads=None, **cfg):
+    # Pad 1台の Profile。宛先は送信内容を溜めるだけ
+    rc = main.compile_config(main.validate_config(cfg))
+    if pads is None:
+        slot = main.LatestSlot(threading.Event())
+        st = main.XINPUT_STATE()
+        st.dwPacketNumber = 1
+        st.Gamepad.sThumbLX = 20000
+        slot.publish(st, True)
+        pad = main.Pad(rc.pads[0], slot, main.OscOutput())
+        pad.dests = [Dest()]
+        pads = [pad]
+    return main.Profile(name, rc, pads, suppress)
+
+def sent(profile):
+    return profile.pads[0].dests[0].sent
+
+def zero_frame(profile):
+    frame = main.OscFrame(profile.rc.pads[0].osc_items, bundled=False)
+    frame.zero()
+    return [bytes(d) for d in frame.datagrams]
+
+@pytest.fixture
+def profiles():
+    default = make_profile("")
+    a = make_profile("a", addr_move_x="/a/x")
+    b = make_profile("b", addr_move_x="/b/x", hz=120)
+    quiet = make_profile("quiet", suppress=True, pads=default.pads)
+    index = {"a.exe": a, "b.exe": b, "vrchat.exe": quiet}
+    return main.ProfileSelector(default, index), default, a, b, quiet
+
+def test_unknown_process_is_default(profiles):
+    selector, default, *_ = profiles
+    assert selector.select("explorer.exe") == (default, None)
+    assert selector.select("") == (default, None)
+    assert sent(default) == []
+
+def test_enter_and_leave_suppress(profiles):
+    selector, default, _a, _b, quiet = profiles
+    pad = default.pads[0]
+    pad.tick(0.0, True)
+    sent(default).clear()
+
+    assert selector.select("vrchat.exe") == (quiet, default)
+    assert sent(default) == zero_frame(default)  # 抑制に入るとき一度だけ 0
+    sent(default).clear()
+    assert selector.select("vrchat.exe") == (quiet, None)
+    assert sent(default) == []
+
+    assert selector.select("explorer.exe") == (default, quiet)
+    assert sent(default) == []  # 抑制から戻るときは 0 を送らない
+    pad.tick(0.1, True)  # 入力は変わっていないが全値を送り直す
+    assert len(sent(default)) == len(default.rc.pads[0].osc_items)
+
+def test_switch_between_profiles(profiles):
+    selector, _default, a, b, _quiet = profiles
+    assert selector.select("a.exe")[0] is a
+    a.pads[0].tick(0.0, True)
+    assert selector.select("b.exe") == (b, a)
+    b.pads[0].tick(0.01, True)
+    sent(a).clear()
+    sent(b).clear()
+    b.pads[0].tick(0.02, True)
+    assert sent(b) == []  # 変化なし
+
+    assert selector.select("a.exe") == (a, b)
+    assert sent(b) == zero_frame(b)  # 離れる b に 0 を1回
+    assert selector.select("b.exe") == (b, a)
+    assert sent(a) == zero_frame(a)
+    sent(b).clear()
+    b.pads[0].tick(0.03, True)
+    assert len(sent(b)) == len(b.rc.pads[0].osc_items)  # 戻った b は全値を再送
+    assert any(d.startswith(b"/b/x") for d in sent(b))
+
+def test_engine_switches_profile_on_foreground_change(run_engine, receiver):
+    port = receiver.getsockname()[1]
+    cfg = {
+        "input_backend": "synthetic", "hz": 60, "vrc_port": port,
+        "profiles": [{"name": "fast", "processes": ["fast.exe"], "hz": 120, "addr_move_x": "/fast/x"}],
+    }
+    run = run_engine(cfg, foreground="explorer.exe")
+    assert wait_for(lambda: target_hz() == 60)
+    output = main.output
+    run.foreground.set("fast.exe")
+    assert wait_for(lambda: target_hz() == 120)
+    assert main.output is output  # 作り直さない
+    deadline = time.perf_counter() + 1.0
+    while time.perf_counter() < deadline:
+        if receiver.recv(4096).startswith(b"/fast/x"):
+            break
+    else:
+        pytest.fail("no /fast/x packet")
+    run.foreground.set("vrchat.exe")  # 従来の suppress_when_vrchat_foreground
+    assert wait_for(lambda: target_hz() == 60)
+    assert not run.errors
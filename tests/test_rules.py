@@ -0,0 +1,94 @@
+import pytest
+
+import main
+
+A = main.BUTTON_MASKS["A"]
+
+def compile_rule(**rule):
+    return main.compile_rule(main.validate_config({"rules": [rule]})["rules"][0], {})
+
+def make_op(**rule):
+    spec = compile_rule(**rule)
+    frame = main.OscFrame([(spec.header, spec.tag)], bundled=False)
+    return main.make_rule_op(spec, frame, 0), frame
+
+def gamepad(buttons=0, **axes):
+    gp = main.XINPUT_GAMEPAD()
+    gp.wButtons = buttons
+    for name, v in axes.items():
+        setattr(gp, name, v)
+    return gp
+
+@pytest.mark.parametrize("rule, message", [
+    (5, "rules[0]: must be an object"),
+    ({"input": "Q", "address": "/a"}, "rules[0].input: must be a button"),
+    ({"input": "None", "address": "/a"}, "rules[0].input: must be a button"),
+    ({"input": "A", "address": "a"}, "rules[0].address: OSC address must start with '/'"),
+    ({"input": "A", "address": "/a", "mode": "tap"}, "rules[0].mode: must be one of"),
+    ({"input": "A", "address": "/a", "type": "s"}, "rules[0].type: must be one of"),
+    ({"input": "LX", "address": "/a", "deadzone": 1.5}, "rules[0].deadzone: must be between"),
+    ({"input": "A", "address": "/a", "invert": 1}, "rules[0].invert: expected bool"),
+    ({"input": "A", "address": "/a", "foo": 1}, "rules[0].foo: unknown key"),
+])
+def test_rule_errors(rule, message):
+    with pytest.raises(main.ConfigError) as e:
+        main.validate_config({"rules": [rule]})
+    assert message in str(e.value)
+
+def test_rule_errors_in_pads_are_prefixed():
+    with pytest.raises(main.ConfigError, match=r"pads\[0\]\.rules\[0\]\.input"):
+        main.validate_config({"pads": [{"slot": 0, "rules": [{"input": "Q", "address": "/a"}]}]})
+
+def test_hold_button():
+    op, frame = make_op(input="A", address="/a", scale=2.0)
+    op(gamepad(A), 0.0)
+    assert frame.values[0] == 2.0
+    op(gamepad(0), 0.1)
+    assert frame.values[0] == 0
+
+def test_hold_axis_uses_deadzone_curve_and_invert():
+    op, frame = make_op(input="LX", address="/a", deadzone=0.5, invert=True)
+    op(gamepad(sThumbLX=10000), 0.0)
+    assert frame.values[0] == 0.0
+    op(gamepad(sThumbLX=32767), 0.0)
+    assert frame.values[0] == pytest.approx(-1.0)
+
+def test_hold_trigger_int():
+    op, frame = make_op(input="RT", address="/a", type="i", scale=10.0)
+    op(gamepad(bRightTrigger=255), 0.0)
+    assert frame.values[0] == 10
+
+def test_toggle_flips_on_rising_edge_only():
+    op, frame = make_op(input="A", address="/a", mode="toggle", type="i")
+    seq = [A, A, 0, 0, A, 0, A]
+    out = []
+    for i, b in enumerate(seq):
+        op(gamepad(b), i * 0.01)
+        out.append(frame.values[0])
+    assert out == [1, 1, 1, 1, 0, 0, 1]
+
+def test_toggle_on_axis_past_deadzone():
+    op, frame = make_op(input="LY", address="/a", mode="toggle", deadzone=0.5)
+    op(gamepad(sThumbLY=10000), 0.0)
+    assert frame.values[0] == 0
+    op(gamepad(sThumbLY=30000), 0.01)
+    assert frame.values[0] == 1.0
+
+def test_pulse_lasts_pulse_sec_from_press():
+    op, frame = make_op(input="A", address="/a", mode="pulse", pulse_sec=0.1)
+    op(gamepad(A), 1.00)
+    assert frame.values[0] == 1.0
+    op(gamepad(A), 1.05)  # 押しっぱなしでも
+    assert frame.values[0] == 1.0
+    op(gamepad(A), 1.11)  # pulse_sec で切れる
+    assert frame.values[0] == 0
+    op(gamepad(0), 1.12)
+    op(gamepad(A), 1.13)  # 押し直しで再度
+    assert frame.values[0] == 1.0
+
+def test_rules_follow_builtin_outputs_in_pad_frame():
+    cfg = main.validate_config({"rules": [{"input": "B", "address": "/avatar/parameters/Wave"}]})
+    rc = main.compile_config(cfg).pads[0]
+    assert rc.builtin_outputs == 8
+    assert len(rc.osc_items) == 9
+    assert rc.osc_items[8][0] == main.osc_header("/avatar/parameters/Wave", "f")
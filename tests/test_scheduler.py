@@ -0,0 +1,52 @@
+import threading
+import time
+
+import pytest
+
+import main
+
+def test_deadlines_stay_on_the_grid():
+    sched = main.RateScheduler(100)
+    t0 = sched.deadline
+    for k in range(1, 11):
+        assert sched.wait() is False
+        assert time.perf_counter() >= sched.deadline
+        assert sched.deadline == pytest.approx(t0 + k * sched.period)
+    assert sched.ticks == 10
+    assert sched.skipped == 0
+
+def test_skip_policy_counts_missed_ticks():
+    sched = main.RateScheduler(100, "skip")
+    t0 = sched.deadline
+    sched.wait()
+    time.sleep(3.5 * sched.period)  # 次の期限から 2.5 周期遅れ
+    sched.wait()
+    assert sched.skipped == 3
+    k = (sched.deadline - t0) / sched.period
+    assert k == pytest.approx(round(k))  # 飛ばしても期限は元の格子の上
+
+def test_catchup_is_bounded():
+    sched = main.RateScheduler(100, "catchup")
+    sched.wait()
+    time.sleep(2.5 * sched.period)  # 1.5 周期遅れ: 待たずに次の tick
+    start = time.perf_counter()
+    sched.wait()
+    assert time.perf_counter() - start < sched.period
+    assert sched.skipped == 0
+    time.sleep((main.SCHED_MAX_CATCHUP + 2) * sched.period)  # 上限を超えたら諦めて飛ばす
+    sched.wait()
+    assert sched.skipped > 0
+
+def test_wake_event_returns_early_and_keeps_deadline():
+    sched = main.RateScheduler(10)
+    wake = threading.Event()
+    deadline = sched.deadline + sched.period
+    threading.Timer(0.02, wake.set).start()
+    start = time.perf_counter()
+    assert sched.wait(wake) is True
+    assert time.perf_counter() - start < sched.period / 2
+    assert not wake.is_set()
+    assert sched.ticks == 0
+    assert sched.wait() is False  # 持ち越した期限で起きる
+    assert sched.deadline == pytest.approx(deadline)
+    assert time.perf_counter() >= deadline
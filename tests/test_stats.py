@@ -0,0 +1,25 @@
+import main
+
+def test_histogram_percentiles_are_bucket_upper_bounds():
+    h = main.Histogram()
+    for ns in range(1000, 101000, 1000):
+        h.add(ns)
+    assert h.count == 100
+    assert h.max == 100000
+    p50 = h.percentile_ns(0.50)
+    assert 50000 <= p50 <= 50000 * 1.25
+    assert h.percentile_ns(1.0) == 100000
+
+def test_histogram_small_values():
+    h = main.Histogram()
+    for ns in (0, 1, 2, 3):
+        h.add(ns)
+    assert h.percentile_ns(0.99) <= 3
+
+def test_engine_stats_snapshot_has_all_stages():
+    stats = main.EngineStats()
+    stats.tick.add(5000)
+    snap = stats.snapshot()
+    assert set(snap) == set(main.EngineStats.STAGES)
+    assert snap["tick"]["count"] == 1
+    assert snap["poll"]["count"] == 0